@@ -0,0 +1,191 @@
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from ground_truth import derive_ground_truth
+from multi_resolution import resize_area
+from post_augment import gaussian_blur
+from video_io import decode_frames
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.mpg', '.mpeg')
+
+# Frames decoded from a background clip; longer renders loop over them
+MAX_PLATE_FRAMES = 300
+
+# Alpha above which a pixel counts as part of the person when finding the feet
+FOOT_ALPHA = 0.5
+
+
+def find_backgrounds(directory):
+    """Stills and clips of a background plate directory, searched recursively in a stable order"""
+    return sorted(path for path in Path(directory).rglob('*')
+                  if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)
+
+
+class BackgroundLibrary:
+    """Background plates decoded at the output size on first use
+
+    Stills decode to a single frame and clips to at most max_frames. The
+    most recently used cache_size plates stay in memory, so a plate drawn
+    again for the next render is not decoded twice.
+    """
+    def __init__(self, directory, cache_size=8, max_frames=MAX_PLATE_FRAMES):
+        self.directory = Path(directory)
+        self.paths = find_backgrounds(directory)
+        if not self.paths:
+            raise FileNotFoundError(f"No background images or videos found in {directory}")
+        self.cache_size = cache_size
+        self.max_frames = max_frames
+        self._plates = OrderedDict()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def name(self, number):
+        return self.paths[number].relative_to(self.directory).as_posix()
+
+    def plate(self, number, size):
+        """(N, H, W, 3) uint8 frames of plate number, scaled and cropped to size (width, height)"""
+        key = (number, tuple(size))
+        if key in self._plates:
+            self._plates.move_to_end(key)
+            return self._plates[key]
+        frames = decode_frames(self.paths[number], size, self.max_frames)
+        self._plates[key] = frames
+        while len(self._plates) > self.cache_size:
+            self._plates.popitem(last=False)
+        return frames
+
+
+def sample_composite(rng, plate):
+    """Draw the placement, shadow and color matching of one composite over plate"""
+    return {
+        'plate': int(plate),
+        'plate_offset': float(rng.random()),  # Start frame of a clip plate, as a fraction of its length
+        'scale': float(rng.uniform(0.55, 1.0)),
+        'position': [float(rng.random()), float(rng.random())],  # Fraction of the free space left and above
+        'shadow_opacity': float(rng.uniform(0.2, 0.6)),
+        'shadow_squash': float(rng.uniform(0.15, 0.45)),
+        'shadow_shear': float(rng.uniform(-1.0, 1.0)),
+        'shadow_blur': float(rng.uniform(0.005, 0.02)),  # Sigma as a fraction of the frame height
+        'color_match': float(rng.uniform(0.2, 0.7)),
+    }
+
+
+def placement(size, params):
+    """(x0, y0, width, height) the rendered frame is scaled into within a frame of size"""
+    width, height = size
+    placed_width = max(1, round(width * params['scale']))
+    placed_height = max(1, round(height * params['scale']))
+    x0 = round((width - placed_width) * params['position'][0])
+    y0 = round((height - placed_height) * params['position'][1])
+    return x0, y0, placed_width, placed_height
+
+
+def flatten(rgba, color):
+    """Composite a (T, H, W, 4) straight-alpha render over a flat linear RGB color, e.g. the ground color"""
+    color = np.asarray(color, dtype=np.float32)
+    srgb = np.where(color <= 0.0031308, 12.92 * color, 1.055 * color ** (1 / 2.4) - 0.055) * 255.0
+    alpha = rgba[..., 3:].astype(np.float32) / 255.0
+    return np.clip(np.rint(rgba[..., :3] * alpha + srgb * (1.0 - alpha)), 0, 255).astype(np.uint8)
+
+
+def match_colors(rgb, alpha, background, strength):
+    """Move the per-channel mean and spread of the person towards the background's
+
+    Statistics are taken over the whole clip, weighted by coverage, so the
+    correction is the same for every frame and does not flicker. It reduces
+    to a gain and offset per channel.
+    """
+    covered = alpha > 0
+    pixels, weights = rgb[covered], alpha[covered][:, None]
+    total = max(float(weights.sum()), 1e-6)
+    mean = (pixels * weights).sum(axis=0) / total
+    std = np.sqrt(((pixels - mean) ** 2 * weights).sum(axis=0) / total) + 1.0
+    # A few frames describe the plate well enough, a still is the same in all of them
+    sample = background[::max(1, len(background) // 8)]
+    target_mean = sample.mean(axis=(0, 1, 2))
+    target_std = sample.std(axis=(0, 1, 2)) + 1.0
+    ratio = target_std / std
+    gain = 1.0 + strength * (ratio - 1.0)
+    offset = strength * (target_mean - mean * ratio)
+    return np.clip(rgb * gain.astype(np.float32) + offset.astype(np.float32), 0.0, 255.0)
+
+
+def cast_shadow(alpha, squash, shear):
+    """Approximate the person's shadow on the floor from a (T, H, W) alpha matte
+
+    The silhouette is flattened onto the floor from the lowest covered row of
+    every frame: each shadow row squash times as far above the feet samples
+    the matte, shifted sideways by shear pixels per row. All frames are
+    gathered with one index.
+    """
+    count, height, width = alpha.shape
+    covered = (alpha > FOOT_ALPHA).any(axis=2)
+    feet = height - 1 - covered[:, ::-1].argmax(axis=1)
+    above = feet[:, None] - np.arange(height)[None, :]  # (T, H) rows above the feet
+    source_y = np.rint(feet[:, None] - above / squash).astype(np.int64)
+    source_x = np.rint(np.arange(width)[None, None, :] - shear * above[:, :, None]).astype(np.int64)
+    valid = ((above >= 0) & (source_y >= 0) & covered.any(axis=1)[:, None])[:, :, None]
+    valid = valid & (source_x >= 0) & (source_x < width)
+    shadow = alpha[np.arange(count)[:, None, None], np.clip(source_y, 0, height - 1)[:, :, None],
+                   np.clip(source_x, 0, width - 1)]
+    return np.where(valid, shadow, 0.0).astype(np.float32)
+
+
+def composite(rgba, plate, params):
+    """Blend a (T, H, W, 4) straight-alpha render over an (N, H, W, 3) background plate
+
+    The person is color matched to the plate, scaled and moved, and its
+    approximate shadow darkens the plate before the alpha blend. A clip
+    plate loops from its sampled start frame, a still is repeated.
+    """
+    count, height, width, _ = rgba.shape
+    start = int(params['plate_offset'] * len(plate))
+    background = plate[(start + np.arange(count)) % len(plate)].astype(np.float32)
+
+    x = rgba.astype(np.float32)
+    alpha = x[..., 3:] / 255.0
+    rgb = match_colors(x[..., :3], alpha[..., 0], background, params['color_match'])
+
+    # Resample premultiplied so transparent pixels do not bleed dark fringes into the edges
+    x0, y0, placed_width, placed_height = placement((width, height), params)
+    layer = np.zeros((count, height, width, 4), dtype=np.float32)
+    layer[:, y0:y0 + placed_height, x0:x0 + placed_width] = resize_area(
+        np.concatenate([rgb * alpha, alpha], axis=-1), (0, 0, width, height), (placed_width, placed_height))
+    color, alpha = layer[..., :3], layer[..., 3:]
+
+    shadow = cast_shadow(alpha[..., 0], params['shadow_squash'], params['shadow_shear'])
+    shadow = gaussian_blur(shadow[..., None], params['shadow_blur'] * height)
+    background *= 1.0 - params['shadow_opacity'] * np.clip(shadow, 0.0, 1.0)
+    return np.clip(np.rint(color + background * (1.0 - alpha)), 0, 255).astype(np.uint8)
+
+
+def composite_ground_truth(labels, params):
+    """Labels of a composite, with the placement folded into the camera matrix
+
+    Scaling the render by s and moving it by (x0, y0) is a crop of a box
+    reaching outside the rendered frame, so derive_ground_truth re-projects
+    it exactly.
+    """
+    width, height = (int(value) for value in labels['image_size'])
+    x0, y0, placed_width, placed_height = placement((width, height), params)
+    box = (-x0 * width / placed_width, -y0 * height / placed_height,
+           width * width / placed_width, height * height / placed_height)
+    return derive_ground_truth(labels, box, (width, height), np.arange(len(labels['frames'])), labels['fps'])
+
+
+def composite_variants(rgba, library, count, seed):
+    """Yield (params, clip) for count reproducible composites of one render over different plates
+
+    Plates are drawn without replacement, so a render only repeats a plate
+    once count exceeds the library size.
+    """
+    size = (rgba.shape[2], rgba.shape[1])
+    order = np.random.default_rng(seed).permutation(len(library))
+    for variant in range(count):
+        rng = np.random.default_rng([*seed, variant])
+        params = sample_composite(rng, order[variant % len(order)])
+        yield params, composite(rgba, library.plate(params['plate'], size), params)
@@ -0,0 +1,209 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Pipeline stages timed individually; 'render' is whatever generate_scene
+# spends outside of them, which is bpy.ops.render.render on the default path
+STAGES = [
+    'setup_scene',
+    'load_model',
+    'add_background_variation',
+    'apply_fall_animation',
+    'adjust_camera',
+    'adjust_lighting',
+    'add_noise',
+    'setup_render_settings',
+    'render_frames',
+    'encode_clip',
+]
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark the synthetic fall generation pipeline')
+    parser.add_argument('--output', type=str, required=True, help='JSON file to write results to')
+    parser.add_argument('--model-dir', type=str, default=None,
+                        help='Directory containing FBX models (required unless --stub-bpy)')
+    parser.add_argument('--stub-bpy', action='store_true',
+                        help='Run against a stub bpy module to measure pure-Python orchestration overhead')
+    parser.add_argument('--scenes', type=int, default=3, help='Scenes rendered per scenario')
+    parser.add_argument('--seed', type=int, default=1234, help='Manifest seed shared by all scenarios')
+    parser.add_argument('--qualities', type=str, nargs='+', default=None,
+                        help='Quality presets to benchmark (default: all)')
+    parser.add_argument('--variations', type=str, nargs='+', default=None,
+                        help='Variation levels to benchmark (default: all)')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Earlier results to compare against; exits non-zero on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative slowdown per stage before it counts as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.0005,
+                        help='Ignore slowdowns smaller than this many seconds per call')
+
+    return parser.parse_args(argv)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class StageTimer:
+    """Wraps generator methods and records how long each call takes"""
+    def __init__(self, generator, stages):
+        self.samples = {stage: [] for stage in stages + ['render', 'scene']}
+        self._nested = 0.0
+        for stage in stages:
+            setattr(generator, stage, self._wrap(stage, getattr(generator, stage)))
+
+    def _wrap(self, stage, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.samples[stage].append(elapsed)
+                self._nested += elapsed
+        return timed
+
+    def time_scene(self, generate, *args):
+        self._nested = 0.0
+        start = time.perf_counter()
+        result = generate(*args)
+        elapsed = time.perf_counter() - start
+        self.samples['scene'].append(elapsed)
+        self.samples['render'].append(elapsed - self._nested)
+        return result
+
+    def summary(self):
+        return {
+            stage: {
+                'calls': len(times),
+                'total': sum(times),
+                'mean': sum(times) / len(times),
+                'min': min(times),
+                'max': max(times),
+            }
+            for stage, times in self.samples.items() if times
+        }
+
+def run_scenario(quality, variation, args, model_dir, work_dir):
+    from synthetic_fall_generator import SyntheticFallGenerator
+
+    output_dir = Path(work_dir) / f"{quality}_{variation}"
+    generator = SyntheticFallGenerator(
+        model_dir=model_dir,
+        output_dir=output_dir,
+        quality=quality,
+        num_videos=args.scenes,
+        variation_level=variation,
+        seed=args.seed,
+        use_model_cache=not args.stub_bpy  # The stub cannot write .blend libraries
+    )
+    timer = StageTimer(generator, STAGES)
+
+    model_files = generator.find_model_files()
+    manifest = generator.load_or_plan_manifest(len(model_files))
+
+    from variation_manifest import scene_params
+
+    successful = 0
+    start = time.perf_counter()
+    for i in range(args.scenes):
+        params = scene_params(manifest, i)
+        model_path = model_files[params['model_index'] % len(model_files)]
+        output_paths = generator.output_paths(output_dir / f"fall_scene_{i:03d}.mp4")
+        if timer.time_scene(generator.generate_scene, model_path, output_paths, params):
+            successful += 1
+    wall = time.perf_counter() - start
+
+    return {
+        'quality': quality,
+        'variation': variation,
+        'scenes': args.scenes,
+        'successful': successful,
+        'wall': wall,
+        'stages': timer.summary(),
+    }
+
+def compare(results, baseline, tolerance, min_delta):
+    """Print per-stage changes against a baseline and return the regressions found"""
+    previous = {(s['quality'], s['variation']): s for s in baseline['scenarios']}
+    regressions = []
+    for scenario in results['scenarios']:
+        key = (scenario['quality'], scenario['variation'])
+        if key not in previous:
+            continue
+        print(f"{key[0]}/{key[1]}:")
+        for stage, stats in scenario['stages'].items():
+            before = previous[key]['stages'].get(stage)
+            if before is None or before['mean'] == 0:
+                continue
+            ratio = stats['mean'] / before['mean']
+            regressed = ratio > 1 + tolerance and stats['mean'] - before['mean'] > min_delta
+            marker = '  REGRESSION' if regressed else ''
+            print(f"  {stage:<26} {before['mean'] * 1000:9.3f} ms -> {stats['mean'] * 1000:9.3f} ms "
+                  f"({ratio:5.2f}x){marker}")
+            if regressed:
+                regressions.append((key, stage, ratio))
+    return regressions
+
+def main():
+    args = parse_args()
+
+    if args.stub_bpy:
+        import bpy_stub
+        bpy_stub.install()
+    elif args.model_dir is None:
+        raise SystemExit("--model-dir is required unless --stub-bpy is given")
+
+    import bpy
+    from synfall_settings import QUALITY_PRESETS, VARIATION_LEVELS
+
+    qualities = args.qualities or list(QUALITY_PRESETS)
+    variations = args.variations or list(VARIATION_LEVELS)
+
+    with tempfile.TemporaryDirectory(prefix='synfall_bench_') as work_dir:
+        model_dir = args.model_dir
+        if args.stub_bpy and model_dir is None:
+            # The stub importer ignores file contents, it only needs paths to cycle through
+            model_dir = Path(work_dir) / 'models'
+            model_dir.mkdir()
+            for name in ('forward_fall', 'backward_fall', 'side_fall'):
+                (model_dir / f"{name}.fbx").touch()
+
+        scenarios = []
+        for quality in qualities:
+            for variation in variations:
+                print(f"Benchmarking {quality} quality with {variation} variation...")
+                scenarios.append(run_scenario(quality, variation, args, model_dir, work_dir))
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'blender': getattr(bpy.app, 'version_string', None),
+        'stub_bpy': args.stub_bpy,
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'scenarios': scenarios,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote benchmark results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
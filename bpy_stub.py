@@ -0,0 +1,290 @@
+import sys
+import types
+
+# Minimal stand-in for Blender's bpy module. It models just enough of the
+# scene graph for SyntheticFallGenerator to run its orchestration code outside
+# Blender, so the pure-Python overhead of the pipeline can be benchmarked and
+# regression-tested. Nothing is rendered.
+
+SPINE_BONES = ["mixamorig:Hips", "mixamorig:Spine", "mixamorig:Spine1", "mixamorig:Spine2",
+               "mixamorig:Neck", "mixamorig:Head", "mixamorig:LeftUpLeg", "mixamorig:RightUpLeg"]
+
+
+class Namespace:
+    """Attribute bag that creates nested namespaces on first access and ignores calls"""
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        value = Namespace()
+        setattr(self, name, value)
+        return value
+
+    def __call__(self, *args, **kwargs):
+        return None
+
+
+class Vector(Namespace):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        super().__init__(x=x, y=y, z=z)
+
+
+class Sockets:
+    def __init__(self):
+        self._sockets = {}
+
+    def __getitem__(self, index):
+        return self._sockets.setdefault(index, Namespace(default_value=0.0))
+
+
+class Node(Namespace):
+    def __init__(self, name, type):
+        super().__init__(name=name, type=type, inputs=Sockets(), outputs=Sockets())
+
+
+class Nodes:
+    def __init__(self, *names):
+        self._nodes = [Node(name, name) for name in names]
+
+    def new(self, type):
+        node = Node(type, type)
+        self._nodes.append(node)
+        return node
+
+    def get(self, name):
+        return next((node for node in self._nodes if node.name == name), None)
+
+    def clear(self):
+        self._nodes.clear()
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+class PropCollection(list):
+    """List of structs with the bulk foreach_get/foreach_set access of bpy_prop_collection"""
+    def foreach_get(self, attr, seq):
+        values = []
+        for item in self:
+            value = getattr(item, attr)
+            if isinstance(value, Vector):
+                values.extend((value.x, value.y, value.z))
+            elif isinstance(value, (tuple, list)):
+                values.extend(value)
+            else:
+                values.append(value)
+        seq[:] = values
+
+    def foreach_set(self, attr, seq):
+        width = len(seq) // len(self) if len(self) else 0
+        for i, item in enumerate(self):
+            chunk = [float(value) for value in seq[i * width:(i + 1) * width]]
+            if isinstance(getattr(item, attr, None), Vector):
+                setattr(item, attr, Vector(*chunk))
+            else:
+                setattr(item, attr, tuple(chunk) if width > 1 else chunk[0])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return next(item for item in self if item.name == key)
+        return super().__getitem__(key)
+
+
+class KeyframePoints(PropCollection):
+    def add(self, count):
+        self.extend(Namespace(co=(0.0, 0.0)) for _ in range(count))
+
+
+class FCurves(list):
+    def new(self, data_path, index=0, action_group=''):
+        fcurve = Namespace(data_path=data_path, array_index=index, keyframe_points=KeyframePoints())
+        self.append(fcurve)
+        return fcurve
+
+
+class Action(Namespace):
+    def __init__(self, name):
+        super().__init__(name=name, fcurves=FCurves())
+
+    @property
+    def frame_range(self):
+        frames = [point.co[0] for fcurve in self.fcurves for point in fcurve.keyframe_points]
+        return (min(frames), max(frames)) if frames else (0.0, 0.0)
+
+
+def node_tree(*names):
+    return Namespace(nodes=Nodes(*names), links=Namespace())
+
+
+class IDCollection:
+    """Name-keyed datablock collection such as bpy.data.objects"""
+    def __init__(self, factory=None):
+        self._items = {}
+        self._factory = factory
+
+    def _add(self, item):
+        name, number = item.name, 0
+        while name in self._items:
+            number += 1
+            name = f"{item.name}.{number:03d}"
+        if isinstance(item, Object):
+            item._name = name  # Bypass the renaming setter
+        else:
+            item.name = name
+        self._items[name] = item
+        return item
+
+    def new(self, name, *args):
+        return self._add(self._factory(name, *args))
+
+    def remove(self, item, do_unlink=True):
+        self._items.pop(item.name, None)
+
+    def get(self, name, default=None):
+        return self._items.get(name, default)
+
+    def __getitem__(self, name):
+        return self._items[name]
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Object(Namespace):
+    def __init__(self, name, data=None, type='EMPTY'):
+        super().__init__(_name=name, type=type, data=data or Namespace(materials=[]),
+                         location=Vector(), rotation_euler=Vector(), rotation_mode='XYZ', children=[],
+                         animation_data=None, props={}, select=True)
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        objects = data.objects
+        if objects._items.get(self._name) is self:
+            del objects._items[self._name]
+            self._name = value
+            objects._add(self)
+        else:
+            self._name = value
+
+    def __getitem__(self, key):
+        return self.props[key]
+
+    def __setitem__(self, key, value):
+        self.props[key] = value
+
+    def get(self, key, default=None):
+        return self.props.get(key, default)
+
+    def select_set(self, state):
+        self.select = state
+
+    def animation_data_create(self):
+        if self.animation_data is None:
+            self.animation_data = Namespace(action=None)
+        return self.animation_data
+
+
+def _material(name):
+    return Namespace(name=name, use_nodes=False, node_tree=node_tree("Principled BSDF", "Material Output"))
+
+
+data = Namespace(
+    objects=IDCollection(lambda name, object_data=None: Object(name, object_data)),
+    materials=IDCollection(_material),
+    cameras=IDCollection(lambda name: Namespace(name=name)),
+    images=IDCollection(lambda name, *args: Namespace(name=name)),
+    actions=IDCollection(Action),
+    meshes=IDCollection(lambda name: Namespace(name=name)),
+    armatures=IDCollection(lambda name: Namespace(name=name)),
+    lights=IDCollection(lambda name, type='POINT': Namespace(name=name, type=type)),
+    textures=IDCollection(lambda name, type='IMAGE': Namespace(name=name, type=type)),
+    node_groups=IDCollection(lambda name, type='ShaderNodeTree': node_tree()),
+    libraries=IDCollection(),
+)
+
+render_settings = Namespace(fps=24, fps_base=1.0, engine='CYCLES')
+render_settings.bl_rna = Namespace(properties={'engine': Namespace(enum_items={
+    'BLENDER_EEVEE': None, 'BLENDER_WORKBENCH': None, 'CYCLES': None})})
+
+scene = Namespace(render=render_settings, node_tree=node_tree("Render Layers", "Composite"),
+                  frame_start=1, frame_end=250, frame_step=1, camera=None)
+scene.collection = Namespace(objects=Namespace())
+
+context = Namespace(scene=scene, active_object=None, selected_objects=[])
+
+
+def _add_object(name, type, **attrs):
+    obj = data.objects._add(Object(name, type=type))
+    obj.__dict__.update(attrs)
+    for other in data.objects:
+        other.select = other is obj
+    context.active_object = obj
+    context.selected_objects = [obj]
+    return obj
+
+
+def _select_all(action='SELECT'):
+    for obj in data.objects:
+        obj.select = action != 'DESELECT'
+
+
+def _delete(use_global=False):
+    for obj in data.objects:
+        if obj.select:
+            data.objects.remove(obj)
+
+
+def _import_fbx(filepath):
+    """Create a Mixamo-like hierarchy: an empty root with an animated armature child"""
+    armature = Object("Armature", type='ARMATURE')
+    armature.pose = Namespace(bones=PropCollection(
+        Namespace(name=name, rotation_euler=Vector(), rotation_quaternion=(1.0, 0.0, 0.0, 0.0),
+                  rotation_mode='QUATERNION', head=Vector(0, 0, 1), tail=Vector(0, 0, 1.1))
+        for name in SPINE_BONES))
+    armature.animation_data = Namespace(action=Namespace(frame_range=(1.0, 90.0)))
+    data.objects._add(armature)
+    root = _add_object("Root", 'EMPTY')
+    root.children = [armature]
+    armature.select = True
+    context.selected_objects = [root, armature]
+
+
+ops = Namespace(
+    object=Namespace(select_all=_select_all, delete=_delete,
+                     camera_add=lambda location=(0, 0, 0), rotation=(0, 0, 0): _add_object(
+                         "Camera", 'CAMERA', location=Vector(*location))),
+    mesh=Namespace(primitive_plane_add=lambda size=2, location=(0, 0, 0): _add_object(
+        "Plane", 'MESH', location=Vector(*location))),
+    import_scene=Namespace(fbx=_import_fbx),
+    render=Namespace(render=lambda animation=False, write_still=False: None),
+)
+ops.object.light_add = lambda type='POINT', location=(0, 0, 0): _add_object(
+    "Light", 'LIGHT', data=Namespace(energy=1.0, color=(1, 1, 1), materials=[]))
+
+app = Namespace(version=(0, 0, 0), version_string='stub', binary_path='',
+                handlers=Namespace(render_pre=[], render_post=[], render_complete=[], render_cancel=[]))
+
+
+def install():
+    """Register the stub as the bpy module; must run before importing the generator"""
+    module = types.ModuleType('bpy')
+    module.ops = ops
+    module.context = context
+    module.data = data
+    module.app = app
+    module.types = Namespace()
+    module.STUB = True
+    sys.modules['bpy'] = module
+    return module
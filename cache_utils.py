@@ -0,0 +1,51 @@
+import hashlib
+import os
+from pathlib import Path
+
+
+def file_fingerprint(path):
+    """Cheap identity for a file based on its path, modification time and size"""
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def touch(path):
+    """Mark a cache entry as recently used
+
+    Access times are unreliable on noatime mounts, so recency is tracked
+    through the modification time instead.
+    """
+    os.utime(path, None)
+
+
+def evict_lru(directory, max_bytes, pattern='*', keep=()):
+    """Delete least recently used files until the directory fits in max_bytes
+
+    Returns the number of files removed. Paths listed in keep are never evicted.
+    """
+    keep = {Path(p).resolve() for p in keep}
+    entries = []
+    for path in Path(directory).glob(pattern):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue  # Removed by another process
+        if path.is_file():
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path.resolve() in keep:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
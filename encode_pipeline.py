@@ -0,0 +1,190 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from video_io import encode_sequence
+
+# Scratch space kept free on the RAM disk for the scene being rendered
+SCRATCH_RESERVE_BYTES = 256 * 1024 * 1024
+
+
+def default_scratch_dir():
+    """RAM-backed directory for rendered frames, falling back to the system temp directory"""
+    shm = Path('/dev/shm')
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm
+    return Path(tempfile.gettempdir())
+
+
+def directory_bytes(path):
+    return sum(entry.stat().st_size for entry in Path(path).iterdir() if entry.is_file())
+
+
+def merged_intervals(intervals):
+    """Sorted, disjoint (start, end) intervals covering the same time as intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def merged_length(intervals):
+    """Total length covered by a list of (start, end) intervals"""
+    return sum(end - start for start, end in merged_intervals(intervals))
+
+
+def overlap_length(intervals, others):
+    """Time during which an interval of the first list overlaps any interval of the second
+
+    Both lists are merged and sorted, then intersected in a single sweep.
+    """
+    first, second = merged_intervals(intervals), merged_intervals(others)
+    total = 0.0
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            total += end - start
+        # The interval ending first cannot overlap anything later in the other list
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+class EncodePipeline:
+    """Encodes rendered image sequences in background threads while the next scene renders
+
+    Blender renders each view to a frame directory on a RAM disk and submits
+    it here. A pool of encoder threads runs ffmpeg on finished sequences
+    (ffmpeg is a subprocess, so threads run in parallel). wait_for_capacity
+    applies backpressure: rendering pauses while too many sequences are queued
+    or the scratch space is full. Encode jobs report back through a callback,
+    run one at a time, so outputs are only published once their video is
+    complete.
+    """
+    def __init__(self, workers=2, scratch_dir=None, max_scratch_bytes=2 * 1024 ** 3, max_pending=None):
+        self.workers = workers
+        self.scratch_dir = Path(scratch_dir or default_scratch_dir())
+        self.max_scratch_bytes = max_scratch_bytes
+        self.max_pending = max_pending or workers * 2
+        self.executor = None
+        self.condition = threading.Condition()
+        self.callback_lock = threading.Lock()
+        self.pending = {}  # Future -> bytes of frames it holds on the scratch disk
+        self.failures = 0
+        self.render_intervals = []
+        self.encode_intervals = []
+        self.backpressure_seconds = 0.0
+        self._render_start = None
+
+    def frame_dir(self, name):
+        """Fresh scratch directory for one rendered sequence"""
+        return Path(tempfile.mkdtemp(prefix=f"synfall_{name}_", dir=self.scratch_dir))
+
+    def scratch_bytes(self):
+        with self.condition:
+            return sum(self.pending.values())
+
+    def _has_capacity(self):
+        if len(self.pending) >= self.max_pending:
+            return False
+        if sum(self.pending.values()) >= self.max_scratch_bytes:
+            return False
+        return shutil.disk_usage(self.scratch_dir).free >= SCRATCH_RESERVE_BYTES or not self.pending
+
+    def wait_for_capacity(self):
+        """Block until another sequence fits, counting the wait as backpressure"""
+        start = time.perf_counter()
+        with self.condition:
+            self.condition.wait_for(self._has_capacity)
+        waited = time.perf_counter() - start
+        self.backpressure_seconds += waited
+        if waited > 0.5:
+            print(f"Waited {waited:.1f} s for encoders to free scratch space")
+
+    def render_started(self):
+        self._render_start = time.perf_counter()
+
+    def render_finished(self):
+        if self._render_start is not None:
+            self.render_intervals.append((self._render_start, time.perf_counter()))
+            self._render_start = None
+
+    def submit(self, sequences, fps, fps_base, compression, on_done):
+        """Encode [(frame_dir, output_path), ...] in the background, then call on_done(ok, seconds)"""
+        size = sum(directory_bytes(frame_dir) for frame_dir, _ in sequences)
+        with self.condition:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='synfall-encode')
+            future = self.executor.submit(self._encode, sequences, fps, fps_base, compression, on_done)
+            self.pending[future] = size
+        future.add_done_callback(self._release)
+        return future
+
+    def _encode(self, sequences, fps, fps_base, compression, on_done):
+        start = time.perf_counter()
+        ok = True
+        try:
+            for frame_dir, output_path in sequences:
+                frame_paths = sorted(path for path in Path(frame_dir).iterdir() if path.is_file())
+                if not frame_paths:
+                    raise RuntimeError(f"No frames rendered in {frame_dir}")
+                encode_sequence(frame_paths, output_path, fps, fps_base, compression)
+        except Exception as e:
+            print(f"Error encoding {sequences[0][1]}: {e}")
+            ok = False
+        finally:
+            for frame_dir, _ in sequences:
+                shutil.rmtree(frame_dir, ignore_errors=True)
+        end = time.perf_counter()
+        with self.callback_lock:
+            try:
+                on_done(ok, end - start)
+            except Exception as e:
+                print(f"Error publishing {sequences[0][1]}: {e}")
+                ok = False
+        with self.condition:
+            self.encode_intervals.append((start, end))
+            if not ok:
+                self.failures += 1
+
+    def _release(self, future):
+        with self.condition:
+            self.pending.pop(future, None)
+            self.condition.notify_all()
+
+    def drain(self):
+        """Wait for every queued encode and return the number that failed"""
+        with self.condition:
+            self.condition.wait_for(lambda: not self.pending)
+        failures, self.failures = self.failures, 0
+        return failures
+
+    def close(self):
+        """Drain the queue and stop the encoder threads, returning the number of failed encodes"""
+        failures = self.drain()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        return failures
+
+    def report(self):
+        """Print how much encoding was hidden behind rendering"""
+        encode_time = sum(end - start for start, end in self.encode_intervals)
+        if not encode_time:
+            return
+        hidden = overlap_length(self.encode_intervals, self.render_intervals)
+        busy = merged_length(self.encode_intervals)
+        print(f"Encoding: {encode_time:.1f} s across {len(self.encode_intervals)} scenes with {self.workers} "
+              f"encoders, {hidden:.1f} s ({hidden / busy:.0%}) overlapped with rendering, "
+              f"{self.backpressure_seconds:.1f} s of rendering paused for backpressure")
@@ -0,0 +1,268 @@
+import math
+
+import bpy
+import numpy as np
+
+# Source frames between procedural keyframes; Blender interpolates in between
+KEYFRAME_SPACING = 3
+
+# Every fall type of VARIATION_SETTINGS['fall_types'] as parameters of one motion model:
+#   direction  heading of the fall in degrees, 0 forward, 90 to the character's left
+#   tilt       final angle of the body from vertical in degrees
+#   twist      turn about the vertical axis during the fall in degrees
+#   steps      meters stumbled in the fall direction before toppling
+#   drop       fraction of the hip height lowered before toppling (sitting or collapsing)
+#   spine, hip, knee, arms, head  peak flexion of every bone of the joint in degrees
+FALL_PROFILES = {
+    'forward_straight': {'direction': 0, 'tilt': 86, 'twist': 0, 'steps': 0.0, 'drop': 0.0,
+                         'spine': 15, 'hip': 20, 'knee': 15, 'arms': 70, 'head': -20},
+    'forward_twist': {'direction': 0, 'tilt': 86, 'twist': 70, 'steps': 0.0, 'drop': 0.0,
+                      'spine': 20, 'hip': 25, 'knee': 20, 'arms': 60, 'head': -15},
+    'backward_simple': {'direction': 180, 'tilt': 86, 'twist': 0, 'steps': 0.0, 'drop': 0.0,
+                        'spine': -15, 'hip': 15, 'knee': 20, 'arms': 45, 'head': 30},
+    'backward_sit': {'direction': 180, 'tilt': 80, 'twist': 0, 'steps': 0.0, 'drop': 0.45,
+                     'spine': 20, 'hip': 80, 'knee': 95, 'arms': 35, 'head': 25},
+    'sideways_left': {'direction': 90, 'tilt': 86, 'twist': 15, 'steps': 0.0, 'drop': 0.1,
+                      'spine': 10, 'hip': 20, 'knee': 30, 'arms': 50, 'head': 10},
+    'sideways_right': {'direction': -90, 'tilt': 86, 'twist': -15, 'steps': 0.0, 'drop': 0.1,
+                       'spine': 10, 'hip': 20, 'knee': 30, 'arms': 50, 'head': 10},
+    'stumble_forward': {'direction': 0, 'tilt': 86, 'twist': 10, 'steps': 0.8, 'drop': 0.0,
+                        'spine': 25, 'hip': 35, 'knee': 30, 'arms': 80, 'head': -20},
+    'stumble_backward': {'direction': 180, 'tilt': 84, 'twist': -10, 'steps': 0.6, 'drop': 0.1,
+                         'spine': -10, 'hip': 30, 'knee': 35, 'arms': 55, 'head': 30},
+    'collapse_vertical': {'direction': 45, 'tilt': 82, 'twist': 20, 'steps': 0.0, 'drop': 0.55,
+                          'spine': 20, 'hip': 90, 'knee': 120, 'arms': 20, 'head': -35},
+}
+
+# Phase boundaries as fractions of the clip: standing, then stumbling or
+# sinking, then toppling until impact, then settling on the ground
+ONSET = 0.12
+PRE_FALL = 0.3    # Length of the stumble or sink phase, when the fall type has one
+TOPPLE = 0.3
+SETTLE = 0.15
+
+# Hip height of a Mixamo character in meters, scales the drop
+HIP_HEIGHT = 0.95
+
+# Bones driven by the motion model, matched on the name without the
+# "mixamorig:" prefix, and the profile joint that drives them
+BONE_ROLES = {
+    'spine': 'spine', 'spine1': 'spine', 'spine2': 'spine',
+    'leftupleg': 'hip', 'rightupleg': 'hip',
+    'leftleg': 'knee', 'rightleg': 'knee',
+    'leftarm': 'arms', 'rightarm': 'arms',
+    'neck': 'head', 'head': 'head',
+}
+
+
+def ramp(u, start, end):
+    return np.clip((u - start) / max(end - start, 1e-6), 0.0, 1.0)
+
+
+def smoothstep(s):
+    return s * s * (3.0 - 2.0 * s)
+
+
+def keyframe_times(frame_start, frame_end, spacing=KEYFRAME_SPACING):
+    """Keyframe frame numbers covering the clip, always including its last frame"""
+    frames = np.arange(frame_start, frame_end, spacing, dtype=np.float32)
+    return np.append(frames, np.float32(frame_end))
+
+
+def fall_phases(profile):
+    """(start of toppling, impact) as clip fractions"""
+    topple_start = ONSET + (PRE_FALL if profile['steps'] or profile['drop'] else 0.0)
+    return topple_start, topple_start + TOPPLE
+
+
+def root_trajectory(profile, u, base_location, base_heading, extra_rotation=0.0):
+    """Location and XYZ Euler rotation of the fall at clip fractions u, as (T, 3) arrays
+
+    The root pivots at the feet: the body topples about the horizontal axis
+    perpendicular to the fall direction, accelerating like a falling rod,
+    and rebounds slightly on impact. Stumbling moves the root along the fall
+    direction, and a drop lowers it before toppling and restores the height
+    while the body goes down so the feet stay near the floor.
+    """
+    topple_start, impact = fall_phases(profile)
+    pre = smoothstep(ramp(u, ONSET, topple_start))
+    topple = ramp(u, topple_start, impact)
+    settle = ramp(u, impact, impact + SETTLE)
+
+    tilt = math.radians(profile['tilt']) * (topple ** 2 - 0.05 * np.sin(np.pi * settle) * (1.0 - settle))
+    direction = math.radians(profile['direction'])
+    # Fall direction in model space; the model faces -Y, so its left is +X
+    dx, dy = math.sin(direction), -math.cos(direction)
+    # Tilting about z x d brings the head toward d
+    rotation = np.stack([
+        -dy * tilt,
+        dx * tilt,
+        base_heading + math.radians(profile['twist']) * smoothstep(ramp(u, ONSET, impact))
+        + math.radians(extra_rotation) * ramp(u, ONSET, impact),
+    ], axis=1)
+
+    stumble = profile['steps'] * pre
+    drop = profile['drop'] * HIP_HEIGHT * pre * (1.0 - smoothstep(topple))
+    cos_h, sin_h = math.cos(base_heading), math.sin(base_heading)
+    location = np.stack([
+        base_location[0] + stumble * (cos_h * dx - sin_h * dy),
+        base_location[1] + stumble * (sin_h * dx + cos_h * dy),
+        base_location[2] - drop,
+    ], axis=1)
+    return location.astype(np.float32), rotation.astype(np.float32)
+
+
+def joint_angles(profile, u, bend=0.0, twist=0.0):
+    """Flexion and twist in radians of every profile joint at clip fractions u, keyed by joint
+
+    Joints flex from the onset to the impact and relax partway while the
+    body settles. The initial spine bend and twist of the scene fade out as
+    the fall takes over.
+    """
+    topple_start, impact = fall_phases(profile)
+    flex = smoothstep(ramp(u, ONSET, impact)) * (1.0 - 0.4 * smoothstep(ramp(u, impact, 1.0)))
+    if profile['drop']:
+        # Knees and hips give way first when sitting or collapsing
+        flex = np.maximum(flex, smoothstep(ramp(u, ONSET, topple_start)))
+    # Arms reach out right before impact
+    reach = smoothstep(ramp(u, topple_start, impact)) * (1.0 - 0.5 * ramp(u, impact, 1.0))
+    initial = 1.0 - smoothstep(ramp(u, ONSET, impact))
+
+    angles = {}
+    for joint in ('spine', 'hip', 'knee', 'arms', 'head'):
+        curve = reach if joint == 'arms' else flex
+        angles[joint] = (math.radians(profile[joint]) * curve, np.zeros_like(u))
+    spine_flex, _ = angles['spine']
+    angles['spine'] = (spine_flex + bend * initial, twist * initial)
+    return angles
+
+
+def quaternions(flexion, twist):
+    """(T, 4) w, x, y, z quaternions of a flexion about the bone's X axis followed by a twist about its Y axis"""
+    cx, sx = np.cos(flexion / 2), np.sin(flexion / 2)
+    cy, sy = np.cos(twist / 2), np.sin(twist / 2)
+    return np.stack([cx * cy, sx * cy, cx * sy, sx * sy], axis=1).astype(np.float32)
+
+
+def axis_quaternions(axis, angles):
+    """(T, 4) w, x, y, z quaternions of rotations by angles about the X, Y or Z axis"""
+    q = np.zeros((len(angles), 4), dtype=np.float64)
+    q[:, 0] = np.cos(angles / 2)
+    q[:, 'XYZ'.index(axis) + 1] = np.sin(angles / 2)
+    return q
+
+
+def quaternion_multiply(a, b):
+    """Hamilton product of (..., 4) w, x, y, z quaternions, rotating by b first and then by a"""
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack([aw * bw - ax * bx - ay * by - az * bz,
+                     aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw], axis=-1)
+
+
+def euler_quaternions(euler, order='XYZ'):
+    """(T, 4) quaternions of (T, 3) Euler angles in a Blender rotation order, whose first axis applies first"""
+    q = None
+    for axis in order:
+        step = axis_quaternions(axis, euler[:, 'XYZ'.index(axis)])
+        q = step if q is None else quaternion_multiply(step, q)
+    return q
+
+
+def rest_quaternion(obj):
+    """Rotation of obj before it is animated, e.g. the axis correction of an FBX import, as w, x, y, z"""
+    if obj.rotation_mode == 'QUATERNION':
+        q = obj.rotation_quaternion
+        return np.array([q.w, q.x, q.y, q.z], dtype=np.float64)
+    if obj.rotation_mode == 'AXIS_ANGLE':
+        angle, *axis = obj.rotation_axis_angle
+        axis = np.asarray(axis, dtype=np.float64) / max(np.linalg.norm(axis), 1e-12)
+        return np.array([math.cos(angle / 2), *(math.sin(angle / 2) * axis)])
+    euler = obj.rotation_euler
+    return euler_quaternions(np.array([[euler.x, euler.y, euler.z]]), obj.rotation_mode)[0]
+
+
+def continuous(q):
+    """Flip quaternion signs so neighbours lie in the same hemisphere and F-curves interpolate the short way"""
+    flips = np.cumsum(np.einsum('ij,ij->i', q[1:], q[:-1]) < 0) % 2
+    q[1:][flips == 1] *= -1
+    return q
+
+
+def rig_layout(armature):
+    """Driven bones of an armature as {bone name: joint}, plus a mask of its spine bones"""
+    names = [bone.name for bone in armature.pose.bones]
+    roles = {}
+    for name in names:
+        role = BONE_ROLES.get(name.lower().split(':')[-1])
+        if role is not None:
+            roles[name] = role
+    spine = np.array(['spine' in name.lower() for name in names], dtype=bool)
+    return roles, spine
+
+
+def bone_channels(roles, angles):
+    """F-curve channels (data_path, index, group) and their (C, T) values for the driven bones"""
+    channels = []
+    values = []
+    for name, role in roles.items():
+        rotation = quaternions(*angles[role])
+        data_path = f'pose.bones["{name}"].rotation_quaternion'
+        channels.extend((data_path, index, name) for index in range(4))
+        values.append(rotation.T)
+    return channels, np.concatenate(values) if values else np.empty((0, 0), dtype=np.float32)
+
+
+def write_action(obj, name, channels, frames, values):
+    """Replace the animation of obj with a new action holding one F-curve per channel
+
+    Keyframes of each F-curve are written with a single foreach_set, so the
+    number of Python calls depends on the number of channels only, not on
+    the number of keyframes.
+    """
+    obj.animation_data_create()
+    action = bpy.data.actions.new(name)
+    co = np.empty((len(frames), 2), dtype=np.float32)
+    co[:, 0] = frames
+    for (data_path, index, group), curve in zip(channels, values):
+        fcurve = action.fcurves.new(data_path, index=index, action_group=group)
+        fcurve.keyframe_points.add(len(frames))
+        co[:, 1] = curve
+        fcurve.keyframe_points.foreach_set('co', co.ravel())
+        fcurve.update()  # Sort keys and compute automatic handles
+    obj.animation_data.action = action
+    return action
+
+
+def apply_procedural_fall(model, armature, roles, fall_type, params, frame_range):
+    """Animate a model with the procedural fall of fall_type over frame_range
+
+    The model root carries the global motion and the driven bones flex on
+    top of the rest pose. The root's rest rotation, such as the 90 degree X
+    correction of an FBX import, is kept: the fall rotates the model as it
+    stands. Any imported action is replaced.
+    """
+    profile = FALL_PROFILES[fall_type]
+    frames = keyframe_times(*frame_range)
+    u = (frames - frames[0]) / max(frames[-1] - frames[0], 1.0)
+
+    base_location = (model.location.x + params['model_offset'][0],
+                     model.location.y + params['model_offset'][1],
+                     model.location.z)
+    location, rotation = root_trajectory(profile, u, base_location, math.radians(params['rotation']),
+                                         params['extra_rotation'] or 0.0)
+    # The fall rotation is in world axes, so it applies after the rest rotation
+    rotation = continuous(quaternion_multiply(euler_quaternions(rotation.astype(np.float64)),
+                                              rest_quaternion(model)))
+    root_channels = ([('location', index, 'Object Transforms') for index in range(3)]
+                     + [('rotation_quaternion', index, 'Object Transforms') for index in range(4)])
+    model.rotation_mode = 'QUATERNION'
+    write_action(model, f"{fall_type}_root", root_channels, frames,
+                 np.concatenate([location.T, rotation.T.astype(np.float32)]))
+
+    for name in roles:
+        armature.pose.bones[name].rotation_mode = 'QUATERNION'
+    channels, values = bone_channels(roles, joint_angles(profile, u, params['pose_bend'], params['pose_twist']))
+    write_action(armature, f"{fall_type}_pose", channels, frames, values)
@@ -0,0 +1,114 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+INDEX_NAME = 'index.jsonl'
+
+
+class FrameShardWriter:
+    """Writes clips into preallocated, memory-mapped (N, T, H, W, C) uint8 .npy shards
+
+    Each shard holds clips_per_shard clips of clip_frames frames. Shorter clips
+    are zero padded and the real length is stored in the index. A clip that
+    does not fit starts a new shard sized for it, which later shards keep, so
+    no frames are ever dropped. Every clip appends one JSON line to index.jsonl with the shard name,
+    slot, byte offset and metadata, so readers can slice clips without copying.
+    """
+    def __init__(self, shard_dir, clip_frames, clips_per_shard=256, prefix='shard'):
+        self.shard_dir = Path(shard_dir)
+        self.clip_frames = clip_frames
+        self.clips_per_shard = clips_per_shard
+        self.prefix = prefix
+        self.shard = None
+        self.shard_path = None
+        self.slot = 0
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+
+    def _next_shard_path(self):
+        # Never reopen shards from an earlier run, a resumed run starts new ones
+        number = 0
+        while (self.shard_dir / f"{self.prefix}-{number:04d}.npy").exists():
+            number += 1
+        return self.shard_dir / f"{self.prefix}-{number:04d}.npy"
+
+    def _open_shard(self, frame_shape):
+        self.close()
+        self.shard_path = self._next_shard_path()
+        shape = (self.clips_per_shard, self.clip_frames, *frame_shape)
+        self.shard = np.lib.format.open_memmap(self.shard_path, mode='w+', dtype=np.uint8, shape=shape)
+        self.slot = 0
+
+    def add(self, frames, metadata):
+        """Copy a (T, H, W, C) uint8 clip into the current shard and index it"""
+        if len(frames) > self.clip_frames:
+            print(f"Clip of {len(frames)} frames is longer than the shard length of {self.clip_frames}, "
+                  f"starting a longer shard")
+            self.clip_frames = len(frames)
+            self.close()
+        elif self.shard is not None and frames.shape[1:] != self.shard.shape[2:]:
+            self.close()
+        if self.shard is None or self.slot == self.clips_per_shard:
+            self._open_shard(frames.shape[1:])
+
+        length = len(frames)
+        self.shard[self.slot, :length] = frames
+        self.shard.flush()
+
+        clip_bytes = self.shard[0].nbytes
+        entry = {
+            'shard': self.shard_path.name,
+            'slot': self.slot,
+            'offset': self.shard.offset + self.slot * clip_bytes,
+            'length': length,
+            'shape': list(self.shard.shape[1:]),
+            **metadata,
+        }
+        with open(self.shard_dir / INDEX_NAME, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.slot += 1
+        return entry
+
+    def close(self):
+        if self.shard is not None:
+            self.shard.flush()
+            del self.shard
+            self.shard = None
+
+
+def load_index(shard_dir):
+    """Read the shard index, keeping the latest entry when a clip was written twice"""
+    entries = {}
+    with open(Path(shard_dir) / INDEX_NAME) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn line from an interrupted run
+            key = (entry.get('index'), entry.get('view'), entry.get('variant'))
+            entries[key] = entry
+    return list(entries.values())
+
+
+class FrameShardReader:
+    """Zero-copy access to clips written by FrameShardWriter"""
+    def __init__(self, shard_dir):
+        self.shard_dir = Path(shard_dir)
+        self.entries = load_index(shard_dir)
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, item):
+        """Return (frames, metadata); frames is a read-only view into the mapped shard"""
+        entry = self.entries[item]
+        shard = self._shards.get(entry['shard'])
+        if shard is None:
+            shard = np.load(self.shard_dir / entry['shard'], mmap_mode='r')
+            self._shards[entry['shard']] = shard
+        return shard[entry['slot'], :entry['length']], entry
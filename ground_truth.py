@@ -0,0 +1,176 @@
+import os
+from pathlib import Path
+
+import bpy
+import numpy as np
+
+# Fall onset is the first frame where the head has covered this fraction of its total drop
+FALL_ONSET_DROP = 0.1
+# Impact is the first frame where the head is within this fraction of its lowest point
+FALL_IMPACT_MARGIN = 0.05
+
+
+def ground_truth_path(output_path):
+    """Label file written next to a video, e.g. fall_scene_000.gt.npz"""
+    return Path(output_path).with_suffix('.gt.npz')
+
+
+def find_armature(model):
+    return next(obj for obj in model.children if obj.type == 'ARMATURE')
+
+
+def collect_bone_positions(armature, frames):
+    """World-space head and tail of every bone at every frame, as a (T, J, 2, 3) array
+
+    One pass over the animation: each frame is evaluated once and all bones
+    are read with two bulk foreach_get calls. Bone positions are in armature
+    space, so the armature's world matrix is stored per frame and applied to
+    the whole clip at once.
+    """
+    scene = bpy.context.scene
+    bones = armature.pose.bones
+    heads = np.empty((len(frames), len(bones), 3), dtype=np.float32)
+    tails = np.empty_like(heads)
+    world = np.empty((len(frames), 4, 4), dtype=np.float32)
+
+    current = scene.frame_current
+    for t, frame in enumerate(frames):
+        scene.frame_set(frame)
+        bones.foreach_get('head', heads[t].ravel())
+        bones.foreach_get('tail', tails[t].ravel())
+        world[t] = np.array(armature.matrix_world, dtype=np.float32)
+    scene.frame_set(current)
+
+    points = np.stack([heads, tails], axis=2)
+    homogeneous = np.concatenate([points, np.ones(points.shape[:-1] + (1,), dtype=np.float32)], axis=-1)
+    world_points = np.einsum('tij,tbkj->tbki', world, homogeneous)[..., :3]
+    return [bone.name for bone in bones], world_points
+
+
+def camera_matrix(camera, scene):
+    """3x4 matrix taking world coordinates to homogeneous clip space, and the image size"""
+    render = scene.render
+    width = render.resolution_x * render.resolution_percentage // 100
+    height = render.resolution_y * render.resolution_percentage // 100
+    projection = np.array(camera.calc_matrix_camera(bpy.context.evaluated_depsgraph_get(), x=width, y=height,
+                                                    scale_x=render.pixel_aspect_x, scale_y=render.pixel_aspect_y))
+    view = np.linalg.inv(np.array(camera.matrix_world))
+    return (projection @ view)[[0, 1, 3]].astype(np.float32), (width, height)
+
+
+def project_points(points, matrix, image_size):
+    """Project (..., 3) world points to pixel coordinates with the origin at the top left
+
+    Returns (xy, depth, visible), where visible marks points in front of the
+    camera and inside the image.
+    """
+    width, height = image_size
+    clip = points @ matrix[:, :3].T + matrix[:, 3]
+    depth = clip[..., 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ndc = clip[..., :2] / depth[..., None]
+    xy = np.stack([(ndc[..., 0] + 1.0) * 0.5 * width, (1.0 - ndc[..., 1]) * 0.5 * height], axis=-1)
+    visible = ((depth > 0) & (xy[..., 0] >= 0) & (xy[..., 0] < width)
+               & (xy[..., 1] >= 0) & (xy[..., 1] < height))
+    return xy.astype(np.float32), depth.astype(np.float32), visible
+
+
+def bounding_boxes(xy, depth, image_size):
+    """Per-frame (x0, y0, x1, y1) box around all keypoints in front of the camera, clipped to the image
+
+    Frames without any such keypoint get NaN. The box spans the skeleton, so
+    it is slightly tighter than the rendered silhouette.
+    """
+    width, height = image_size
+    points = xy.reshape(len(xy), -1, 2)
+    in_front = (depth > 0).reshape(len(depth), -1, 1)
+    low = np.where(in_front, points, np.inf).min(axis=1)
+    high = np.where(in_front, points, -np.inf).max(axis=1)
+    boxes = np.concatenate([np.clip(low, 0, [width, height]), np.clip(high, 0, [width, height])], axis=1)
+    boxes[~np.isfinite(low).all(axis=1)] = np.nan
+    return boxes.astype(np.float32)
+
+
+def head_index(bone_names, points):
+    """Bone tracking the head: one named like the head, else the highest bone in the first frame"""
+    for i, name in enumerate(bone_names):
+        if name.lower().split(':')[-1] == 'head':
+            return i
+    return int(points[0, :, 0, 2].argmax())
+
+
+def fall_events(points, head):
+    """Indices of the fall onset and impact frames, from the height of the head over time"""
+    height = points[:, head, 0, 2]
+    drop = height[0] - height.min()
+    if len(height) < 2 or drop <= 0:
+        return -1, -1
+    onset = int(np.argmax(height <= height[0] - FALL_ONSET_DROP * drop))
+    impact = int(np.argmax(height <= height.min() + FALL_IMPACT_MARGIN * drop))
+    return onset, impact
+
+
+def build_ground_truth(bone_names, points, camera, scene, frames):
+    """Labels of one camera view: 3D and 2D keypoints, visibility, boxes and fall events"""
+    matrix, image_size = camera_matrix(camera, scene)
+    xy, depth, visible = project_points(points, matrix, image_size)
+    onset, impact = fall_events(points, head_index(bone_names, points))
+    return {
+        'bone_names': np.array(bone_names),
+        'frames': np.asarray(frames, dtype=np.int32),
+        'fps': np.float32(scene.render.fps / scene.render.fps_base),
+        'image_size': np.array(image_size, dtype=np.int32),
+        'camera_matrix': matrix,
+        'keypoints_3d': points.astype(np.float32),  # (T, J, head/tail, xyz)
+        'keypoints_2d': xy,                          # (T, J, head/tail, xy) in pixels
+        'depth': depth,
+        'visible': visible,
+        'bbox': bounding_boxes(xy, depth, image_size),
+        'bbox_3d': np.stack([points.min(axis=(1, 2)), points.max(axis=(1, 2))], axis=1).astype(np.float32),
+        'fall_onset': np.int32(onset),
+        'fall_impact': np.int32(impact),
+    }
+
+
+def derive_ground_truth(labels, box, size, indices, fps):
+    """Labels of a clip derived from a rendered one by frame selection, a crop and a resize
+
+    indices selects the frames, box is the (x0, y0, width, height) crop of the
+    rendered image and size the (width, height) it was resized to. The crop
+    and resize are folded into the camera matrix, so the 2D keypoints,
+    visibility and boxes are projected exactly as for a direct render.
+    """
+    x0, y0, crop_width, crop_height = box
+    width, height = (int(value) for value in labels['image_size'])
+    matrix = labels['camera_matrix'].copy()
+    # NDC of the crop as an affine function of the rendered NDC, applied to the homogeneous rows
+    matrix[0] = width / crop_width * matrix[0] + ((width - 2 * x0) / crop_width - 1.0) * matrix[2]
+    matrix[1] = height / crop_height * matrix[1] + (1.0 - (height - 2 * y0) / crop_height) * matrix[2]
+
+    points = labels['keypoints_3d'][indices]
+    xy, depth, visible = project_points(points, matrix, size)
+    onset, impact = fall_events(points, head_index(list(labels['bone_names']), points))
+    return {
+        **labels,
+        'frames': labels['frames'][indices],
+        'fps': np.float32(fps),
+        'image_size': np.array(size, dtype=np.int32),
+        'camera_matrix': matrix,
+        'keypoints_3d': points,
+        'keypoints_2d': xy,
+        'depth': depth,
+        'visible': visible,
+        'bbox': bounding_boxes(xy, depth, size),
+        'bbox_3d': labels['bbox_3d'][indices],
+        'fall_onset': np.int32(onset),
+        'fall_impact': np.int32(impact),
+    }
+
+
+def save_ground_truth(path, ground_truth):
+    """Write labels atomically as a compressed NPZ file and return its size in bytes"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp_path, **ground_truth)
+    os.replace(tmp_path, path)
+    return path.stat().st_size
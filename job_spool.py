@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+# Job lifecycle: incoming -> running -> done | failed
+STATES = ('incoming', 'running', 'done', 'failed')
+
+# Creating this file in the spool asks every daemon to finish its current job and exit
+DRAIN_NAME = 'DRAIN'
+
+
+def write_json_atomic(path, data):
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists but belongs to another user
+    return True
+
+
+class JobSpool:
+    """Spool directory queue of render jobs shared by one or more daemons
+
+    A job is a JSON file. Submitting writes it to a temporary name and renames
+    it into incoming/, so a daemon never sees half a job. A daemon claims a job
+    by renaming it into running/ under its pid; the rename is atomic, so two
+    daemons on the same spool never claim the same job. Finished jobs move to
+    done/ or failed/ with a status record added.
+    """
+    def __init__(self, spool_dir):
+        self.spool_dir = Path(spool_dir)
+        for state in STATES:
+            (self.spool_dir / state).mkdir(parents=True, exist_ok=True)
+
+    def submit(self, spec):
+        """Queue a job spec and return its name; names sort in submission order"""
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json"
+        write_json_atomic(self.spool_dir / 'incoming' / name, spec)
+        return name
+
+    def claim(self):
+        """Move the oldest incoming job to running/ and return (name, spec), or None"""
+        for path in sorted((self.spool_dir / 'incoming').glob('*.json')):
+            running_path = self.spool_dir / 'running' / f"{os.getpid()}.{path.name}"
+            try:
+                os.rename(path, running_path)
+            except FileNotFoundError:
+                continue  # Claimed by another daemon
+            try:
+                with open(running_path) as f:
+                    return path.name, json.load(f)
+            except ValueError as e:
+                self.finish(path.name, {'status': 'failed', 'error': f"Unreadable job spec: {e}"})
+        return None
+
+    def finish(self, name, status, spec=None):
+        """Record a job's outcome in done/ or failed/ and release its running entry"""
+        running_path = self.spool_dir / 'running' / f"{os.getpid()}.{name}"
+        state = 'done' if status.get('status') == 'done' else 'failed'
+        write_json_atomic(self.spool_dir / state / name, {'job': spec, **status})
+        running_path.unlink(missing_ok=True)
+
+    def requeue_orphans(self):
+        """Return jobs claimed by daemons that are no longer running to incoming/"""
+        requeued = 0
+        for path in (self.spool_dir / 'running').glob('*.json'):
+            pid, _, name = path.name.partition('.')
+            if pid.isdigit() and not process_alive(int(pid)):
+                try:
+                    os.rename(path, self.spool_dir / 'incoming' / name)
+                    requeued += 1
+                except FileNotFoundError:
+                    pass
+        return requeued
+
+    def drain_requested(self):
+        return (self.spool_dir / DRAIN_NAME).exists()
+
+    def request_drain(self):
+        (self.spool_dir / DRAIN_NAME).touch()
+
+    def clear_drain(self):
+        (self.spool_dir / DRAIN_NAME).unlink(missing_ok=True)
+
+    def counts(self):
+        return {state: len(list((self.spool_dir / state).glob('*.json'))) for state in STATES}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Submit and inspect jobs of the synthetic fall render daemon')
+    parser.add_argument('--spool-dir', type=str, required=True, help='Spool directory watched by the daemon')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    submit = subparsers.add_parser('submit', help='Queue a render job')
+    submit.add_argument('--output-dir', type=str, required=True, help='Directory for the job output')
+    submit.add_argument('--model', type=str, default=None, help='Single FBX model to render')
+    submit.add_argument('--model-dir', type=str, default=None, help='Directory of FBX models to cycle through')
+    submit.add_argument('--manifest', type=str, default=None, help='Variation manifest (.npz) to render from')
+    submit.add_argument('--start', type=int, default=None, help='First manifest index of the slice')
+    submit.add_argument('--stop', type=int, default=None, help='End of the manifest slice (exclusive)')
+    submit.add_argument('--num-videos', type=int, default=None, help='Scenes to plan when no manifest is given')
+    submit.add_argument('--seed', type=int, default=None, help='Seed used when planning a manifest')
+    submit.add_argument('--options', type=str, default=None,
+                        help='JSON object of extra generator options, e.g. \'{"quality": "small"}\'')
+
+    subparsers.add_parser('status', help='Print the number of jobs in each state')
+    subparsers.add_parser('drain', help='Ask running daemons to finish their current job and exit')
+    subparsers.add_parser('resume', help='Clear a drain request')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    spool = JobSpool(args.spool_dir)
+
+    if args.command == 'submit':
+        spec = {key: value for key, value in {
+            'output_dir': os.path.abspath(args.output_dir),
+            'model': args.model and os.path.abspath(args.model),
+            'model_dir': args.model_dir and os.path.abspath(args.model_dir),
+            'manifest': args.manifest and os.path.abspath(args.manifest),
+            'start': args.start,
+            'stop': args.stop,
+            'num_videos': args.num_videos,
+            'seed': args.seed,
+            'options': json.loads(args.options) if args.options else None,
+        }.items() if value is not None}
+        print(f"Queued job {spool.submit(spec)}")
+    elif args.command == 'status':
+        for state, count in spool.counts().items():
+            print(f"{state:<9} {count}")
+        if spool.drain_requested():
+            print("Drain requested")
+    elif args.command == 'drain':
+        spool.request_drain()
+        print("Daemons will exit after their current job")
+    elif args.command == 'resume':
+        spool.clear_drain()
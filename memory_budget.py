@@ -0,0 +1,113 @@
+import os
+import sys
+
+import bpy
+
+from render_metrics import peak_rss_bytes
+
+# Exit code of a worker that stopped early to be restarted with a fresh
+# Blender process (EX_TEMPFAIL); run_synfall relaunches it with --resume
+RESTART_EXIT_CODE = 75
+
+# bpy.data collections a scene adds to: FBX imports bring meshes, armatures,
+# actions, materials and images, every scene rebuilds the ground and lights
+DATA_COLLECTIONS = ('objects', 'meshes', 'armatures', 'actions', 'materials', 'images', 'textures',
+                    'node_groups', 'cameras', 'lights', 'libraries')
+
+
+def current_rss_bytes():
+    """Resident set size of this process now, falling back to the peak where it cannot be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def datablock_counts():
+    """Number of datablocks in each tracked bpy.data collection"""
+    counts = {}
+    for name in DATA_COLLECTIONS:
+        collection = getattr(bpy.data, name, None)
+        if collection is not None:
+            counts[name] = len(collection)
+    return counts
+
+
+def purge_orphans():
+    """Delete every datablock without users, including ones only orphaned by other deletions"""
+    before = sum(datablock_counts().values())
+    if hasattr(bpy.data, "orphans_purge"):
+        bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    else:
+        # Blender before 3.0: remove orphans until a pass finds none
+        while True:
+            orphans = [block for name in DATA_COLLECTIONS if name not in ('objects', 'libraries')
+                       for block in getattr(bpy.data, name, []) if block.users == 0 and not block.use_fake_user]
+            if not orphans:
+                break
+            bpy.data.batch_remove(orphans)
+    return before - sum(datablock_counts().values())
+
+
+class MemoryBudget:
+    """Orphan purging and memory tracking between the scenes of one Blender process
+
+    Deleting objects leaves their meshes, materials, actions and images
+    behind, so after every scene the orphans are purged and the resident set
+    size and bpy.data collection sizes are sampled. Some growth survives any
+    purge (allocator fragmentation, caches inside Blender). Once RSS exceeds
+    max_rss_bytes or the process has rendered max_scenes scenes, the budget
+    is exhausted and the worker should stop after its current scene and be
+    restarted with a fresh process. It resumes from the progress journal.
+    """
+    def __init__(self, max_rss_bytes=None, max_scenes=None):
+        self.max_rss_bytes = max_rss_bytes
+        self.max_scenes = max_scenes
+        self.samples = []
+        self.purged = 0
+
+    def after_scene(self, index):
+        """Purge orphans and record a sample for scene index, returning it"""
+        purged = purge_orphans()
+        self.purged += purged
+        sample = {'index': index, 'rss_bytes': current_rss_bytes(), 'purged': purged, **datablock_counts()}
+        self.samples.append(sample)
+        return sample
+
+    @property
+    def exhausted(self):
+        if self.max_scenes is not None and len(self.samples) >= self.max_scenes:
+            return True
+        rss = self.samples[-1]['rss_bytes'] if self.samples else None
+        return self.max_rss_bytes is not None and rss is not None and rss > self.max_rss_bytes
+
+    def reason(self):
+        if self.max_scenes is not None and len(self.samples) >= self.max_scenes:
+            return f"rendered {len(self.samples)} scenes"
+        return f"RSS {self.samples[-1]['rss_bytes'] / 1024 ** 2:.0f} MB over {self.max_rss_bytes / 1024 ** 2:.0f} MB"
+
+    def report(self):
+        """Print the memory growth of this process and the collections that kept growing"""
+        if not self.samples:
+            return
+        first, last = self.samples[0], self.samples[-1]
+        if first['rss_bytes'] is not None:
+            print(f"Memory: RSS {first['rss_bytes'] / 1024 ** 2:.0f} MB after the first scene, "
+                  f"{last['rss_bytes'] / 1024 ** 2:.0f} MB after {len(self.samples)}, "
+                  f"{self.purged} orphan datablocks purged")
+        # Datablocks that survive the purge point at references that are never released
+        growing = [f"{name} +{last[name] - first[name]}" for name in DATA_COLLECTIONS
+                   if name in first and last[name] > first[name]]
+        if growing and len(self.samples) > 1:
+            print(f"  Datablocks still growing: {', '.join(growing)}")
+
+
+def restart_argv(argv=None):
+    """Command line that reruns this Blender process with --resume added to the script arguments"""
+    argv = list(sys.argv if argv is None else argv)
+    if '--' not in argv:
+        argv.append('--')
+    if '--resume' not in argv[argv.index('--') + 1:]:
+        argv.append('--resume')
+    return argv
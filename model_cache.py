@@ -0,0 +1,82 @@
+import bpy
+import os
+from pathlib import Path
+
+from cache_utils import evict_lru, file_fingerprint, touch
+
+# Custom property marking the object that load_model should return
+ROOT_PROPERTY = "synfall_root"
+
+
+class ModelCache:
+    """On-disk cache of imported FBX models stored as .blend libraries
+
+    Parsing a Mixamo FBX is one of the slowest non-render steps of a scene.
+    The first import of each file is saved to a .blend keyed on the FBX path,
+    mtime and size; later scenes append the objects from that .blend instead.
+    """
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def cache_path(self, filepath):
+        filepath = Path(filepath)
+        return self.cache_dir / f"{filepath.stem}-{file_fingerprint(filepath)}.blend"
+
+    def load(self, filepath):
+        """Add the model to the current scene and return its root object"""
+        blend_path = self.cache_path(filepath)
+        if blend_path.exists():
+            try:
+                root = self._append(blend_path)
+                touch(blend_path)
+                self.hits += 1
+                return root
+            except Exception as e:
+                print(f"Discarding unreadable model cache entry {blend_path}: {e}")
+                blend_path.unlink(missing_ok=True)
+
+        self.misses += 1
+        return self._import_and_store(filepath, blend_path)
+
+    def _import_and_store(self, filepath, blend_path):
+        bpy.ops.import_scene.fbx(filepath=str(filepath))
+        objects = list(bpy.context.selected_objects)
+        root = objects[0]
+        root[ROOT_PROPERTY] = True
+
+        # Write to a private temp file first so concurrent workers never
+        # append from a half-written library
+        tmp_path = blend_path.with_name(f"{blend_path.name}.{os.getpid()}.tmp")
+        bpy.data.libraries.write(str(tmp_path), set(objects), fake_user=True)
+        os.replace(tmp_path, blend_path)
+
+        evict_lru(self.cache_dir, self.max_bytes, pattern='*.blend', keep=[blend_path])
+        return root
+
+    def _append(self, blend_path):
+        with bpy.data.libraries.load(str(blend_path), link=False) as (data_from, data_to):
+            data_to.objects = data_from.objects
+
+        bpy.ops.object.select_all(action='DESELECT')
+        collection = bpy.context.scene.collection
+        root = None
+        for obj in data_to.objects:
+            if obj is None:
+                continue
+            collection.objects.link(obj)
+            obj.select_set(True)
+            if obj.get(ROOT_PROPERTY):
+                root = obj
+
+        if root is None:
+            raise RuntimeError("cached library has no root object")
+        return root
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        print(f"Model cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)")
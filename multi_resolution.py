@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+
+
+def master_resolution(resolutions):
+    """Smallest (width, height) from which every resolution is a center crop followed by a downscale
+
+    The master has the widest aspect ratio of the set and the height of the
+    tallest resolution, so narrower presets crop its sides. The width is
+    rounded up to an even number for H.264.
+    """
+    aspect = max(width / height for width, height in resolutions)
+    height = max(height for _, height in resolutions)
+    width = max(2 * math.ceil(height * aspect / 2), max(width for width, _ in resolutions))
+    return width, height
+
+
+def crop_box(width, height, out_width, out_height):
+    """(x0, y0, width, height) of the centered region of a frame with the aspect ratio of the output"""
+    if width * out_height > height * out_width:
+        crop_width, crop_height = min(width, round(height * out_width / out_height)), height
+    else:
+        crop_width, crop_height = width, min(height, round(width * out_height / out_width))
+    return (width - crop_width) // 2, (height - crop_height) // 2, crop_width, crop_height
+
+
+def area_weights(in_size, out_size):
+    """(out_size, in_size) matrix averaging the input pixels each output pixel covers, weighted by overlap
+
+    This is exact area averaging, which also anti-aliases when the ratio is
+    not an integer.
+    """
+    scale = in_size / out_size
+    edges = np.arange(out_size + 1) * scale
+    start, end = edges[:-1, None], edges[1:, None]
+    pixels = np.arange(in_size)[None, :]
+    overlap = np.clip(np.minimum(end, pixels + 1) - np.maximum(start, pixels), 0.0, None)
+    return (overlap / scale).astype(np.float32)
+
+
+def resize_area(frames, box, size):
+    """Crop a (T, H, W, C) clip to box and area-resample it to size (width, height)
+
+    Both axes are resampled for the whole clip at once with one matrix
+    product each. uint8 clips are rounded back to uint8, float clips stay
+    float32.
+    """
+    x0, y0, crop_width, crop_height = box
+    width, height = size
+    frames = frames[:, y0:y0 + crop_height, x0:x0 + crop_width]
+    if (crop_width, crop_height) == (width, height):
+        return np.ascontiguousarray(frames)
+    count, _, _, channels = frames.shape
+    rows = area_weights(crop_height, height) @ frames.astype(np.float32).reshape(count, crop_height, -1)
+    rows = rows.reshape(count, height, crop_width, channels).transpose(0, 1, 3, 2)
+    resized = (rows @ area_weights(crop_width, width).T).transpose(0, 1, 3, 2)
+    if frames.dtype != np.uint8:
+        return resized
+    return np.clip(np.rint(resized), 0, 255).astype(np.uint8)
+
+
+def decimation_indices(master_timing, timing):
+    """Index of the master frame nearest to every frame a render with timing would sample
+
+    Both timings come from compute_frame_timing over the same action. When
+    the frame step of timing is a multiple of the master's, the frames are
+    exactly the ones a direct render would produce; otherwise each is at
+    most half a master frame step away.
+    """
+    frames = np.arange(timing['frame_start'], timing['frame_end'] + 1, timing['frame_step'])
+    indices = np.rint((frames - master_timing['frame_start']) / master_timing['frame_step']).astype(np.int64)
+    return np.clip(indices, 0, master_timing['rendered_frames'] - 1)
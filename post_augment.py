@@ -0,0 +1,137 @@
+import numpy as np
+
+BLOCK_SIZE = 8
+
+# Standard JPEG luminance quantization table
+JPEG_QUANTIZATION = np.array([
+    [16, 11, 10, 16, 24, 40, 51, 61],
+    [12, 12, 14, 19, 26, 58, 60, 55],
+    [14, 13, 16, 24, 40, 57, 69, 56],
+    [14, 17, 22, 29, 51, 87, 80, 62],
+    [18, 22, 37, 56, 68, 109, 103, 77],
+    [24, 35, 55, 64, 81, 104, 113, 92],
+    [49, 64, 78, 87, 103, 121, 120, 101],
+    [72, 92, 95, 98, 112, 100, 103, 99],
+], dtype=np.float32)
+
+
+def _dct_matrix(n=BLOCK_SIZE):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+DCT = _dct_matrix()
+
+
+def sample_degradation(rng):
+    """Draw one set of surveillance-camera degradation parameters"""
+    return {
+        'blur_sigma': float(rng.uniform(0.0, 1.2)),
+        'gamma': float(rng.uniform(0.8, 1.25)),
+        'contrast': float(rng.uniform(0.8, 1.2)),
+        'brightness': float(rng.uniform(-0.08, 0.05)),
+        'gaussian_sigma': float(rng.uniform(0.0, 8.0)),  # In 0-255 pixel units
+        'shot_noise': float(rng.uniform(0.0, 0.5)),
+        'jpeg_quality': int(rng.integers(15, 60)),
+        'compression_gop': int(rng.integers(4, 13)),
+        'compression_depth': float(rng.uniform(0.0, 0.6)),
+        'frame_drop_rate': float(rng.uniform(0.0, 0.15)),
+    }
+
+
+def gaussian_blur(frames, sigma):
+    """Separable Gaussian blur over the H and W axes of a (T, H, W, C) float array"""
+    if sigma <= 0:
+        return frames
+    radius = max(1, int(np.ceil(2 * sigma)))
+    taps = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    taps = (taps / taps.sum()).astype(np.float32)
+
+    for axis in (1, 2):
+        padding = [(0, 0)] * frames.ndim
+        padding[axis] = (radius, radius)
+        padded = np.pad(frames, padding, mode='edge')
+        length = frames.shape[axis]
+        blurred = np.zeros_like(frames)
+        for offset, weight in enumerate(taps):
+            window = [slice(None)] * frames.ndim
+            window[axis] = slice(offset, offset + length)
+            blurred += weight * padded[tuple(window)]
+        frames = blurred
+    return frames
+
+
+def block_compress(frames, quality):
+    """JPEG-style 8x8 DCT quantization with a per-frame quality in [1, 100]"""
+    t, h, w, c = frames.shape
+    pad_h = -h % BLOCK_SIZE
+    pad_w = -w % BLOCK_SIZE
+    padded = np.pad(frames, [(0, 0), (0, pad_h), (0, pad_w), (0, 0)], mode='edge') - np.float32(128)
+
+    # (T, H, W, C) -> (T, C, blocks_y, blocks_x, 8, 8)
+    blocks = padded.reshape(t, (h + pad_h) // BLOCK_SIZE, BLOCK_SIZE,
+                            (w + pad_w) // BLOCK_SIZE, BLOCK_SIZE, c).transpose(0, 5, 1, 3, 2, 4)
+    coefficients = DCT @ blocks @ DCT.T
+
+    # Same quality-to-scale mapping as libjpeg
+    quality = np.clip(np.asarray(quality, dtype=np.float32), 1, 100)
+    scale = np.where(quality < 50, 50.0 / quality, 2.0 - quality / 50.0)
+    table = np.maximum(JPEG_QUANTIZATION * scale.reshape(t, 1, 1, 1, 1, 1), 1.0)
+    coefficients = np.round(coefficients / table) * table
+
+    blocks = DCT.T @ coefficients @ DCT
+    padded = blocks.transpose(0, 2, 4, 3, 5, 1).reshape(t, h + pad_h, w + pad_w, c)
+    return padded[:, :h, :w] + 128.0
+
+
+def drop_frames(frames, rate, rng):
+    """Replace dropped frames with the last delivered one, as a stalled stream would"""
+    dropped = rng.random(len(frames)) < rate
+    dropped[0] = False
+    source = np.where(dropped, 0, np.arange(len(frames)))
+    source = np.maximum.accumulate(source)
+    return frames[source]
+
+
+def degrade(frames, params, rng):
+    """Apply one degradation variant to a (T, H, W, C) uint8 clip
+
+    Only the RGB channels are degraded. An alpha channel is passed through
+    unchanged and only follows the dropped frames, so it stays aligned with
+    the colors for later compositing.
+    """
+    alpha = frames[..., 3:]
+    x = frames[..., :3].astype(np.float32)
+
+    x = gaussian_blur(x, params['blur_sigma'])
+
+    # Gamma, contrast and brightness in normalized intensity
+    x = np.clip(x / 255.0, 0.0, 1.0) ** params['gamma']
+    x = (x - 0.5) * params['contrast'] + 0.5 + params['brightness']
+    x = np.clip(x, 0.0, 1.0) * 255.0
+
+    # Signal-dependent shot noise plus sensor read noise
+    noise_std = np.sqrt(params['shot_noise'] * x + params['gaussian_sigma'] ** 2)
+    x = x + noise_std * rng.standard_normal(x.shape, dtype=np.float32)
+    x = np.clip(x, 0.0, 255.0)
+
+    # Quality sags towards the end of each group of pictures like a rate-limited encoder
+    position = np.arange(len(x)) % params['compression_gop'] / params['compression_gop']
+    quality = params['jpeg_quality'] * (1.0 - params['compression_depth'] * position)
+    x = block_compress(x, quality)
+
+    x = np.clip(np.round(x), 0, 255).astype(np.uint8)
+    if alpha.shape[-1]:
+        x = np.concatenate([x, alpha], axis=-1)
+    return drop_frames(x, params['frame_drop_rate'], rng)
+
+
+def degrade_variants(frames, count, seed):
+    """Yield (params, clip) for count reproducible degradation variants of one clip"""
+    for variant in range(count):
+        rng = np.random.default_rng([*seed, variant])
+        params = sample_degradation(rng)
+        yield params, degrade(frames, params, rng)
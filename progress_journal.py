@@ -0,0 +1,62 @@
+import json
+import os
+from pathlib import Path
+
+
+def partial_path(output_path, tag=None):
+    """Temporary path a scene renders to before it is renamed into place
+
+    A tag naming the worker keeps two hosts that render the same scene
+    (after a lease was stolen) from writing to the same temporary file.
+    """
+    output_path = Path(output_path)
+    tag = f".{tag}" if tag else ""
+    return output_path.with_name(f".{output_path.stem}{tag}.partial{output_path.suffix}")
+
+
+class ProgressJournal:
+    """Append-only record of completed scene indices
+
+    Each completed scene is one JSON line written after its output has been
+    renamed into place, so a line only exists for fully written videos. A
+    torn last line from a crash is ignored when the journal is read back.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.completed = self._read()
+
+    def _read(self):
+        completed = set()
+        if not self.path.exists():
+            return completed
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    completed.add(json.loads(line)['index'])
+                except (ValueError, KeyError):
+                    continue  # Partially written entry from an interrupted run
+
+        # Terminate a torn last line so the next entry starts on a line of its own
+        with open(self.path, 'rb+') as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+        return completed
+
+    def reset(self):
+        """Forget all progress, used when a run starts from scratch"""
+        self.path.unlink(missing_ok=True)
+        self.completed = set()
+
+    def is_complete(self, index):
+        return index in self.completed
+
+    def record(self, index, duration, output_bytes, **extra):
+        entry = {'index': index, 'duration': round(duration, 3), 'bytes': output_bytes, **extra}
+        # One write per line in append mode keeps concurrent workers from interleaving
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed.add(index)
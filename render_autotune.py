@@ -0,0 +1,175 @@
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import bpy
+import numpy as np
+
+# Frames rendered for every candidate configuration
+TUNE_FRAMES = 3
+
+# Largest mean absolute pixel difference (0-1) from the untuned render a candidate may have
+DEFAULT_TOLERANCE = 0.02
+
+# A candidate has to be this much faster than the current best to replace it,
+# so timing noise does not flip settings back and forth
+MIN_SPEEDUP = 0.03
+
+# Light-path limits tried on top of the engine's tuned bounces
+BOUNCE_PROFILES = {
+    'low': {'max_bounces': 2, 'diffuse_bounces': 1, 'glossy_bounces': 0, 'transmission_bounces': 0,
+            'volume_bounces': 0, 'transparent_max_bounces': 1},
+    'direct': {'max_bounces': 0, 'diffuse_bounces': 0, 'glossy_bounces': 0, 'transmission_bounces': 0,
+               'volume_bounces': 0, 'transparent_max_bounces': 1},
+}
+
+
+def candidate_options(fixed_threads=None):
+    """Values tried for every setting; None keeps what setup_render_settings configured
+
+    Settings are tuned one at a time in this order, keeping the best value of
+    each before moving on to the next. A fixed thread budget (parallel
+    workers) is never tuned.
+    """
+    cores = os.cpu_count() or 1
+    return {
+        'threads': [None] if fixed_threads else [None] + sorted({cores, max(1, cores // 2), max(1, cores // 4)}),
+        'tile_size': [None, 64, 32, 16],
+        'adaptive_threshold': [None, 0.0, 0.05, 0.1],  # 0 disables adaptive sampling
+        'denoiser': [None, 'NONE', 'OPENIMAGEDENOISE'],
+        'bounces': [None, 'low', 'direct'],
+        'persistent_data': [None, True],
+    }
+
+
+# Render settings apply_tuning may change, restored between candidates
+RENDER_PROPERTIES = ('threads_mode', 'threads', 'use_persistent_data', 'tile_x', 'tile_y')
+CYCLES_PROPERTIES = ('use_auto_tile', 'tile_size', 'use_adaptive_sampling', 'adaptive_threshold', 'use_denoising',
+                     'denoiser') + tuple(BOUNCE_PROFILES['low'])
+
+
+def snapshot_settings(scene):
+    """Current values of every setting the tuner touches"""
+    return {
+        'render': {name: getattr(scene.render, name) for name in RENDER_PROPERTIES if hasattr(scene.render, name)},
+        'cycles': {name: getattr(scene.cycles, name) for name in CYCLES_PROPERTIES if hasattr(scene.cycles, name)},
+    }
+
+
+def restore_settings(scene, snapshot):
+    for name, value in snapshot['render'].items():
+        setattr(scene.render, name, value)
+    for name, value in snapshot['cycles'].items():
+        setattr(scene.cycles, name, value)
+
+
+def apply_tuning(scene, config):
+    """Apply a tuned Cycles configuration on top of the preset settings"""
+    cycles = scene.cycles
+    if config.get('threads'):
+        scene.render.threads_mode = 'FIXED'
+        scene.render.threads = config['threads']
+    if config.get('tile_size'):
+        if hasattr(cycles, 'use_auto_tile'):
+            cycles.use_auto_tile = True
+            cycles.tile_size = config['tile_size']
+        else:  # Blender 2.9x tiles through render settings
+            scene.render.tile_x = scene.render.tile_y = config['tile_size']
+    if config.get('adaptive_threshold') is not None:
+        cycles.use_adaptive_sampling = config['adaptive_threshold'] > 0
+        if config['adaptive_threshold'] > 0:
+            cycles.adaptive_threshold = config['adaptive_threshold']
+    if config.get('denoiser') == 'NONE':
+        cycles.use_denoising = False
+    elif config.get('denoiser'):
+        cycles.use_denoising = True
+        cycles.denoiser = config['denoiser']
+    if config.get('bounces'):
+        for name, value in BOUNCE_PROFILES[config['bounces']].items():
+            setattr(cycles, name, value)
+    if config.get('persistent_data') is not None:
+        scene.render.use_persistent_data = config['persistent_data']
+
+
+def image_difference(frames, reference):
+    """Mean absolute difference of two uint8 clips, in 0-1 intensity"""
+    return float(np.abs(frames.astype(np.float32) - reference.astype(np.float32)).mean() / 255.0)
+
+
+def tuning_key(quality, engine, preset, threads):
+    """Cache key: a configuration only carries over to the same preset, machine and Blender"""
+    width, height = preset['resolution']
+    return (f"{quality}-{engine}-{width}x{height}-{preset['samples']}spp-threads{threads or 'auto'}-"
+            f"{platform.node()}-blender{bpy.app.version_string}")
+
+
+class RenderAutotuner:
+    """Picks the fastest Cycles configuration whose frames stay close to the untuned ones
+
+    render is a callable that renders the current scene's frame range and
+    returns its frames as a (T, H, W, C) uint8 array. Every candidate starts
+    from the untuned settings. Results are cached in a JSON file keyed by
+    tuning_key, so later runs apply them without tuning.
+    """
+    def __init__(self, cache_path, tolerance=DEFAULT_TOLERANCE):
+        self.cache_path = Path(cache_path)
+        self.tolerance = tolerance
+
+    def load(self, key):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f).get(key)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def store(self, key, entry):
+        """Add an entry to the cache file, keeping entries other processes wrote meanwhile"""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (FileNotFoundError, ValueError):
+            cache = {}
+        cache[key] = entry
+        tmp_path = self.cache_path.with_name(f".{self.cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def measure(self, scene, config, render, untuned):
+        restore_settings(scene, untuned)
+        apply_tuning(scene, config)
+        start = time.perf_counter()
+        frames = render()
+        return frames, time.perf_counter() - start
+
+    def tune(self, scene, render, options):
+        """Tune one setting at a time on the current scene and return (config, trials)"""
+        untuned = snapshot_settings(scene)
+        config = {name: None for name in options}
+        self.measure(scene, config, render, untuned)  # Warm-up: kernel loading and shader compilation
+        reference, best_time = self.measure(scene, config, render, untuned)
+        trials = [{'config': dict(config), 'seconds': best_time, 'difference': 0.0}]
+        print(f"Autotune baseline: {best_time:.3f} s for {len(reference)} frames")
+
+        for name, values in options.items():
+            for value in values:
+                if value == config[name]:
+                    continue
+                candidate = {**config, name: value}
+                frames, elapsed = self.measure(scene, candidate, render, untuned)
+                difference = image_difference(frames, reference) if frames.shape == reference.shape else 1.0
+                trials.append({'config': candidate, 'seconds': elapsed, 'difference': difference})
+                accepted = difference <= self.tolerance and elapsed < best_time * (1 - MIN_SPEEDUP)
+                print(f"  {name}={value}: {elapsed:.3f} s, difference {difference:.4f}"
+                      f"{' (kept)' if accepted else ''}")
+                if accepted:
+                    config, best_time = candidate, elapsed
+
+        restore_settings(scene, untuned)
+        changed = {name: value for name, value in config.items() if value is not None}
+        print(f"Autotune chose {changed or 'the untuned settings'} at {best_time:.3f} s "
+              f"({trials[0]['seconds'] / best_time:.2f}x the baseline)")
+        return config, trials
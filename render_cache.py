@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from cache_utils import evict_lru, file_fingerprint, touch
+
+# Bump whenever a change to scene building or rendering alters the output of
+# unchanged parameters, so stale renders stop matching
+GENERATOR_VERSION = 1
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def place_file(source, destination):
+    """Hard-link source to destination, copying across filesystems, replacing any existing file"""
+    destination = Path(destination)
+    if destination.exists() and os.path.samefile(source, destination):
+        return  # Already linked, and rename() would leave the temporary link behind
+    tmp_path = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+class RenderCache:
+    """Content-addressed store of rendered scene outputs
+
+    A scene's key hashes its resolved parameters, the contents of its model
+    file, the render settings and GENERATOR_VERSION. Every output file is
+    stored as <key>.<role>, e.g. <key>.view0.mp4, hard-linked to the output
+    when possible. A re-run after changing one lighting condition or one model
+    therefore only renders the scenes whose key changed. Entries are evicted
+    least recently used first.
+    """
+    def __init__(self, cache_dir, max_bytes=8 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.model_digests = {}  # file_fingerprint -> content digest, so each model is hashed once
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def model_digest(self, model_path):
+        fingerprint = file_fingerprint(model_path)
+        if fingerprint not in self.model_digests:
+            self.model_digests[fingerprint] = file_digest(model_path)
+        return self.model_digests[fingerprint]
+
+    def scene_key(self, model_path, settings):
+        """Hex key of a scene from its model file and a JSON-serializable dict of everything else"""
+        payload = json.dumps({'version': GENERATOR_VERSION, 'model': self.model_digest(model_path), **settings},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def entry_path(self, key, role):
+        return self.cache_dir / f"{key}.{role}"
+
+    def restore(self, key, outputs):
+        """Place the cached file of every {role: path} in outputs, returning their bytes or None on a miss"""
+        entries = {role: self.entry_path(key, role) for role in outputs}
+        if not all(path.exists() for path in entries.values()):
+            self.misses += 1
+            return None
+        output_bytes = 0
+        try:
+            for role, output_path in outputs.items():
+                place_file(entries[role], output_path)
+                touch(entries[role])
+                output_bytes += Path(output_path).stat().st_size
+        except FileNotFoundError:
+            # Evicted by another process in the meantime
+            for output_path in outputs.values():
+                Path(output_path).unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return output_bytes
+
+    def store(self, key, outputs):
+        """Add the files of a freshly rendered scene, then evict down to max_bytes"""
+        entries = [self.entry_path(key, role) for role in outputs]
+        try:
+            for role, output_path in outputs.items():
+                place_file(output_path, self.entry_path(key, role))
+        except OSError as e:
+            print(f"Error storing render cache entry {key}: {e}")
+            return
+        # Keys are hex, which leaves out the temporary files of concurrent writers
+        self.evicted += evict_lru(self.cache_dir, self.max_bytes, pattern='[0-9a-f]*', keep=entries)
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        print(f"Render cache: {self.hits} hits, {self.misses} renders ({rate:.0f}% hit rate), "
+              f"{self.evicted} files evicted")
@@ -0,0 +1,308 @@
+import bisect
+import csv
+import heapq
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import bpy
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Upper bounds in seconds of the per-frame render time histogram
+FRAME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SCENE_FIELDS = ['index', 'model', 'quality', 'engine', 'success', 'wall_seconds', 'render_seconds',
+                'encode_seconds', 'augment_seconds', 'frames', 'mean_frame_seconds', 'max_frame_seconds',
+                'output_bytes', 'peak_rss_bytes']
+FRAME_FIELDS = ['index', 'frame', 'seconds']
+
+# Seconds between rewrites of the exposition file; stop() always writes it
+EXPOSITION_INTERVAL = 15.0
+
+# Per-scene totals exported as counters, the per-scene values stay in scenes.csv
+TOTAL_FIELDS = (('wall_seconds', 'Wall time spent producing scenes.'),
+                ('render_seconds', 'Time spent rendering frames.'),
+                ('encode_seconds', 'Time spent encoding video outside of Blender.'),
+                ('augment_seconds', 'Time spent on augment variants and background composites.'),
+                ('output_bytes', 'Bytes written for scenes.'))
+
+# Slowest scenes kept in memory for report()
+SLOWEST_KEPT = 10
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, None where it cannot be measured"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def flatten_params(params):
+    """Turn scene parameters into flat scalar columns, e.g. camera_location -> camera_location_z"""
+    flat = {}
+    for name, value in params.items():
+        if name == 'cameras':
+            continue  # The first camera is already in camera_location/camera_rotation
+        if isinstance(value, (tuple, list)):
+            for axis, component in zip('xyz' if len(value) == 3 else range(len(value)), value):
+                flat[f"{name}_{axis}"] = component
+        else:
+            flat[name] = value
+    return flat
+
+
+def format_labels(labels):
+    values = (f"{value:.4g}" if isinstance(value, float) else str(value) for value in labels.values())
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+
+
+class RenderMetrics:
+    """Per-frame and per-scene render instrumentation through bpy.app.handlers
+
+    render_pre/render_post time every rendered frame. Each scene adds a row to
+    scenes.csv with its wall, render and encode times, peak RSS, output size
+    and variation parameters, and its frame times to frames.csv. A Prometheus
+    text exposition file with running counters and a frame-time histogram is
+    rewritten at most every EXPOSITION_INTERVAL seconds and when the run
+    stops, so its size and cost do not grow with the number of scenes.
+    Augment time includes background compositing and encoding the variant
+    MP4s.
+    """
+    def __init__(self, metrics_dir):
+        self.metrics_dir = Path(metrics_dir)
+        self.name = None
+        self.scene = None
+        self.memory = None  # Latest memory sample, see memory_budget
+        self._frame_start = None
+        self._frame = None
+        self._lock = threading.Lock()  # Pipelined scenes end on encoder threads
+        self._reset()
+
+    def _reset(self):
+        self.outcomes = {1: 0, 0: 0}
+        self.totals = {field: 0 for field, _ in TOTAL_FIELDS}
+        self.bucket_counts = [0] * len(FRAME_BUCKETS)  # Frames per bucket, cumulated when written
+        self.frame_count = 0
+        self.frame_sum = 0.0
+        self.peak_rss = None
+        self.slowest = []  # Min-heap of (wall_seconds, index, row)
+        self._written = None
+
+    def start(self, name='render', append=False):
+        """Register the render handlers and open the metric files of this run"""
+        self.name = name
+        self.memory = None
+        self._reset()
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        if not append:
+            for path in (self.scenes_path, self.frames_path, self.memory_path, self.exposition_path):
+                path.unlink(missing_ok=True)
+
+        handlers = bpy.app.handlers
+        handlers.render_pre.append(self._render_pre)
+        handlers.render_post.append(self._render_post)
+        handlers.render_complete.append(self._render_complete)
+        handlers.render_cancel.append(self._render_complete)
+
+    def stop(self):
+        if self.name is not None:
+            with self._lock:
+                self.write_exposition()
+        handlers = bpy.app.handlers
+        for handler_list, handler in ((handlers.render_pre, self._render_pre),
+                                      (handlers.render_post, self._render_post),
+                                      (handlers.render_complete, self._render_complete),
+                                      (handlers.render_cancel, self._render_complete)):
+            if handler in handler_list:
+                handler_list.remove(handler)
+        self.name = None
+
+    @property
+    def scenes_path(self):
+        return self.metrics_dir / f"{self.name}_scenes.csv"
+
+    @property
+    def frames_path(self):
+        return self.metrics_dir / f"{self.name}_frames.csv"
+
+    @property
+    def memory_path(self):
+        return self.metrics_dir / f"{self.name}_memory.csv"
+
+    @property
+    def exposition_path(self):
+        return self.metrics_dir / f"{self.name}.prom"
+
+    def _render_pre(self, scene, *args):
+        self._frame = scene.frame_current
+        self._frame_start = time.perf_counter()
+
+    def _render_post(self, scene, *args):
+        if self.scene is None or self._frame_start is None:
+            return
+        self.scene['frame_times'].append((self._frame, time.perf_counter() - self._frame_start))
+        self._frame_start = None
+
+    def _render_complete(self, scene, *args):
+        self._frame_start = None
+
+    def begin_scene(self, index, model, quality, engine, params):
+        self.scene = {
+            'index': index,
+            'model': model,
+            'quality': quality,
+            'engine': engine,
+            'params': flatten_params(params),
+            'start': time.perf_counter(),
+            'frame_times': [],
+            'encode_seconds': 0.0,
+            'augment_seconds': 0.0,
+        }
+
+    def add_time(self, stage, seconds):
+        """Attribute time spent outside of Blender's renderer, e.g. 'encode' or 'augment'"""
+        if self.scene is not None:
+            self.scene[f"{stage}_seconds"] += seconds
+
+    def detach_scene(self):
+        """Stop attributing frames to the current scene and return it, to end it once its encode finishes"""
+        scene, self.scene = self.scene, None
+        return scene
+
+    def end_scene(self, success, output_bytes=0, scene=None):
+        """Record the current scene, or a detached one, with the bytes written for it"""
+        if scene is None:
+            scene, self.scene = self.scene, None
+        if scene is None:
+            return None
+
+        frame_seconds = [seconds for _, seconds in scene['frame_times']]
+        row = {
+            'index': scene['index'],
+            'model': scene['model'],
+            'quality': scene['quality'],
+            'engine': scene['engine'],
+            'success': int(success),
+            'wall_seconds': time.perf_counter() - scene['start'],
+            'render_seconds': sum(frame_seconds),
+            'encode_seconds': scene['encode_seconds'],
+            'augment_seconds': scene['augment_seconds'],
+            'frames': len(frame_seconds),
+            'mean_frame_seconds': sum(frame_seconds) / len(frame_seconds) if frame_seconds else None,
+            'max_frame_seconds': max(frame_seconds, default=None),
+            'output_bytes': output_bytes,
+            'peak_rss_bytes': peak_rss_bytes(),
+            **scene['params'],
+        }
+        with self._lock:
+            self._count(row, frame_seconds)
+            if self.name is not None:
+                self._append_csv(self.scenes_path, list(row), [row])
+                self._append_csv(self.frames_path, FRAME_FIELDS,
+                                 [{'index': scene['index'], 'frame': frame, 'seconds': seconds}
+                                  for frame, seconds in scene['frame_times']])
+                self._maybe_write_exposition()
+        return row
+
+    def _count(self, row, frame_seconds):
+        """Add a scene to the running counters"""
+        self.outcomes[row['success']] += 1
+        for field, _ in TOTAL_FIELDS:
+            self.totals[field] += row[field] or 0
+        for seconds in frame_seconds:
+            bucket = bisect.bisect_left(FRAME_BUCKETS, seconds)
+            if bucket < len(FRAME_BUCKETS):
+                self.bucket_counts[bucket] += 1
+        self.frame_count += len(frame_seconds)
+        self.frame_sum += sum(frame_seconds)
+        if row['peak_rss_bytes'] is not None:
+            self.peak_rss = row['peak_rss_bytes']
+        if row['success']:
+            entry = (row['wall_seconds'], row['index'], row)
+            if len(self.slowest) < SLOWEST_KEPT:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    def record_memory(self, sample):
+        """Add the RSS and datablock counts sampled after a scene to memory.csv and the exposition"""
+        with self._lock:
+            self.memory = sample
+            if self.name is not None:
+                self._append_csv(self.memory_path, list(sample), [sample])
+                self._maybe_write_exposition()
+
+    def _append_csv(self, path, fields, rows):
+        new_file = not path.exists()
+        with open(path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def _maybe_write_exposition(self):
+        if self._written is None or time.monotonic() - self._written >= EXPOSITION_INTERVAL:
+            self.write_exposition()
+
+    def write_exposition(self):
+        """Rewrite the Prometheus text exposition file from the running counters of this run"""
+        run = {'run': self.name}
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                if value is not None:
+                    lines.append(f"{name}{suffix}{{{format_labels({**run, **labels})}}} {value}")
+
+        # Histogram of all frame render times in this run
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(FRAME_BUCKETS, self.bucket_counts):
+            cumulative += count
+            buckets.append(('_bucket', {'le': bound}, cumulative))
+        buckets.append(('_bucket', {'le': '+Inf'}, self.frame_count))
+        metric('synfall_frame_render_seconds', 'histogram', 'Render time of a single frame.',
+               buckets + [('_sum', {}, self.frame_sum), ('_count', {}, self.frame_count)])
+
+        metric('synfall_scenes_total', 'counter', 'Scenes attempted, by outcome.',
+               [('', {'success': str(bool(value)).lower()}, self.outcomes[value]) for value in (1, 0)])
+
+        # Per-scene values, labelled with the variation parameters, are in scenes.csv
+        for field, help_text in TOTAL_FIELDS:
+            metric(f"synfall_{field}_total", 'counter', help_text, [('', {}, self.totals[field])])
+        metric('synfall_peak_rss_bytes', 'gauge', 'Peak resident memory of the process after the last scene.',
+               [('', {}, self.peak_rss)])
+
+        if self.memory is not None:
+            metric('synfall_process_rss_bytes', 'gauge', 'Resident memory of the process after the last scene.',
+                   [('', {}, self.memory['rss_bytes'])])
+            metric('synfall_datablocks', 'gauge', 'Datablocks in bpy.data after the last scene, by collection.',
+                   [('', {'collection': name}, count) for name, count in self.memory.items()
+                    if name not in ('index', 'rss_bytes', 'purged')])
+
+        # Write to a temporary file first so a scraper never reads a half-written file
+        tmp_path = self.exposition_path.with_name(f".{self.exposition_path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.exposition_path)
+        self._written = time.monotonic()
+
+    def report(self, top=5):
+        """Print the slowest scenes of this run"""
+        if not self.slowest:
+            return
+        print(f"Slowest scenes (of {self.outcomes[1]}):")
+        for _, _, row in heapq.nlargest(top, self.slowest):
+            frames = f", {row['mean_frame_seconds']:.3f} s/frame" if row['mean_frame_seconds'] else ""
+            print(f"  scene {row['index']}: {row['wall_seconds']:.2f} s{frames}")
@@ -1,9 +1,17 @@
 import argparse
+import json
+import os
+import subprocess
+import shutil
+import socket
 import sys
+import time
+from pathlib import Path
 import bpy
+from memory_budget import RESTART_EXIT_CODE, restart_argv
 
 def parse_args():
-    argv = sys.argv[argv.index("--") + 1:] if "--" in sys.argv else []
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
 
     parser = argparse.ArgumentParser(description='Generate synthetic fall detection videos')
     parser.add_argument('--model-dir', type=str, required=True, help='Directory containing FBX models')
@@ -16,24 +24,332 @@ def parse_args():
                         choices=['minimal', 'low', 'medium', 'high'],
                         help='Level of variation in generated videos')
     parser.add_argument('--resolution', type=int, nargs=2, help='Custom resolution (width height)')
-    
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed for reproducible datasets')
+    parser.add_argument('--sampler', type=str, default='pairwise', choices=['random', 'pairwise', 'lhs'],
+                        help='How variation factors are combined: pairwise covering array, '
+                             'Latin hypercube or independent random draws')
+    parser.add_argument('--fall-motion', type=str, default='fbx', choices=['fbx', 'procedural'],
+                        help="Play the models' imported animation, or generate a fall of every planned fall type")
+    parser.add_argument('--coverage-target', type=float, default=None,
+                        help='Render only as many scenes as this fraction of pairwise coverage needs '
+                             '(1.0 for full coverage), overriding --num-videos')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of parallel Blender processes to render with')
+    parser.add_argument('--lease', action='store_true',
+                        help='Claim scenes through lease files in <output-dir>/leases, so processes on any host '
+                             'sharing the output directory split the work')
+    parser.add_argument('--lease-timeout', type=float, default=120.0,
+                        help='Seconds without a heartbeat before the leases of a dead worker are taken over')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Render threads per process (default: cores divided by workers)')
+    parser.add_argument('--model-cache-dir', type=str, default=None,
+                        help='Directory for cached .blend copies of FBX models (default: <output-dir>/.model_cache)')
+    parser.add_argument('--model-cache-size', type=int, default=2048,
+                        help='Maximum model cache size in MB before least recently used entries are evicted')
+    parser.add_argument('--no-model-cache', action='store_true',
+                        help='Import FBX files directly for every scene')
+    parser.add_argument('--render-cache', action='store_true',
+                        help='Reuse earlier renders of scenes whose parameters, model and settings are unchanged')
+    parser.add_argument('--render-cache-dir', type=str, default=None,
+                        help='Directory of cached renders (default: <output-dir>/.render_cache)')
+    parser.add_argument('--render-cache-size', type=int, default=8192,
+                        help='Maximum render cache size in MB before least recently used entries are evicted')
+    parser.add_argument('--persistent-scene', action='store_true',
+                        help='Build the ground, camera, light and compositor once and reuse them for every scene')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='Replay scene parameters from an existing manifest (.npz) instead of planning new ones')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip scenes recorded as complete in <output-dir>/progress.jsonl')
+    parser.add_argument('--max-rss', type=int, default=None,
+                        help='Restart a Blender process with a fresh one once its resident memory exceeds '
+                             'this many MB (default: no limit)')
+    parser.add_argument('--max-scenes-per-process', type=int, default=None,
+                        help='Restart a Blender process with a fresh one after this many scenes')
+    parser.add_argument('--engine', type=str, default=None,
+                        choices=['CYCLES', 'BLENDER_EEVEE', 'BLENDER_WORKBENCH'],
+                        help='Render engine (default: engine of the quality preset)')
+    parser.add_argument('--autotune', action='store_true',
+                        help='Benchmark Cycles settings on the first scene and keep the fastest within tolerance')
+    parser.add_argument('--autotune-tolerance', type=float, default=0.02,
+                        help='Largest mean absolute pixel difference (0-1) a tuned configuration may introduce')
+    parser.add_argument('--autotune-cache', type=str, default=None,
+                        help='JSON file of tuned settings per preset (default: <output-dir>/.autotune.json)')
+    parser.add_argument('--compare-engines', action='store_true',
+                        help='Render the same seeded scene with every engine and report seconds per frame')
+    parser.add_argument('--compare-frames', type=int, default=10,
+                        help='Number of frames rendered per engine in --compare-engines mode')
+    parser.add_argument('--augment-variants', type=int, default=0,
+                        help='Render clean frames once and write this many NumPy-degraded variants per scene')
+    parser.add_argument('--views', type=int, default=1,
+                        help='Render each scene from this many cameras, one labeled video per view')
+    parser.add_argument('--output-format', type=str, default='mp4', choices=['mp4', 'npy'],
+                        help='Write H.264 videos or raw uint8 frames into memory-mapped .npy shards')
+    parser.add_argument('--extra-qualities', type=str, nargs='+', default=[], choices=['tiny', 'small', 'medium'],
+                        help='Also write these quality presets to <output-dir>/<quality>/, cut from the same render '
+                             'by downscaling and frame decimation instead of rendering again')
+    parser.add_argument('--background-dir', type=str, default=None,
+                        help='Directory of background stills or clips; the person is rendered with alpha once and '
+                             'composited over several of them in NumPy')
+    parser.add_argument('--backgrounds-per-render', type=int, default=4,
+                        help='Number of background composites written per view with --background-dir')
+    parser.add_argument('--ground-truth', action='store_true',
+                        help='Write 2D/3D keypoints, bounding boxes and fall onset next to every video (.gt.npz)')
+    parser.add_argument('--also-mp4', action='store_true',
+                        help='With --output-format npy, also write MP4 videos for human review')
+    parser.add_argument('--encode-workers', type=int, default=0,
+                        help='Encode MP4s in this many background ffmpeg processes while the next scene renders')
+    parser.add_argument('--scratch-dir', type=str, default=None,
+                        help='Directory for frames awaiting encoding (default: /dev/shm if available)')
+    parser.add_argument('--scratch-limit', type=int, default=2048,
+                        help='Maximum MB of frames awaiting encoding before rendering pauses')
+    parser.add_argument('--clips-per-shard', type=int, default=256,
+                        help='Number of clips preallocated in each .npy shard')
+    parser.add_argument('--clip-frames', type=int, default=None,
+                        help='Minimum frames per clip slot in .npy shards (default: sized for the slowest fall); '
+                             'longer clips start a longer shard')
+    parser.add_argument('--tar-shards', action='store_true',
+                        help='Stream finished videos with a JSON sidecar of their parameters into '
+                             'WebDataset-style .tar shards in <output-dir>/tars')
+    parser.add_argument('--tar-shard-size', type=int, default=512,
+                        help='Maximum size of a .tar shard in MB')
+    parser.add_argument('--keep-videos', action='store_true',
+                        help='With --tar-shards, keep the loose video files after they are packed')
+
+    # Set by the parent process when launching parallel workers
+    parser.add_argument('--worker-index', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-count', type=int, default=1, help=argparse.SUPPRESS)
+
     return parser.parse_args(argv)
 
+def strip_option(argv, option):
+    """Remove an option and its value from an argument list"""
+    stripped = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == option:
+            skip = True
+        elif not arg.startswith(option + '='):
+            stripped.append(arg)
+    return stripped
+
+def worker_result_path(output_dir, worker_index):
+    # Hosts sharing an output directory in lease mode all number their workers from 0
+    return os.path.join(output_dir, f".worker_{socket.gethostname()}_{worker_index}.json")
+
+def plan_shared_manifest(args):
+    """Plan the manifest every worker replays, or reuse the one already there, and return its path"""
+    manifest_path = args.manifest
+    default_manifest = os.path.join(args.output_dir, 'manifest.npz')
+    if manifest_path is None and (args.resume or args.lease) and os.path.exists(default_manifest):
+        manifest_path = default_manifest
+    elif manifest_path is None:
+        from synfall_settings import level_variations
+        from variation_manifest import plan_manifest, publish_manifest, report_coverage, resolve_seed, save_manifest
+        from variation_sampler import scenes_for_coverage
+
+        variations = level_variations(args.variation, args.fall_motion)
+        num_models = len(list(Path(args.model_dir).glob('*.fbx')))
+        seed = resolve_seed(args.seed)
+        if args.coverage_target is not None:
+            args.num_videos = scenes_for_coverage(variations, num_models, seed, args.coverage_target)
+            print(f"Planning {args.num_videos} scenes for {args.coverage_target:.0%} pairwise coverage")
+        manifest_path = default_manifest
+        manifest = plan_manifest(variations, args.num_videos, num_models, seed, args.views, args.sampler)
+        if args.lease:
+            # Another host may be planning at the same moment; the first manifest written wins
+            manifest = publish_manifest(manifest_path, manifest)
+        else:
+            save_manifest(manifest_path, manifest)
+        report_coverage(manifest, variations, num_models)
+
+    if args.coverage_target is not None or args.lease:
+        from variation_manifest import load_manifest, manifest_length
+
+        # Workers split the scenes by --num-videos, so pass on the count the manifest holds
+        args.num_videos = manifest_length(load_manifest(manifest_path))
+    return manifest_path
+
+def run_workers(args):
+    """Launch one background Blender process per worker and gather their results"""
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    argv = strip_option(argv, '--workers')
+    argv = strip_option(argv, '--threads')
+    argv = strip_option(argv, '--manifest')
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    from progress_journal import ProgressJournal
+
+    # Workers only append to the journal, so a fresh run clears it here. Lease
+    # mode never does: other hosts may be writing to the same directory.
+    if not args.resume and not args.lease:
+        ProgressJournal(os.path.join(args.output_dir, 'progress.jsonl')).reset()
+        # Workers name their metric files by slice, drop those of an earlier split
+        shutil.rmtree(os.path.join(args.output_dir, 'metrics'), ignore_errors=True)
+
+    # Plan once in the parent so every worker replays the same manifest
+    manifest_path = plan_shared_manifest(args)
+    argv = strip_option(argv, '--num-videos') + ['--num-videos', str(args.num_videos)]
+
+    processes = []
+    for worker_index in range(args.workers):
+        result_path = worker_result_path(args.output_dir, worker_index)
+        if os.path.exists(result_path):
+            os.remove(result_path)
+
+        command = [
+            bpy.app.binary_path, '-b', '-P', os.path.abspath(__file__), '--',
+            *argv,
+            '--threads', str(threads),
+            '--manifest', manifest_path,
+            '--worker-index', str(worker_index),
+            '--worker-count', str(args.workers),
+        ]
+        print(f"Starting worker {worker_index + 1}/{args.workers} with {threads} threads")
+        processes.append((command, subprocess.Popen(command)))
+
+    worker_successful = [0] * args.workers
+    cache_hits = cache_misses = 0
+    render_hits = render_misses = 0
+    restarts = 0
+    running = dict(enumerate(processes))
+    while running:
+        for worker_index, (command, process) in list(running.items()):
+            returncode = process.poll()
+            if returncode is None:
+                continue
+            del running[worker_index]
+            result_path = worker_result_path(args.output_dir, worker_index)
+            if os.path.exists(result_path):
+                with open(result_path) as f:
+                    result = json.load(f)
+                if args.lease:
+                    worker_successful[worker_index] += result['successful']
+                else:
+                    # A restarted worker resumes its slice and counts the scenes done before again
+                    worker_successful[worker_index] = result['successful']
+                cache_hits += result.get('cache_hits', 0)
+                cache_misses += result.get('cache_misses', 0)
+                render_hits += result.get('render_cache_hits', 0)
+                render_misses += result.get('render_cache_misses', 0)
+                os.remove(result_path)
+            elif returncode != RESTART_EXIT_CODE:
+                print(f"Worker {worker_index} exited with code {returncode} without reporting results")
+            if returncode == RESTART_EXIT_CODE:
+                # Over its memory or scene budget: a fresh process picks up from the journal
+                command = restart_argv(command)
+                running[worker_index] = (command, subprocess.Popen(command))
+                restarts += 1
+                print(f"Restarted worker {worker_index} with a fresh Blender process")
+        if running:
+            time.sleep(1.0)
+    successful = sum(worker_successful)
+
+    if args.lease:
+        print(f"Generation complete. Successfully generated {successful} scenes on this host.")
+    else:
+        print(f"Generation complete. Successfully generated {successful}/{args.num_videos} scenes.")
+    print(f"Variation level: {args.variation}")
+    if restarts:
+        print(f"Workers were restarted {restarts} times to stay within their memory budget")
+    if not args.no_model_cache:
+        print(f"Model cache: {cache_hits} hits, {cache_misses} misses")
+    if args.render_cache:
+        print(f"Render cache: {render_hits} hits, {render_misses} renders")
+
 if __name__ == "__main__":
     args = parse_args()
-    
-    from synthetic_fall_generator import SyntheticFallGenerator
-    
+
+    if args.workers > 1 and args.worker_index is None and not args.compare_engines:
+        run_workers(args)
+        sys.exit(0)
+
+    from synthetic_fall_generator import SyntheticFallGenerator, shard_indices
+    from work_lease import LeaseBoard
+
+    leases = None
+    if args.lease and not args.compare_engines:
+        if args.worker_index is None:
+            args.manifest = plan_shared_manifest(args)
+        leases = LeaseBoard(os.path.join(args.output_dir, 'leases'), args.lease_timeout)
+
     # Initialize generator with new options
     generator = SyntheticFallGenerator(
         model_dir=args.model_dir,
         output_dir=args.output_dir,
         quality=args.quality,
         num_videos=args.num_videos,
-        variation_level=args.variation
+        variation_level=args.variation,
+        seed=args.seed,
+        threads=args.threads,
+        model_cache_dir=args.model_cache_dir,
+        model_cache_size=args.model_cache_size,
+        use_model_cache=not args.no_model_cache,
+        persistent_scene=args.persistent_scene,
+        manifest_path=args.manifest,
+        resume=args.resume,
+        engine=args.engine,
+        augment_variants=args.augment_variants,
+        views=args.views,
+        output_format=args.output_format,
+        also_mp4=args.also_mp4,
+        clips_per_shard=args.clips_per_shard,
+        clip_frames=args.clip_frames,
+        sampler=args.sampler,
+        coverage_target=args.coverage_target,
+        export_ground_truth=args.ground_truth,
+        autotune=args.autotune,
+        autotune_tolerance=args.autotune_tolerance,
+        autotune_cache=args.autotune_cache,
+        encode_workers=args.encode_workers,
+        scratch_dir=args.scratch_dir,
+        scratch_limit=args.scratch_limit,
+        use_render_cache=args.render_cache,
+        render_cache_dir=args.render_cache_dir,
+        render_cache_size=args.render_cache_size,
+        fall_motion=args.fall_motion,
+        max_rss=args.max_rss,
+        max_scenes_per_process=args.max_scenes_per_process,
+        tar_shards=args.tar_shards,
+        tar_shard_size=args.tar_shard_size,
+        keep_videos=args.keep_videos,
+        derived_qualities=args.extra_qualities,
+        background_dir=args.background_dir,
+        backgrounds_per_render=args.backgrounds_per_render
     )
-    
+
     if args.resolution:
         generator.resolution = tuple(args.resolution)
-    
-    generator.generate_dataset() 
\ No newline at end of file
+
+    if args.compare_engines:
+        generator.compare_engines(frames=args.compare_frames)
+    elif args.worker_index is None:
+        generator.generate_dataset(leases=leases)
+        if generator.restart_requested:
+            # Replace this process with a fresh Blender that resumes from the journal
+            sys.stdout.flush()
+            os.execv(bpy.app.binary_path, restart_argv())
+    else:
+        if leases is not None:
+            # Workers claim scenes from the whole range instead of a fixed slice
+            successful = generator.generate_dataset(leases=leases)
+            total = leases.claimed
+        else:
+            indices = shard_indices(args.num_videos, args.worker_index, args.worker_count)
+            successful = generator.generate_dataset(indices)
+            total = len(indices)
+        result = {'successful': successful, 'total': total}
+        if generator.model_cache is not None:
+            result['cache_hits'] = generator.model_cache.hits
+            result['cache_misses'] = generator.model_cache.misses
+        if generator.render_cache is not None:
+            result['render_cache_hits'] = generator.render_cache.hits
+            result['render_cache_misses'] = generator.render_cache.misses
+        with open(worker_result_path(args.output_dir, args.worker_index), 'w') as f:
+            json.dump(result, f)
+        if generator.restart_requested:
+            sys.exit(RESTART_EXIT_CODE)
@@ -0,0 +1,193 @@
+import argparse
+import signal
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from job_spool import JobSpool
+from memory_budget import RESTART_EXIT_CODE, current_rss_bytes
+from synthetic_fall_generator import SyntheticFallGenerator
+from variation_manifest import load_manifest, manifest_length
+
+# Generator keyword arguments a job spec may override through its "options"
+JOB_OPTIONS = {
+    'quality', 'variation_level', 'resolution', 'engine', 'views', 'augment_variants', 'output_format',
+    'also_mp4', 'clips_per_shard', 'clip_frames', 'resume', 'persistent_scene', 'sampler', 'coverage_target',
+    'export_ground_truth', 'autotune', 'autotune_tolerance', 'autotune_cache', 'encode_workers', 'scratch_dir',
+    'scratch_limit', 'use_render_cache', 'render_cache_dir', 'render_cache_size', 'fall_motion', 'tar_shards',
+    'tar_shard_size', 'keep_videos', 'derived_qualities', 'background_dir', 'backgrounds_per_render',
+}
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(description='Render queued synthetic fall jobs in one long-lived Blender process')
+    parser.add_argument('--spool-dir', type=str, required=True,
+                        help='Spool directory to take jobs from (see job_spool.py)')
+    parser.add_argument('--model-dir', type=str, default=None,
+                        help='Default directory of FBX models for jobs that do not name one')
+    parser.add_argument('--quality', type=str, default='tiny', choices=['tiny', 'small', 'medium'],
+                        help='Default video quality preset')
+    parser.add_argument('--variation', type=str, default='medium',
+                        choices=['minimal', 'low', 'medium', 'high'],
+                        help='Default level of variation')
+    parser.add_argument('--engine', type=str, default=None,
+                        choices=['CYCLES', 'BLENDER_EEVEE', 'BLENDER_WORKBENCH'],
+                        help='Default render engine (default: engine of the quality preset)')
+    parser.add_argument('--threads', type=int, default=None, help='Render threads (default: auto-detect)')
+    parser.add_argument('--model-cache-dir', type=str, default=None,
+                        help='Model cache shared by all jobs (default: <spool-dir>/.model_cache)')
+    parser.add_argument('--model-cache-size', type=int, default=2048,
+                        help='Maximum model cache size in MB')
+    parser.add_argument('--no-model-cache', action='store_true', help='Import FBX files directly for every scene')
+    parser.add_argument('--persistent-scene', action='store_true',
+                        help='Keep the ground, camera, light and compositor between scenes and jobs')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds between checks of an empty queue')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='Exit after the queue has been empty for this many seconds (default: never)')
+    parser.add_argument('--max-rss', type=int, default=None,
+                        help=f'Exit with code {RESTART_EXIT_CODE} after a job once resident memory exceeds this '
+                             'many MB, for a supervisor to restart the daemon (default: no limit)')
+
+    return parser.parse_args(argv)
+
+class GenerationDaemon:
+    """Renders jobs from a spool directory without restarting Blender between them
+
+    Blender start-up and module imports are paid once. Every job gets a fresh
+    SyntheticFallGenerator, while the model cache and, with persistent_scene,
+    the static rig carry over between jobs. SIGTERM, SIGINT or a DRAIN file in
+    the spool let the current job finish and then exit.
+    """
+    def __init__(self, spool, defaults, poll_interval=1.0, idle_timeout=None, max_rss=None):
+        self.spool = spool
+        self.defaults = defaults
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.max_rss_bytes = max_rss * 1024 * 1024 if max_rss else None
+        self.restart_requested = False
+        self.draining = False
+        self.jobs_done = 0
+
+    def request_drain(self, signum, frame):
+        print(f"Received signal {signum}, exiting after the current job")
+        self.draining = True
+
+    def build_generator(self, spec):
+        """Create a generator for one job spec, returning it with the manifest indices to render"""
+        options = dict(spec.get('options') or {})
+        unknown = set(options) - JOB_OPTIONS
+        if unknown:
+            raise ValueError(f"Unsupported job options: {', '.join(sorted(unknown))}")
+        if 'resolution' in options:
+            options['resolution'] = tuple(options['resolution'])
+
+        kwargs = {**self.defaults, **options}
+        if spec.get('model'):
+            kwargs['model_files'] = [spec['model']]
+            kwargs['model_dir'] = str(Path(spec['model']).parent)
+        elif spec.get('model_dir'):
+            kwargs['model_dir'] = spec['model_dir']
+        if kwargs.get('model_dir') is None:
+            raise ValueError("Job names no model or model_dir and the daemon has no --model-dir")
+
+        num_videos = spec.get('num_videos')
+        if spec.get('manifest'):
+            kwargs['manifest_path'] = spec['manifest']
+            if num_videos is None:
+                num_videos = manifest_length(load_manifest(spec['manifest']))
+        if num_videos is None:
+            num_videos = spec['stop'] if spec.get('stop') is not None else 10
+
+        indices = None
+        if spec.get('start') is not None or spec.get('stop') is not None:
+            indices = range(spec.get('start') or 0, spec['stop'] if spec.get('stop') is not None else num_videos)
+            # Without a manifest, a coverage target settles the scene count only once planned
+            known = spec.get('manifest') or not kwargs.get('coverage_target')
+            if indices.start < 0 or indices.stop < indices.start or (known and indices.stop > num_videos):
+                raise ValueError(f"Job range {indices.start}-{indices.stop} lies outside its "
+                                 f"{num_videos} scene manifest")
+
+        generator = SyntheticFallGenerator(output_dir=spec['output_dir'], num_videos=num_videos,
+                                           seed=spec.get('seed'), **kwargs)
+        return generator, indices
+
+    def run_job(self, name, spec):
+        """Render one job and return its status record"""
+        started = time.time()
+        status = {'started': started}
+        try:
+            generator, indices = self.build_generator(spec)
+            successful = generator.generate_dataset(indices)
+            # A coverage target settles num_videos only once the manifest is planned
+            total = len(indices) if indices is not None else generator.num_videos
+            status.update({
+                'status': 'done' if successful == total else 'failed',
+                'successful': successful,
+                'total': total,
+            })
+            if successful != total:
+                status['error'] = f"{total - successful} of {total} scenes failed"
+        except Exception as e:
+            traceback.print_exc()
+            status.update({'status': 'failed', 'error': f"{type(e).__name__}: {e}"})
+
+        status['finished'] = time.time()
+        status['duration'] = round(status['finished'] - started, 3)
+        print(f"Job {name} {status['status']} in {status['duration']:.1f} s")
+        return status
+
+    def serve(self):
+        requeued = self.spool.requeue_orphans()
+        if requeued:
+            print(f"Requeued {requeued} jobs left running by exited daemons")
+
+        print(f"Waiting for jobs in {self.spool.spool_dir / 'incoming'}")
+        idle_since = time.monotonic()
+        while not self.draining and not self.spool.drain_requested():
+            job = self.spool.claim()
+            if job is None:
+                if self.idle_timeout is not None and time.monotonic() - idle_since > self.idle_timeout:
+                    print(f"Queue idle for {self.idle_timeout:g} s")
+                    break
+                time.sleep(self.poll_interval)
+                continue
+
+            name, spec = job
+            print(f"Starting job {name}: {spec.get('output_dir')}")
+            self.spool.finish(name, self.run_job(name, spec), spec)
+            self.jobs_done += 1
+            idle_since = time.monotonic()
+
+            # Memory Blender never gives back builds up over many jobs; a fresh process starts clean
+            rss = current_rss_bytes()
+            if self.max_rss_bytes is not None and rss is not None and rss > self.max_rss_bytes:
+                print(f"RSS {rss / 1024 ** 2:.0f} MB over the {self.max_rss_bytes / 1024 ** 2:.0f} MB budget")
+                self.restart_requested = True
+                break
+
+        print(f"Daemon exiting after {self.jobs_done} jobs")
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    spool = JobSpool(args.spool_dir)
+    defaults = {
+        'model_dir': args.model_dir,
+        'quality': args.quality,
+        'variation_level': args.variation,
+        'engine': args.engine,
+        'threads': args.threads,
+        'model_cache_dir': args.model_cache_dir or Path(args.spool_dir) / '.model_cache',
+        'model_cache_size': args.model_cache_size,
+        'use_model_cache': not args.no_model_cache,
+        'persistent_scene': args.persistent_scene,
+    }
+    daemon = GenerationDaemon(spool, defaults, args.poll_interval, args.idle_timeout, args.max_rss)
+    signal.signal(signal.SIGTERM, daemon.request_drain)
+    signal.signal(signal.SIGINT, daemon.request_drain)
+    daemon.serve()
+    if daemon.restart_requested:
+        sys.exit(RESTART_EXIT_CODE)
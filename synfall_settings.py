@@ -0,0 +1,210 @@
+# Quality presets and variation tables shared by the generator and the planning
+# tools. Kept free of bpy so scene parameters can be planned outside Blender.
+
+# Frame rate of the Mixamo source animations (FBX export setting)
+SOURCE_FPS = 30
+
+# Length of the fall clip when a model carries no action (3 seconds at 30fps)
+DEFAULT_ACTION_FRAMES = (0, 90)
+
+# 'fbx' plays the animation imported with the model, 'procedural' replaces it
+# with a generated fall of the planned fall type (see fall_motion.py)
+FALL_MOTIONS = ('fbx', 'procedural')
+
+# Updated quality presets optimized for surveillance footage
+QUALITY_PRESETS = {
+    'tiny': {
+        'resolution': (64, 64),
+        'fps': 5,
+        'noise': True,
+        'samples': 4,
+        'compression': 'HIGHEST',
+        'engine': 'CYCLES'
+    },
+    'small': {
+        'resolution': (128, 128),
+        'fps': 8,
+        'noise': True,
+        'samples': 8,
+        'compression': 'HIGH',
+        'engine': 'CYCLES'
+    },
+    'medium': {
+        'resolution': (160, 120),
+        'fps': 10,
+        'noise': True,
+        'samples': 16,
+        'compression': 'HIGH',
+        'engine': 'CYCLES'
+    }
+}
+
+# Per-engine settings tuned for tiny surveillance-style renders
+ENGINE_SETTINGS = {
+    'CYCLES': {
+        'denoise': True,
+        'max_bounces': 4,
+        'diffuse_bounces': 2,
+        'glossy_bounces': 1,
+        'transmission_bounces': 0,
+        'volume_bounces': 0,
+        'transparent_max_bounces': 2
+    },
+    'BLENDER_EEVEE': {
+        'denoise': False,  # EEVEE converges through temporal AA samples instead
+        'use_gtao': False,
+        'use_bloom': False,
+        'use_ssr': False,
+        'use_soft_shadows': False,
+        'shadow_cube_size': '512',
+        'shadow_cascade_size': '512'
+    },
+    'BLENDER_WORKBENCH': {
+        'denoise': False,
+        'render_aa': 'FXAA',
+        'lighting': 'STUDIO'
+    }
+}
+
+# Add variation settings
+VARIATION_SETTINGS = {
+    # Character variations
+    'rotations': [-45, -30, -15, 0, 15, 30, 45],  # More rotation angles
+    'initial_poses': [
+        {'bend': 0.0, 'twist': 0.0},    # Standing straight
+        {'bend': 0.1, 'twist': 0.1},    # Slightly bent
+        {'bend': -0.1, 'twist': -0.1},  # Leaning back
+    ],
+
+    # Fall variations
+    'fall_speeds': [0.6, 0.8, 1.0, 1.2, 1.5],  # More speed options
+    'fall_types': [
+        'forward_straight',
+        'forward_twist',
+        'backward_simple',
+        'backward_sit',
+        'sideways_left',
+        'sideways_right',
+        'stumble_forward',
+        'stumble_backward',
+        'collapse_vertical'
+    ],
+
+    # Environment variations
+    'camera_heights': [2, 3, 4, 5, 6],  # More height options
+    'camera_angles': [
+        (1.0, 0, 0),      # Front view
+        (1.1, 0.5, 0),    # Side-front right
+        (1.1, -0.5, 0),   # Side-front left
+        (1.2, 0.8, 0),    # Side right
+        (1.2, -0.8, 0),   # Side left
+        (0.8, 0, 0),      # High angle
+        (1.4, 0, 0),      # Low angle
+    ],
+
+    # Lighting variations
+    'lighting_conditions': [
+        {'energy': 1.5, 'color': (1, 1, 1)},        # Bright daylight
+        {'energy': 1.2, 'color': (1, 0.95, 0.8)},   # Warm light
+        {'energy': 0.8, 'color': (0.9, 0.9, 0.8)},  # Dim indoor
+        {'energy': 0.5, 'color': (0.8, 0.8, 0.9)},  # Dark area
+        {'energy': 0.3, 'color': (0.7, 0.7, 1.0)},  # Night time
+    ],
+
+    # Ground variations
+    'ground_materials': [
+        {'color': (0.2, 0.2, 0.2), 'roughness': 0.8},  # Concrete
+        {'color': (0.3, 0.2, 0.1), 'roughness': 0.9},  # Wood
+        {'color': (0.4, 0.4, 0.4), 'roughness': 0.7},  # Tile
+        {'color': (0.15, 0.15, 0.15), 'roughness': 0.6}  # Smooth floor
+    ],
+}
+
+# Variation levels configuration
+VARIATION_LEVELS = {
+    'minimal': {
+        'rotations': [0],  # No rotation
+        'camera_heights': [4],  # Fixed height
+        'camera_angles': [(1.0, 0, 0)],  # Front only
+        'lighting_conditions': [{'energy': 1.0, 'color': (1, 1, 1)}],  # Standard lighting
+        'fall_speeds': [1.0],  # Normal speed
+        'ground_materials': [{'color': (0.2, 0.2, 0.2), 'roughness': 0.8}],  # Basic ground
+        'use_noise': False,
+        'position_range': 0.5,
+        'rotation_chance': 0
+    },
+    'low': {
+        'rotations': [-15, 0, 15],
+        'camera_heights': [3, 4],
+        'camera_angles': [(1.0, 0, 0), (1.1, 0.5, 0)],
+        'lighting_conditions': [
+            {'energy': 1.2, 'color': (1, 1, 1)},
+            {'energy': 0.8, 'color': (0.9, 0.9, 0.9)}
+        ],
+        'fall_speeds': [0.8, 1.0, 1.2],
+        'ground_materials': [
+            {'color': (0.2, 0.2, 0.2), 'roughness': 0.8},
+            {'color': (0.3, 0.2, 0.1), 'roughness': 0.9}
+        ],
+        'use_noise': True,
+        'position_range': 1.0,
+        'rotation_chance': 0.1
+    },
+    'medium': {
+        'rotations': [-30, -15, 0, 15, 30],
+        'camera_heights': [3, 4, 5],
+        'camera_angles': [(1.0, 0, 0), (1.1, 0.5, 0), (1.1, -0.5, 0), (0.8, 0, 0)],
+        'lighting_conditions': [
+            {'energy': 1.5, 'color': (1, 1, 1)},
+            {'energy': 1.2, 'color': (1, 0.95, 0.8)},
+            {'energy': 0.8, 'color': (0.9, 0.9, 0.8)},
+            {'energy': 0.5, 'color': (0.8, 0.8, 0.9)}
+        ],
+        'fall_speeds': [0.8, 1.0, 1.2, 1.5],
+        'ground_materials': [
+            {'color': (0.2, 0.2, 0.2), 'roughness': 0.8},
+            {'color': (0.3, 0.2, 0.1), 'roughness': 0.9},
+            {'color': (0.4, 0.4, 0.4), 'roughness': 0.7}
+        ],
+        'use_noise': True,
+        'position_range': 1.5,
+        'rotation_chance': 0.3
+    },
+    'high': {
+        'rotations': [-45, -30, -15, 0, 15, 30, 45],
+        'camera_heights': [2, 3, 4, 5, 6],
+        'camera_angles': [
+            (1.0, 0, 0), (1.1, 0.5, 0), (1.1, -0.5, 0),
+            (1.2, 0.8, 0), (1.2, -0.8, 0), (0.8, 0, 0)
+        ],
+        'lighting_conditions': [
+            {'energy': 1.5, 'color': (1, 1, 1)},
+            {'energy': 1.2, 'color': (1, 0.95, 0.8)},
+            {'energy': 0.8, 'color': (0.9, 0.9, 0.8)},
+            {'energy': 0.5, 'color': (0.8, 0.8, 0.9)},
+            {'energy': 0.3, 'color': (0.7, 0.7, 1.0)}
+        ],
+        'fall_speeds': [0.6, 0.8, 1.0, 1.2, 1.5],
+        'ground_materials': [
+            {'color': (0.2, 0.2, 0.2), 'roughness': 0.8},
+            {'color': (0.3, 0.2, 0.1), 'roughness': 0.9},
+            {'color': (0.4, 0.4, 0.4), 'roughness': 0.7},
+            {'color': (0.15, 0.15, 0.15), 'roughness': 0.6}
+        ],
+        'use_noise': True,
+        'position_range': 2.0,
+        'rotation_chance': 0.5
+    }
+}
+
+
+def level_variations(level, fall_motion='fbx'):
+    """Variation tables of a level, falling back to VARIATION_SETTINGS for factors it leaves out
+
+    Fall types only vary with procedural motion; imported FBX animations
+    bring their own fall, so the factor is dropped for them.
+    """
+    variations = {**VARIATION_SETTINGS, **VARIATION_LEVELS[level]}
+    if fall_motion != 'procedural':
+        variations.pop('fall_types', None)
+    return variations
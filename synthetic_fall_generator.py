@@ -1,96 +1,223 @@
 import bpy
-import random
+import copy
+import json
 import math
+import os
+import shutil
+import tempfile
+import time
 from pathlib import Path
 import numpy as np
 
+from background_composite import BackgroundLibrary, composite_ground_truth, composite_variants, flatten
+from encode_pipeline import EncodePipeline
+from fall_motion import apply_procedural_fall, rig_layout
+from frame_shards import FrameShardWriter
+from ground_truth import (build_ground_truth, collect_bone_positions, derive_ground_truth, find_armature,
+                          ground_truth_path, save_ground_truth)
+from memory_budget import MemoryBudget, purge_orphans
+from model_cache import ModelCache
+from multi_resolution import crop_box, decimation_indices, master_resolution, resize_area
+from post_augment import degrade_variants
+from progress_journal import ProgressJournal, partial_path
+from render_cache import RenderCache
+from render_autotune import (DEFAULT_TOLERANCE, TUNE_FRAMES, RenderAutotuner, apply_tuning, candidate_options,
+                             tuning_key)
+from render_metrics import RenderMetrics
+from tar_shards import TarShardWriter, load_index as load_tar_index
+from synfall_settings import (DEFAULT_ACTION_FRAMES, ENGINE_SETTINGS, QUALITY_PRESETS, SOURCE_FPS,
+                              VARIATION_LEVELS, VARIATION_SETTINGS)
+from variation_manifest import (load_manifest, manifest_length, manifest_views, plan_manifest, report_coverage,
+                                resolve_seed, save_manifest, scene_params)
+from variation_sampler import scenes_for_coverage
+from video_io import encode_frames
+
+# Custom property tagging every object that belongs to the imported human model
+MODEL_PROPERTY = "synfall_model"
+
+
+def set_if_present(owner, name, value):
+    """Assign a render setting only if this Blender version still has it"""
+    if hasattr(owner, name):
+        setattr(owner, name, value)
+
+
+def resolve_engine_name(scene, engine):
+    """Map an engine name onto the identifier used by the running Blender version"""
+    available = scene.render.bl_rna.properties['engine'].enum_items.keys()
+    if engine == 'BLENDER_EEVEE' and engine not in available and 'BLENDER_EEVEE_NEXT' in available:
+        return 'BLENDER_EEVEE_NEXT'
+    return engine
+
+
+def compute_frame_timing(action_start, action_end, source_fps, output_fps, speed=1.0):
+    """Frame range, step and rate that sample an action at the output frame rate
+    
+    A speed multiplier above 1 plays the fall faster. Only every frame_step-th
+    source frame is rendered; fps_base absorbs the rounding of the step so
+    the encoded clip still lasts exactly as long as the sped-up action.
+    """
+    source_rate = source_fps * speed  # Source frames per second of playback
+    frame_step = max(1, round(source_rate / output_fps))
+    return {
+        'frame_start': int(action_start),
+        'frame_end': int(action_end),
+        'frame_step': frame_step,
+        'fps': int(output_fps),
+        'fps_base': output_fps * frame_step / source_rate,
+        'rendered_frames': len(range(int(action_start), int(action_end) + 1, frame_step)),
+    }
+
+
+def find_action_range(model):
+    """Frame range of the fall action on the model or its armature"""
+    for obj in (model, *model.children):
+        if obj.animation_data is not None and obj.animation_data.action is not None:
+            return tuple(obj.animation_data.action.frame_range)
+    return DEFAULT_ACTION_FRAMES
+
+
+def shard_indices(num_videos, worker_index, worker_count):
+    """Return the contiguous slice of scene indices owned by one worker"""
+    per_worker, remainder = divmod(num_videos, worker_count)
+    start = worker_index * per_worker + min(worker_index, remainder)
+    stop = start + per_worker + (1 if worker_index < remainder else 0)
+    return range(start, stop)
+
+
 class SyntheticFallGenerator:
     """Generator for synthetic fall detection videos using Blender"""
     def __init__(self, model_dir, output_dir, resolution=(320, 240), quality='surveillance', 
-                 num_videos=10, variation_level='medium'):
+                 num_videos=10, variation_level='medium', seed=None, threads=None,
+                 model_cache_dir=None, model_cache_size=2048, use_model_cache=True,
+                 persistent_scene=False, manifest_path=None, resume=False, engine=None,
+                 augment_variants=0, views=1, output_format='mp4', also_mp4=False,
+                 clips_per_shard=256, clip_frames=None, model_files=None, sampler='pairwise',
+                 coverage_target=None, export_ground_truth=False, autotune=False,
+                 autotune_tolerance=DEFAULT_TOLERANCE, autotune_cache=None, encode_workers=0,
+                 scratch_dir=None, scratch_limit=2048, use_render_cache=False, render_cache_dir=None,
+                 render_cache_size=8192, fall_motion='fbx', max_rss=None, max_scenes_per_process=None,
+                 tar_shards=False, tar_shard_size=512, keep_videos=False, derived_qualities=(),
+                 background_dir=None, backgrounds_per_render=4):
         self.model_dir = Path(model_dir)
+        self.model_files = [Path(path) for path in model_files] if model_files else None  # Overrides model_dir
         self.output_dir = Path(output_dir)
         self.resolution = resolution
         self.quality = quality
+        self.seed = seed
+        
+        # Every scene's random parameters come from a seeded, precomputed manifest
+        self.manifest_path = Path(manifest_path) if manifest_path else None
+        self.manifest = None
+        self.sampler = sampler  # How factor levels are combined, see variation_sampler
+        self.coverage_target = coverage_target  # Plan only as many scenes as this pairwise coverage needs
+        
+        # Completed scenes are journaled so an interrupted run can pick up where it stopped
+        self.resume = resume
+        self.journal = ProgressJournal(Path(output_dir) / 'progress.jsonl')
+        self.leases = None  # Lease board of a multi-node run, see work_lease
+        self.publish_pending = False  # The scene just rendered is still being encoded
+        self.threads = threads  # None lets Blender auto-detect the thread count
+        self.engine = engine  # None uses the engine of the quality preset
+        
+        # Cycles settings benchmarked on the first scene and cached per preset
+        self.autotuner = None
+        if autotune:
+            self.autotuner = RenderAutotuner(autotune_cache or Path(output_dir) / '.autotune.json',
+                                             autotune_tolerance)
+        self.render_tuning = None
+        self.frame_timing = None  # Frame sampling of the scene being rendered
+        
+        # 'procedural' replaces the imported animation with a generated fall of the planned type
+        self.fall_motion = fall_motion
+        self.rig_layouts = {}  # Driven bones per model, bone names only depend on the FBX file
+        
+        # Per-frame and per-scene timings, written to <output_dir>/metrics
+        self.metrics = RenderMetrics(Path(output_dir) / 'metrics')
+        
+        # Orphans are purged after every scene; past the RSS (MB) or scene budget the
+        # process stops early so run_synfall can restart it with a fresh Blender
+        self.memory = MemoryBudget(max_rss * 1024 * 1024 if max_rss else None, max_scenes_per_process)
+        self.restart_requested = False
+        
+        # Render clean frames once and derive degraded variants in NumPy
+        self.augment_variants = augment_variants
+        self.rendered_frames = None
+        
+        # Number of cameras each scene is rendered from
+        self.views = views
+        
+        # Keypoint, bounding box and fall onset labels written next to every video
+        self.export_ground_truth = export_ground_truth
+        self.ground_truth = None
+        
+        # 'npy' writes frames straight into memory-mapped shards, MP4 becomes optional
+        self.output_format = output_format
+        self.write_mp4 = output_format == 'mp4' or also_mp4
+        self.clips_per_shard = clips_per_shard
+        self.clip_frames = clip_frames  # None sizes shards for the slowest planned fall, longer clips grow them
+        self.shard_writer = None
+        
+        # Finished videos streamed into size-bounded .tar shards with a JSON sidecar each
+        # (size in MB); the loose files are deleted once their shard is final
+        self.tar_shards = tar_shards and self.write_mp4
+        if tar_shards and not self.write_mp4:
+            print("Tar shards disabled: they package MP4 videos, add --also-mp4 to npy output")
+        self.tar_shard_size = tar_shard_size
+        self.keep_videos = keep_videos
+        self.tar_writer = None
+        
+        # Extra quality presets cut from a single render at a resolution covering them all,
+        # written to <output_dir>/<quality>/ with the same scene parameters
+        self.derived_qualities = [name for name in dict.fromkeys(derived_qualities) if name != quality]
+        self.derived_timings = None
+        self.derived_outputs = None
+        
+        # Render the person over a transparent film once and composite it in NumPy over
+        # backgrounds_per_render plates from background_dir; the primary clip is the
+        # render over the planned ground color
+        self.backgrounds = BackgroundLibrary(background_dir) if background_dir else None
+        self.backgrounds_per_render = backgrounds_per_render if background_dir else 0
+        self.foregrounds = None
+        
+        # Render MP4 scenes as image sequences on a RAM disk and encode them in the
+        # background while the next scene renders (scratch limit in MB). Clips kept in
+        # memory for augmentation, derived presets or compositing are encoded in-process instead.
+        in_memory = augment_variants or self.derived_qualities or self.backgrounds is not None
+        self.encode_pipeline = None
+        if encode_workers and output_format == 'mp4' and not in_memory:
+            self.encode_pipeline = EncodePipeline(encode_workers, scratch_dir, scratch_limit * 1024 * 1024)
+        self.frame_dirs = None
+        
+        # Imported FBX models are cached as .blend libraries (size in MB)
+        self.model_cache = None
+        if use_model_cache:
+            cache_dir = model_cache_dir or Path(output_dir) / '.model_cache'
+            self.model_cache = ModelCache(cache_dir, max_bytes=model_cache_size * 1024 * 1024)
+        
+        # Rendered outputs keyed on a hash of everything that affects them (size in MB),
+        # so re-runs only render changed scenes. Frames kept in memory for augmentation,
+        # derived presets, compositing or shards are not cached, so only plain MP4 output uses it.
+        self.render_cache = None
+        if use_render_cache:
+            if output_format == 'mp4' and not in_memory:
+                cache_dir = render_cache_dir or Path(output_dir) / '.render_cache'
+                self.render_cache = RenderCache(cache_dir, max_bytes=render_cache_size * 1024 * 1024)
+            else:
+                print("Render cache disabled: it only applies to MP4 output without augment variants, "
+                      "derived qualities or background compositing")
+        
+        # Build the ground/camera/light rig once and only swap the model per scene
+        self.persistent_scene = persistent_scene
         
         # Updated quality presets optimized for surveillance footage
-        self.QUALITY_PRESETS = {
-            'tiny': {
-                'resolution': (64, 64),
-                'fps': 5,
-                'noise': True,
-                'samples': 4,
-                'compression': 'HIGHEST'
-            },
-            'small': {
-                'resolution': (128, 128),
-                'fps': 8,
-                'noise': True,
-                'samples': 8,
-                'compression': 'HIGH'
-            },
-            'medium': {
-                'resolution': (160, 120),
-                'fps': 10,
-                'noise': True,
-                'samples': 16,
-                'compression': 'HIGH'
-            }
-        }
+        self.QUALITY_PRESETS = copy.deepcopy(QUALITY_PRESETS)
+        
+        # Engine specific render settings
+        self.ENGINE_SETTINGS = copy.deepcopy(ENGINE_SETTINGS)
         
         # Add variation settings
-        self.VARIATION_SETTINGS = {
-            # Character variations
-            'rotations': [-45, -30, -15, 0, 15, 30, 45],  # More rotation angles
-            'initial_poses': [
-                {'bend': 0.0, 'twist': 0.0},    # Standing straight
-                {'bend': 0.1, 'twist': 0.1},    # Slightly bent
-                {'bend': -0.1, 'twist': -0.1},  # Leaning back
-            ],
-            
-            # Fall variations
-            'fall_speeds': [0.6, 0.8, 1.0, 1.2, 1.5],  # More speed options
-            'fall_types': [
-                'forward_straight',
-                'forward_twist',
-                'backward_simple',
-                'backward_sit',
-                'sideways_left',
-                'sideways_right',
-                'stumble_forward',
-                'stumble_backward',
-                'collapse_vertical'
-            ],
-            
-            # Environment variations
-            'camera_heights': [2, 3, 4, 5, 6],  # More height options
-            'camera_angles': [
-                (1.0, 0, 0),      # Front view
-                (1.1, 0.5, 0),    # Side-front right
-                (1.1, -0.5, 0),   # Side-front left
-                (1.2, 0.8, 0),    # Side right
-                (1.2, -0.8, 0),   # Side left
-                (0.8, 0, 0),      # High angle
-                (1.4, 0, 0),      # Low angle
-            ],
-            
-            # Lighting variations
-            'lighting_conditions': [
-                {'energy': 1.5, 'color': (1, 1, 1)},        # Bright daylight
-                {'energy': 1.2, 'color': (1, 0.95, 0.8)},   # Warm light
-                {'energy': 0.8, 'color': (0.9, 0.9, 0.8)},  # Dim indoor
-                {'energy': 0.5, 'color': (0.8, 0.8, 0.9)},  # Dark area
-                {'energy': 0.3, 'color': (0.7, 0.7, 1.0)},  # Night time
-            ],
-            
-            # Ground variations
-            'ground_materials': [
-                {'color': (0.2, 0.2, 0.2), 'roughness': 0.8},  # Concrete
-                {'color': (0.3, 0.2, 0.1), 'roughness': 0.9},  # Wood
-                {'color': (0.4, 0.4, 0.4), 'roughness': 0.7},  # Tile
-                {'color': (0.15, 0.15, 0.15), 'roughness': 0.6}  # Smooth floor
-            ],
-        }
+        self.VARIATION_SETTINGS = copy.deepcopy(VARIATION_SETTINGS)
         
         # Create output directory if it doesn't exist
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -99,73 +226,35 @@ class SyntheticFallGenerator:
         self.variation_level = variation_level
         
         # Variation levels configuration
-        self.VARIATION_LEVELS = {
-            'minimal': {
-                'rotations': [0],  # No rotation
-                'camera_heights': [4],  # Fixed height
-                'camera_angles': [(1.0, 0, 0)],  # Front only
-                'lighting_conditions': [{'energy': 1.0, 'color': (1, 1, 1)}],  # Standard lighting
-                'fall_speeds': [1.0],  # Normal speed
-                'ground_materials': [{'color': (0.2, 0.2, 0.2), 'roughness': 0.8}],  # Basic ground
-                'use_noise': False,
-                'position_range': 0.5,
-                'rotation_chance': 0
-            },
-            'low': {
-                'rotations': [-15, 0, 15],
-                'camera_heights': [3, 4],
-                'camera_angles': [(1.0, 0, 0), (1.1, 0.5, 0)],
-                'lighting_conditions': [
-                    {'energy': 1.2, 'color': (1, 1, 1)},
-                    {'energy': 0.8, 'color': (0.9, 0.9, 0.9)}
-                ],
-                'fall_speeds': [0.8, 1.0, 1.2],
-                'ground_materials': [
-                    {'color': (0.2, 0.2, 0.2), 'roughness': 0.8},
-                    {'color': (0.3, 0.2, 0.1), 'roughness': 0.9}
-                ],
-                'use_noise': True,
-                'position_range': 1.0,
-                'rotation_chance': 0.1
-            },
-            'medium': {
-                # ... existing variation settings ...
-            },
-            'high': {
-                'rotations': [-45, -30, -15, 0, 15, 30, 45],
-                'camera_heights': [2, 3, 4, 5, 6],
-                'camera_angles': [
-                    (1.0, 0, 0), (1.1, 0.5, 0), (1.1, -0.5, 0),
-                    (1.2, 0.8, 0), (1.2, -0.8, 0), (0.8, 0, 0)
-                ],
-                'lighting_conditions': [
-                    {'energy': 1.5, 'color': (1, 1, 1)},
-                    {'energy': 1.2, 'color': (1, 0.95, 0.8)},
-                    {'energy': 0.8, 'color': (0.9, 0.9, 0.8)},
-                    {'energy': 0.5, 'color': (0.8, 0.8, 0.9)},
-                    {'energy': 0.3, 'color': (0.7, 0.7, 1.0)}
-                ],
-                'fall_speeds': [0.6, 0.8, 1.0, 1.2, 1.5],
-                'ground_materials': [
-                    {'color': (0.2, 0.2, 0.2), 'roughness': 0.8},
-                    {'color': (0.3, 0.2, 0.1), 'roughness': 0.9},
-                    {'color': (0.4, 0.4, 0.4), 'roughness': 0.7},
-                    {'color': (0.15, 0.15, 0.15), 'roughness': 0.6}
-                ],
-                'use_noise': True,
-                'position_range': 2.0,
-                'rotation_chance': 0.5
-            }
-        }
+        self.VARIATION_LEVELS = copy.deepcopy(VARIATION_LEVELS)
+        
+        # Use variation level settings, with the full tables for factors the level leaves out
+        self.current_variations = {**self.VARIATION_SETTINGS, **self.VARIATION_LEVELS[variation_level]}
+        if fall_motion != 'procedural':
+            self.current_variations.pop('fall_types', None)  # FBX animations bring their own fall
         
-        # Use variation level settings
-        self.current_variations = self.VARIATION_LEVELS[variation_level]
+    def has_static_rig(self):
+        """Check whether the ground, camera and light from a previous scene still exist"""
+        return all(name in bpy.data.objects for name in ("Ground", "Camera", "Sun"))
+        
+    def remove_model(self):
+        """Delete the previous human model and purge the datablocks it leaves behind"""
+        for obj in [obj for obj in bpy.data.objects if obj.get(MODEL_PROPERTY)]:
+            bpy.data.objects.remove(obj, do_unlink=True)
+        
+        # Meshes, armatures and actions of the removed model are now orphans
+        purge_orphans()
         
     def setup_scene(self):
         """Initialize the scene by removing default objects and setting up basic elements"""
-        # Clear existing objects
+        if self.persistent_scene and self.has_static_rig():
+            self.remove_model()
+            return
+        
+        # Clear existing objects, then the meshes, materials and actions they leave behind
         bpy.ops.object.select_all(action='SELECT')
         bpy.ops.object.delete(use_global=False)
+        purge_orphans()
         
         # Add ground plane
         bpy.ops.mesh.primitive_plane_add(size=10, location=(0, 0, 0))
@@ -191,8 +280,18 @@ class SyntheticFallGenerator:
     def load_model(self, filepath):
         """Import the FBX model from Mixamo"""
         try:
-            bpy.ops.import_scene.fbx(filepath=str(filepath))
-            model = bpy.context.selected_objects[0]
+            # The FBX importer maps animation time onto the scene frame rate
+            scene = bpy.context.scene
+            scene.render.fps = SOURCE_FPS
+            scene.render.fps_base = 1.0
+            
+            if self.model_cache is not None:
+                model = self.model_cache.load(filepath)
+            else:
+                bpy.ops.import_scene.fbx(filepath=str(filepath))
+                model = bpy.context.selected_objects[0]
+            for obj in bpy.context.selected_objects:
+                obj[MODEL_PROPERTY] = True
             model.name = "Human"
             model.location.z = 0.1  # Slightly above ground
             return model
@@ -200,115 +299,125 @@ class SyntheticFallGenerator:
             print(f"Error loading model {filepath}: {e}")
             return None
         
-    def apply_initial_pose(self, model):
-        """Apply random initial pose variation"""
-        pose = random.choice(self.VARIATION_SETTINGS['initial_poses'])
-        armature = [obj for obj in model.children if obj.type == 'ARMATURE'][0]
+    def rig_layout(self, armature, params):
+        """Driven bones and spine mask of the scene's model, computed once per model"""
+        key = params['model_index']
+        if key not in self.rig_layouts:
+            self.rig_layouts[key] = rig_layout(armature)
+        return self.rig_layouts[key]
+        
+    def apply_initial_pose(self, model, params):
+        """Apply the planned initial pose variation"""
+        armature = find_armature(model)
+        _, spine = self.rig_layout(armature, params)
         
-        # Apply slight variations to the armature
-        for bone in armature.pose.bones:
-            if 'spine' in bone.name.lower():
-                bone.rotation_euler.x = pose['bend']
-                bone.rotation_euler.y = pose['twist']
+        # Apply slight variations to the spine bones with one bulk read and write
+        bones = armature.pose.bones
+        rotations = np.empty((len(bones), 3), dtype=np.float32)
+        bones.foreach_get('rotation_euler', rotations.ravel())
+        rotations[spine, 0] = params['pose_bend']
+        rotations[spine, 1] = params['pose_twist']
+        bones.foreach_set('rotation_euler', rotations.ravel())
         
-    def apply_fall_animation(self):
+    def apply_procedural_motion(self, model, params):
+        """Replace the imported animation with a generated fall of the planned fall type"""
+        if params['fall_type'] is None:
+            raise ValueError("The manifest plans no fall types, plan it with procedural fall motion")
+        armature = find_armature(model)
+        roles, _ = self.rig_layout(armature, params)
+        apply_procedural_fall(model, armature, roles, params['fall_type'], params, DEFAULT_ACTION_FRAMES)
+        
+    def apply_fall_animation(self, params):
         """Configure the fall animation with enhanced variations"""
         try:
             model = bpy.data.objects["Human"]
             
-            # Apply initial pose variation
-            self.apply_initial_pose(model)
-            
-            # Rotate character randomly
-            model.rotation_euler.z = math.radians(
-                random.choice(self.VARIATION_SETTINGS['rotations'])
-            )
+            if self.fall_motion == 'procedural':
+                # Pose, rotation, offset and extra rotation are part of the generated keyframes
+                self.apply_procedural_motion(model, params)
+            else:
+                # Apply initial pose variation
+                self.apply_initial_pose(model, params)
+                
+                # Rotate character
+                model.rotation_euler.z = math.radians(params['rotation'])
             
-            # Set animation length and speed
+            # Render only the source frames the preset fps needs at this fall speed
             scene = bpy.context.scene
-            scene.frame_start = 0
-            scene.frame_end = 90  # 3 seconds at 30fps
+            action_start, action_end = find_action_range(model)
+            timing = compute_frame_timing(action_start, action_end, SOURCE_FPS,
+                                          self.QUALITY_PRESETS[self.quality]['fps'], params['fall_speed'])
+            scene.render.fps = timing['fps']
+            scene.render.fps_base = timing['fps_base']
+            if self.derived_qualities:
+                # Render at the highest preset rate and decimate; the scene rate stays the primary one
+                self.derived_timings = {name: compute_frame_timing(action_start, action_end, SOURCE_FPS,
+                                                                   self.QUALITY_PRESETS[name]['fps'],
+                                                                   params['fall_speed'])
+                                        for name in (self.quality, *self.derived_qualities)}
+                timing = max(self.derived_timings.values(), key=lambda timing: timing['rendered_frames'])
+            scene.frame_start = timing['frame_start']
+            scene.frame_end = timing['frame_end']
+            scene.frame_step = timing['frame_step']
+            self.frame_timing = timing
             
-            # Vary animation speed
-            speed_multiplier = random.choice(self.VARIATION_SETTINGS['fall_speeds'])
-            scene.render.fps = int(self.QUALITY_PRESETS[self.quality]['fps'] * speed_multiplier)
+            if self.fall_motion == 'procedural':
+                return
             
             # Add position variations
-            offset_range = 1.5  # Increased range for more variation
-            model.location.x += random.uniform(-offset_range, offset_range)
-            model.location.y += random.uniform(-offset_range, offset_range)
+            model.location.x += params['model_offset'][0]
+            model.location.y += params['model_offset'][1]
             
             # Add slight rotation variation during fall
-            if random.random() < 0.3:  # 30% chance of additional rotation
+            if params['extra_rotation'] is not None:
                 model.keyframe_insert(data_path="rotation_euler", frame=0)
-                model.rotation_euler.z += math.radians(random.uniform(-30, 30))
+                model.rotation_euler.z += math.radians(params['extra_rotation'])
                 model.keyframe_insert(data_path="rotation_euler", frame=45)
             
         except Exception as e:
             print(f"Error applying animation: {e}")
         
-    def adjust_camera(self):
+    def adjust_camera(self, params):
         """Enhanced camera position and angle variations"""
         camera = bpy.data.objects["Camera"]
+        bpy.context.scene.camera = camera  # A previous multi-view render may have switched it
         
-        # Choose random camera height
-        height = random.choice(self.VARIATION_SETTINGS['camera_heights'])
+        # Planned height/angle preset plus jitter
+        camera.location = params['camera_location']
+        camera.rotation_euler = params['camera_rotation']
         
-        # Choose random camera angle preset
-        angle = random.choice(self.VARIATION_SETTINGS['camera_angles'])
-        
-        # Set camera position with some random variation
-        camera.location = (
-            random.uniform(-2, 2),  # X position
-            random.uniform(-8, -6), # Y position
-            height + random.uniform(-0.5, 0.5)  # Z position with slight variation
-        )
-        
-        # Set camera rotation with slight random variation
-        camera.rotation_euler = (
-            angle[0] + random.uniform(-0.1, 0.1),
-            angle[1] + random.uniform(-0.1, 0.1),
-            angle[2] + random.uniform(-0.1, 0.1)
-        )
-        
-    def adjust_lighting(self):
+    def adjust_lighting(self, params):
         """Enhanced lighting variations"""
         light = bpy.data.objects["Sun"]
         
-        # Choose random lighting condition
-        lighting = random.choice(self.VARIATION_SETTINGS['lighting_conditions'])
-        
-        # Apply lighting with slight random variation
-        light.data.energy = lighting['energy'] * random.uniform(0.9, 1.1)
-        light.data.color = (
-            lighting['color'][0] * random.uniform(0.95, 1.05),
-            lighting['color'][1] * random.uniform(0.95, 1.05),
-            lighting['color'][2] * random.uniform(0.95, 1.05)
-        )
+        # Planned lighting condition with slight variation
+        light.data.energy = params['light_energy']
+        light.data.color = params['light_color']
         
         # Vary light direction
-        light.rotation_euler = (
-            random.uniform(-0.2, 0.2),
-            random.uniform(-0.2, 0.2),
-            random.uniform(-math.pi, math.pi)
-        )
+        light.rotation_euler = params['light_rotation']
         
-    def add_background_variation(self):
+    def add_background_variation(self, params):
         """Enhanced background variations"""
         ground = bpy.data.objects["Ground"]
+        # Composited scenes only render the person, the plates replace the ground
+        ground.hide_render = self.backgrounds is not None
         mat = ground.data.materials[0]
         nodes = mat.node_tree.nodes
         
-        # Choose random ground material
-        material = random.choice(self.VARIATION_SETTINGS['ground_materials'])
-        
-        # Add material nodes
-        color = nodes.new(type='ShaderNodeRGB')
-        roughness = nodes.new(type='ShaderNodeValue')
+        # Reuse material nodes from a previous pass instead of stacking new ones
+        color = nodes.get("GroundColor")
+        if color is None:
+            color = nodes.new(type='ShaderNodeRGB')
+            color.name = "GroundColor"
+        roughness = nodes.get("GroundRoughness")
+        if roughness is None:
+            roughness = nodes.new(type='ShaderNodeValue')
+            roughness.name = "GroundRoughness"
         
         # Set material properties
-        color.outputs[0].default_value = (*material['color'], 1.0)
-        roughness.outputs[0].default_value = material['roughness']
+        color.outputs[0].default_value = (*params['ground_color'], 1.0)
+        roughness.outputs[0].default_value = params['ground_roughness']
         
         # Connect to material output
         principled = nodes.get("Principled BSDF")
@@ -326,7 +435,10 @@ class SyntheticFallGenerator:
         # Apply quality preset settings
         preset = self.QUALITY_PRESETS[self.quality]
         scene.render.resolution_x, scene.render.resolution_y = preset['resolution']
-        scene.render.fps = preset['fps']
+        if self.derived_qualities:
+            # One render every preset can be cropped and downscaled from
+            scene.render.resolution_x, scene.render.resolution_y = master_resolution(
+                [self.QUALITY_PRESETS[name]['resolution'] for name in (self.quality, *self.derived_qualities)])
         
         # Optimize render settings for low quality
         scene.render.resolution_percentage = 100
@@ -334,11 +446,24 @@ class SyntheticFallGenerator:
         scene.render.use_compositing = True
         scene.render.use_sequencer = False
         
-        # Configure render engine for speed
-        scene.render.engine = 'CYCLES'
-        scene.cycles.samples = preset['samples']
-        scene.cycles.use_denoising = True
-        scene.cycles.preview_samples = 8
+        # Keep the alpha channel for compositing over background plates
+        scene.render.film_transparent = self.backgrounds is not None
+        
+        # Let Cycles keep BVH and shader data between renders of a persistent rig
+        scene.render.use_persistent_data = self.persistent_scene
+        
+        # Limit render threads when sharing the machine with other workers
+        if self.threads:
+            scene.render.threads_mode = 'FIXED'
+            scene.render.threads = self.threads
+        else:
+            scene.render.threads_mode = 'AUTO'
+        
+        self.configure_engine(scene, preset)
+        
+        # Faster settings picked by tune_render
+        if self.render_tuning:
+            apply_tuning(scene, self.render_tuning)
         
         # Optimize video compression for surveillance footage
         scene.render.ffmpeg.constant_rate_factor = preset['compression']
@@ -348,17 +473,84 @@ class SyntheticFallGenerator:
         scene.render.ffmpeg.maxrate = 1000
         scene.render.ffmpeg.buffersize = 1000
         
+    def tune_render(self, output_path):
+        """Benchmark Cycles settings on the prepared scene, or reuse the cached choice for this preset"""
+        preset = self.QUALITY_PRESETS[self.quality]
+        engine = self.engine or preset.get('engine', 'CYCLES')
+        if engine != 'CYCLES':
+            print(f"Autotune only tunes Cycles, keeping the {engine} settings")
+            self.render_tuning = {}
+            return
+        
+        key = tuning_key(self.quality, engine, preset, self.threads)
+        cached = self.autotuner.load(key)
+        if cached is not None:
+            print(f"Using cached render tuning for {key}")
+            self.render_tuning = cached['config']
+        else:
+            # A few frames of the first scene are enough to compare configurations
+            scene = bpy.context.scene
+            frame_end = scene.frame_end
+            scene.frame_end = min(frame_end, scene.frame_start + (TUNE_FRAMES - 1) * scene.frame_step)
+            config, trials = self.autotuner.tune(scene, self.render_frames, candidate_options(self.threads))
+            scene.frame_end = frame_end
+            self.autotuner.store(key, {'config': config, 'tolerance': self.autotuner.tolerance,
+                                       'tuned': time.strftime('%Y-%m-%dT%H:%M:%S'), 'trials': trials})
+            self.render_tuning = config
+        
+        # Restore the video output settings the tuning renders replaced
+        self.setup_render_settings(output_path)
+        
+    def configure_engine(self, scene, preset):
+        """Select the render engine and apply its speed-tuned settings"""
+        engine = self.engine or preset.get('engine', 'CYCLES')
+        settings = self.ENGINE_SETTINGS[engine]
+        scene.render.engine = resolve_engine_name(scene, engine)
+        
+        if engine == 'CYCLES':
+            scene.cycles.samples = preset['samples']
+            scene.cycles.use_denoising = preset.get('denoise', settings['denoise'])
+            scene.cycles.preview_samples = 8
+            scene.cycles.caustics_reflective = False
+            scene.cycles.caustics_refractive = False
+            for name in ('max_bounces', 'diffuse_bounces', 'glossy_bounces', 'transmission_bounces',
+                         'volume_bounces', 'transparent_max_bounces'):
+                setattr(scene.cycles, name, settings[name])
+        
+        elif engine == 'BLENDER_EEVEE':
+            scene.eevee.taa_render_samples = preset['samples']
+            for name in ('use_gtao', 'use_bloom', 'use_ssr', 'use_soft_shadows',
+                         'shadow_cube_size', 'shadow_cascade_size'):
+                set_if_present(scene.eevee, name, settings[name])
+        
+        elif engine == 'BLENDER_WORKBENCH':
+            scene.display.render_aa = settings['render_aa']
+            scene.display.shading.light = settings['lighting']
+            scene.display.shading.color_type = 'MATERIAL'
+        
+    def noise_enabled(self):
+        return self.QUALITY_PRESETS[self.quality]['noise'] and self.current_variations.get('use_noise', True)
+        
     def add_noise(self):
         """Enhanced noise settings for surveillance look"""
-        if self.QUALITY_PRESETS[self.quality]['noise']:
+        if self.augment_variants or self.backgrounds is not None or not self.noise_enabled():
+            # With augment_variants degradation is applied after rendering, so render clean frames;
+            # composited frames must keep a clean alpha channel
+            bpy.context.scene.use_nodes = False
+        else:
             scene = bpy.context.scene
             scene.use_nodes = True
             nodes = scene.node_tree.nodes
+            
+            # The compositor graph is identical for every scene, so build it once
+            if self.persistent_scene and nodes.get("SurveillanceNoise") is not None:
+                return
             nodes.clear()
             
             # Add and configure nodes
             render_layers = nodes.new(type="CompositorNodeRLayers")
             noise = nodes.new(type="CompositorNodeNoise")
+            noise.name = "SurveillanceNoise"
             blur = nodes.new(type="CompositorNodeBlur")
             mix = nodes.new(type="CompositorNodeMixRGB")
             bright_contrast = nodes.new(type="CompositorNodeBrightContrast")
@@ -388,47 +580,665 @@ class SyntheticFallGenerator:
             links.new(noise.outputs[0], mix.inputs[2])
             links.new(mix.outputs[0], output.inputs[0])
         
-    def generate_scene(self, model_path, output_path):
-        """Generate a complete fall scene with variations"""
+    def prepare_scene(self, model_path, output_path, params):
+        """Build and configure a scene from one row of the variation manifest"""
+        self.setup_scene()
+        model = self.load_model(model_path)
+        
+        if model is None:
+            return False
+        
+        self.add_background_variation(params)  # Add background variation
+        self.apply_fall_animation(params)
+        self.adjust_camera(params)
+        self.adjust_lighting(params)
+        self.add_noise()
+        self.setup_render_settings(output_path)
+        return True
+        
+    def view_cameras(self, params, count):
+        """Return one camera per view, creating and placing the extra ones as needed"""
+        cameras = [bpy.data.objects["Camera"]]
+        for view in range(1, count):
+            name = f"Camera_{view}"
+            camera = bpy.data.objects.get(name)
+            if camera is None:
+                camera = bpy.data.objects.new(name, bpy.data.cameras.new(name))
+                bpy.context.scene.collection.objects.link(camera)
+            camera.location, camera.rotation_euler = params['cameras'][view]
+            cameras.append(camera)
+        return cameras
+        
+    def output_paths(self, output_path):
+        """Output video per camera view, labeled with the view number when there are several"""
+        if self.views == 1:
+            return [output_path]
+        return [output_path.with_name(f"{output_path.stem}_view{view}{output_path.suffix}")
+                for view in range(self.views)]
+        
+    def generate_scene(self, model_path, output_paths, params):
+        """Generate a complete fall scene from one row of the variation manifest
+        
+        The scene is set up once and rendered from one camera per entry of
+        output_paths.
+        """
         try:
-            self.setup_scene()
-            model = self.load_model(model_path)
-            
-            if model is None:
+            if not self.prepare_scene(model_path, output_paths[0], params):
                 return False
             
-            self.add_background_variation()  # Add background variation
-            self.apply_fall_animation()
-            self.adjust_camera()
-            self.adjust_lighting()
-            self.add_noise()
-            self.setup_render_settings(output_path)
+            if self.autotuner is not None and self.render_tuning is None:
+                self.tune_render(output_paths[0])
             
-            # Render animation
-            bpy.ops.render.render(animation=True)
+            scene = bpy.context.scene
+            self.rendered_frames = []
+            self.foregrounds = []
+            self.ground_truth = []
+            if self.export_ground_truth:
+                # One pass over the animation serves the labels of every view
+                frame_numbers = list(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
+                bone_names, points = collect_bone_positions(find_armature(bpy.data.objects["Human"]),
+                                                            frame_numbers)
+            
+            for camera, output_path in zip(self.view_cameras(params, len(output_paths)), output_paths):
+                scene.camera = camera
+                if self.export_ground_truth:
+                    self.ground_truth.append(build_ground_truth(bone_names, points, camera, scene, frame_numbers))
+                if (self.augment_variants or self.output_format == 'npy' or self.derived_qualities
+                        or self.backgrounds is not None):
+                    frames = foreground = self.render_frames()
+                    if self.backgrounds is not None:
+                        frames = flatten(foreground, params['ground_color'])
+                    if self.derived_qualities:
+                        frames = self.write_derived_qualities(frames, output_path)
+                        if self.backgrounds is not None:
+                            foreground = self.derive_clip(foreground, self.quality)[0]
+                    if self.backgrounds is not None:
+                        self.foregrounds.append(foreground)
+                    self.rendered_frames.append(frames)
+                    if self.write_mp4:
+                        self.encode_clip(frames, output_path)
+                    continue
+                if self.encode_pipeline is not None:
+                    frame_dir = self.encode_pipeline.frame_dir(output_path.stem.lstrip('.'))
+                    self.frame_dirs.append(frame_dir)
+                    self.render_sequence(frame_dir)
+                    continue
+                
+                # Render animation
+                scene.render.filepath = str(output_path)
+                bpy.ops.render.render(animation=True)
             return True
             
         except Exception as e:
             print(f"Error generating scene: {e}")
             return False
         
-    def generate_dataset(self):
-        """Generate specified number of fall scenes with controlled variation"""
-        model_files = list(self.model_dir.glob('*.fbx'))
+    def render_sequence(self, frame_dir):
+        """Render the animation as a PNG sequence into frame_dir"""
+        scene = bpy.context.scene
+        scene.render.image_settings.file_format = 'PNG'
+        scene.render.image_settings.color_mode = 'RGB' if self.backgrounds is None else 'RGBA'
+        # The frames are temporary, so skip zlib and write them as fast as possible
+        scene.render.image_settings.compression = 0
+        scene.render.filepath = str(Path(frame_dir) / 'frame_')
+        bpy.ops.render.render(animation=True)
+        
+    def render_frames(self):
+        """Render the animation as a PNG sequence and return it as a (T, H, W, C) uint8 array"""
+        with tempfile.TemporaryDirectory(prefix='synfall_frames_') as frame_dir:
+            self.render_sequence(frame_dir)
+            return self.load_frames(sorted(Path(frame_dir).glob('frame_*.png')))
+        
+    def derive_clip(self, frames, quality, labels=None):
+        """Cut the clip and labels of one preset from frames rendered at the master resolution and rate"""
+        timing = self.derived_timings[quality]
+        indices = decimation_indices(self.frame_timing, timing)
+        size = self.QUALITY_PRESETS[quality]['resolution']
+        _, height, width, _ = frames.shape
+        box = crop_box(width, height, *size)
+        clip = resize_area(frames[indices], box, size)
+        if labels is not None:
+            labels = derive_ground_truth(labels, box, size, indices, timing['fps'] / timing['fps_base'])
+        return clip, labels
+        
+    def write_derived_qualities(self, frames, output_path):
+        """Encode every derived preset of a view into its preset directory and return the primary clip
+        
+        Videos are written under the temporary name of output_path and moved
+        into place by render_to_output together with the primary video.
+        """
+        start = time.perf_counter()
+        labels = self.ground_truth[-1] if self.export_ground_truth else None
+        for quality in self.derived_qualities:
+            clip, clip_labels = self.derive_clip(frames, quality, labels)
+            timing = self.derived_timings[quality]
+            path = self.output_dir / quality / output_path.name
+            path.parent.mkdir(exist_ok=True)
+            encode_frames(clip, path, timing['fps'], timing['fps_base'], self.QUALITY_PRESETS[quality]['compression'])
+            self.derived_outputs.append((path, clip_labels))
+        clip, labels = self.derive_clip(frames, self.quality, labels)
+        if labels is not None:
+            self.ground_truth[-1] = labels
+        self.metrics.add_time('encode', time.perf_counter() - start)
+        return clip
+        
+    def load_frames(self, paths):
+        """Read image files into a (T, H, W, C) uint8 array
+        
+        Blender loads byte images with four channels whatever was saved, so
+        frames are cut to RGB; alpha is only kept for background compositing.
+        """
+        channels = 3 if self.backgrounds is None else 4
+        frames = None
+        for t, path in enumerate(paths):
+            image = bpy.data.images.load(str(path))
+            width, height = image.size
+            pixels = np.empty(width * height * image.channels, dtype=np.float32)
+            image.pixels.foreach_get(pixels)
+            if frames is None:
+                frames = np.empty((len(paths), height, width, channels), dtype=np.uint8)
+            # Blender stores pixels bottom row first
+            frames[t] = np.round(pixels.reshape(height, width, image.channels)[::-1, :, :channels] * 255)
+            bpy.data.images.remove(image)
+        return frames
+        
+    def encode_clip(self, frames, output_path):
+        """Encode frames with the preset compression at the scene's sampled frame rate"""
+        scene = bpy.context.scene
+        start = time.perf_counter()
+        encode_frames(frames, output_path, scene.render.fps, scene.render.fps_base,
+                      self.QUALITY_PRESETS[self.quality]['compression'])
+        self.metrics.add_time('encode', time.perf_counter() - start)
+        
+    def clip_metadata(self, index, view, model_path, params):
+        """Per-clip metadata stored in the shard index"""
+        scene = bpy.context.scene
+        return {
+            'index': index,
+            'view': view,
+            'variant': None,
+            'model': Path(model_path).name,
+            'quality': self.quality,
+            'fps': scene.render.fps / scene.render.fps_base,
+            'params': params,
+        }
+        
+    def sample_metadata(self, index, view, model_path, params):
+        """JSON sidecar of a clip in the tar shards; unlike clip_metadata it does not read the scene"""
+        preset = self.QUALITY_PRESETS.get(self.quality, {})
+        return {
+            'index': index,
+            'view': view,
+            'variant': None,
+            'model': Path(model_path).name,
+            'quality': self.quality,
+            'resolution': list(preset.get('resolution', self.resolution)),
+            'fps': preset.get('fps'),
+            'fall_motion': self.fall_motion,
+            'params': params,
+        }
+        
+    def package_scene(self, index, final_paths, model_path, params, skip=frozenset()):
+        """Stream the finished videos of a scene, with their labels and variants, into the tar shards
+        
+        Views whose file name stem is in skip are left out. Runs on encoder
+        threads for pipelined scenes, so it must not touch bpy.
+        """
+        if self.tar_writer is None:
+            return
+        for view, final_path in enumerate(final_paths):
+            if final_path.stem in skip:
+                continue
+            metadata = self.sample_metadata(index, view, model_path, params)
+            members = {'mp4': final_path}
+            if ground_truth_path(final_path).exists():
+                members['gt.npz'] = ground_truth_path(final_path)
+            remove = [] if self.keep_videos else list(members.values())
+            self.tar_writer.add(final_path.stem, members, metadata, remove)
+            
+            for variant in range(self.augment_variants):
+                variant_path = final_path.with_name(f"{final_path.stem}_aug{variant:02d}{final_path.suffix}")
+                if not variant_path.exists():
+                    continue
+                with open(variant_path.with_suffix('.json')) as f:
+                    degradation = json.load(f)
+                self.tar_writer.add(variant_path.stem, {'mp4': variant_path},
+                                    {**metadata, 'variant': variant, 'seed': degradation['seed'],
+                                     'degradation': degradation['params']},
+                                    [] if self.keep_videos else [variant_path, variant_path.with_suffix('.json')])
+            
+            for variant in range(self.backgrounds_per_render):
+                variant_path = final_path.with_name(f"{final_path.stem}_bg{variant:02d}{final_path.suffix}")
+                if not variant_path.exists():
+                    continue
+                with open(variant_path.with_suffix('.json')) as f:
+                    sidecar = json.load(f)
+                members = {'mp4': variant_path}
+                if ground_truth_path(variant_path).exists():
+                    members['gt.npz'] = ground_truth_path(variant_path)
+                self.tar_writer.add(variant_path.stem, members,
+                                    {**metadata, 'variant': f"bg{variant:02d}", 'seed': sidecar['seed'],
+                                     'background': sidecar['background'], 'composite': sidecar['params']},
+                                    [] if self.keep_videos else [*members.values(), variant_path.with_suffix('.json')])
+        
+    def package_leftovers(self, index, manifest, model_files, packed):
+        """Pack the videos of a completed scene whose shard was never finalized, e.g. after a crash"""
+        params = scene_params(manifest, index)
+        model_path = model_files[params['model_index'] % len(model_files)]
+        final_paths = self.output_paths(self.output_dir / f"fall_scene_{index:03d}.mp4")
+        # The views of a scene may be split between a finalized shard and the lost one
+        skip = packed | {path.stem for path in final_paths if not path.exists()}
+        self.package_scene(index, final_paths, model_path, params, skip)
+        
+    def write_augmented_variants(self, index, output_paths, metadata):
+        """Write degraded copies of the clean renders, each with its parameters alongside"""
+        for view, (output_path, clean) in enumerate(zip(output_paths, self.rendered_frames)):
+            seed = (int(self.manifest['seed']), index, view)
+            variants = degrade_variants(clean, self.augment_variants, seed)
+            for variant, (params, frames) in enumerate(variants):
+                if self.shard_writer is not None:
+                    self.shard_writer.add(frames, {**metadata[view], 'variant': variant,
+                                                   'seed': list(seed), 'degradation': params})
+                if not self.write_mp4:
+                    continue
+                variant_path = output_path.with_name(f"{output_path.stem}_aug{variant:02d}{output_path.suffix}")
+                self.encode_clip(frames, variant_path)
+                with open(variant_path.with_suffix('.json'), 'w') as f:
+                    json.dump({'source': output_path.name, 'index': index, 'variant': variant,
+                               'seed': list(seed), 'params': params}, f, indent=2)
+        
+    def write_composites(self, index, output_paths, metadata):
+        """Write the foreground of every view composited over background plates, each with its parameters alongside"""
+        for view, (output_path, foreground) in enumerate(zip(output_paths, self.foregrounds)):
+            seed = (int(self.manifest['seed']), index, view)
+            labels = self.ground_truth[view] if self.export_ground_truth else None
+            variants = composite_variants(foreground, self.backgrounds, self.backgrounds_per_render, seed)
+            for variant, (params, frames) in enumerate(variants):
+                background = self.backgrounds.name(params['plate'])
+                if self.shard_writer is not None:
+                    self.shard_writer.add(frames, {**metadata[view], 'variant': f"bg{variant:02d}",
+                                                   'seed': list(seed), 'background': background,
+                                                   'composite': params})
+                if not self.write_mp4:
+                    continue
+                variant_path = output_path.with_name(f"{output_path.stem}_bg{variant:02d}{output_path.suffix}")
+                self.encode_clip(frames, variant_path)
+                if labels is not None:
+                    save_ground_truth(ground_truth_path(variant_path), composite_ground_truth(labels, params))
+                with open(variant_path.with_suffix('.json'), 'w') as f:
+                    json.dump({'source': output_path.name, 'index': index, 'variant': variant,
+                               'seed': list(seed), 'background': background, 'params': params}, f, indent=2)
+        
+    def cache_settings(self, params):
+        """Everything besides the model file that determines a scene's rendered output
+        
+        Autotuned settings are left out: they only get accepted within a
+        small tolerance of the untuned render.
+        """
+        preset = self.QUALITY_PRESETS[self.quality]
+        engine = self.engine or preset.get('engine', 'CYCLES')
+        scene = {name: value for name, value in params.items() if name != 'model_index'}
+        scene['cameras'] = params['cameras'][:self.views]
+        return {
+            'params': scene,
+            'quality': self.quality,
+            'preset': preset,
+            'engine': engine,
+            'engine_settings': self.ENGINE_SETTINGS[engine],
+            'noise': bool(self.noise_enabled()),
+            'fall_motion': self.fall_motion,
+        }
+        
+    def cache_outputs(self, final_paths):
+        """Files of a scene by their cache role, which does not depend on the scene index"""
+        outputs = {}
+        for view, final_path in enumerate(final_paths):
+            outputs[f"view{view}.mp4"] = final_path
+            if self.export_ground_truth:
+                outputs[f"view{view}.gt.npz"] = ground_truth_path(final_path)
+        return outputs
+        
+    def restore_cached(self, index, cache_key, final_paths, model_path, params):
+        """Place a previous render of an identical scene, returning whether there was one"""
+        start = time.perf_counter()
+        output_bytes = self.render_cache.restore(cache_key, self.cache_outputs(final_paths))
+        if output_bytes is None:
+            return False
+        self.package_scene(index, final_paths, model_path, params)
+        self.journal.record(index, time.perf_counter() - start, output_bytes,
+                            output=[path.name for path in final_paths], cached=True)
+        print(f"Reused cached render for {len(final_paths)} view(s) of {final_paths[0].name}")
+        return True
+        
+    def render_to_output(self, index, model_path, output_path, params):
+        """Render a scene to temporary files and move them into place only once complete"""
+        final_paths = self.output_paths(output_path)
+        # Hosts that both render a scene after a stolen lease write to their own partial files
+        tmp_paths = [partial_path(path, self.leases and self.leases.owner) for path in final_paths]
+        self.publish_pending = False
+        cache_key = None
+        if self.render_cache is not None:
+            cache_key = self.render_cache.scene_key(model_path, self.cache_settings(params))
+            if self.restore_cached(index, cache_key, final_paths, model_path, params):
+                return True
+        pipelined = self.encode_pipeline is not None
+        if pipelined:
+            # Backpressure: wait until the encoders have room for another scene's frames
+            self.encode_pipeline.wait_for_capacity()
+            self.encode_pipeline.render_started()
+        start = time.perf_counter()
+        self.metrics.begin_scene(index, Path(model_path).name, self.quality,
+                                 self.engine or self.QUALITY_PRESETS.get(self.quality, {}).get('engine'), params)
+        self.frame_dirs = []
+        self.derived_outputs = []
+        rendered = self.generate_scene(model_path, tmp_paths, params)
+        if pipelined:
+            self.encode_pipeline.render_finished()
+        if not rendered or (self.write_mp4 and not pipelined and not all(path.exists() for path in tmp_paths)):
+            for path in tmp_paths + [path for path, _ in self.derived_outputs]:
+                path.unlink(missing_ok=True)
+            self.derived_outputs = None
+            for frame_dir in self.frame_dirs:
+                shutil.rmtree(frame_dir, ignore_errors=True)
+            self.frame_dirs = None
+            self.foregrounds = None
+            self.metrics.end_scene(False)
+            return False
+        if pipelined:
+            return self.queue_encode(index, start, tmp_paths, final_paths, model_path, params, cache_key)
+        
+        output_bytes = 0
+        if self.write_mp4:
+            for tmp_path, final_path in zip(tmp_paths, final_paths):
+                os.replace(tmp_path, final_path)
+                output_bytes += final_path.stat().st_size
+        # Derived presets carry the temporary names of the primary videos in their own directories
+        final_names = {tmp_path.name: final_path.name for tmp_path, final_path in zip(tmp_paths, final_paths)}
+        for tmp_path, labels in self.derived_outputs:
+            derived_path = tmp_path.with_name(final_names[tmp_path.name])
+            os.replace(tmp_path, derived_path)
+            output_bytes += derived_path.stat().st_size
+            if labels is not None:
+                output_bytes += save_ground_truth(ground_truth_path(derived_path), labels)
+        self.derived_outputs = None
+        
+        metadata = [self.clip_metadata(index, view, model_path, params) for view in range(len(final_paths))]
+        if self.shard_writer is not None:
+            for frames, clip_metadata in zip(self.rendered_frames, metadata):
+                output_bytes += self.shard_writer.add(frames, clip_metadata)['length'] * frames[0].nbytes
+        for labels, final_path in zip(self.ground_truth or [], final_paths):
+            output_bytes += save_ground_truth(ground_truth_path(final_path), labels)
+        if cache_key is not None:
+            self.render_cache.store(cache_key, self.cache_outputs(final_paths))
+        
+        if self.augment_variants:
+            augment_start = time.perf_counter()
+            self.write_augmented_variants(index, final_paths, metadata)
+            self.metrics.add_time('augment', time.perf_counter() - augment_start)
+        if self.backgrounds_per_render:
+            composite_start = time.perf_counter()
+            self.write_composites(index, final_paths, metadata)
+            self.metrics.add_time('augment', time.perf_counter() - composite_start)
+        self.rendered_frames = None
+        self.foregrounds = None
+        self.ground_truth = None
+        self.package_scene(index, final_paths, model_path, params)
+        self.metrics.end_scene(True, output_bytes)
+        
+        frames = self.frame_timing['rendered_frames'] if self.frame_timing else None
+        self.journal.record(index, time.perf_counter() - start, output_bytes,
+                            output=[path.name for path in final_paths], frames=frames)
+        if frames is not None:
+            print(f"Rendered {frames} frames for each of {len(final_paths)} view(s) of {output_path.name}")
+        return True
+        
+    def queue_encode(self, index, start, tmp_paths, final_paths, model_path, params, cache_key=None):
+        """Hand a rendered scene to the encoder pool, which publishes its videos once encoded
+        
+        The scene counts as rendered here; a failed encode is subtracted when
+        generate_dataset drains the pipeline.
+        """
+        scene = bpy.context.scene
+        frames = self.frame_timing['rendered_frames'] if self.frame_timing else None
+        ground_truth, self.ground_truth = self.ground_truth or [], None
+        render_seconds = time.perf_counter() - start
+        # The scene's metrics row is written once its videos are encoded
+        metrics_scene = self.metrics.detach_scene()
+        leases = self.leases
+        
+        def publish(ok, encode_seconds):
+            if metrics_scene is not None:
+                metrics_scene['encode_seconds'] += encode_seconds
+            if not ok:
+                for path in tmp_paths:
+                    path.unlink(missing_ok=True)
+                if metrics_scene is not None:
+                    self.metrics.end_scene(False, scene=metrics_scene)
+                if leases is not None:
+                    leases.finish(index, False)
+                return
+            output_bytes = 0
+            for tmp_path, final_path in zip(tmp_paths, final_paths):
+                os.replace(tmp_path, final_path)
+                output_bytes += final_path.stat().st_size
+            for labels, final_path in zip(ground_truth, final_paths):
+                output_bytes += save_ground_truth(ground_truth_path(final_path), labels)
+            if cache_key is not None:
+                self.render_cache.store(cache_key, self.cache_outputs(final_paths))
+            self.package_scene(index, final_paths, model_path, params)
+            self.journal.record(index, render_seconds + encode_seconds, output_bytes,
+                                output=[path.name for path in final_paths], frames=frames,
+                                encode_seconds=round(encode_seconds, 3))
+            if metrics_scene is not None:
+                self.metrics.end_scene(True, output_bytes, metrics_scene)
+            if leases is not None:
+                leases.finish(index, True)
+        
+        self.publish_pending = True
+        self.encode_pipeline.submit(list(zip(self.frame_dirs, tmp_paths)), scene.render.fps, scene.render.fps_base,
+                                    self.QUALITY_PRESETS[self.quality]['compression'], publish)
+        self.frame_dirs = None
+        if frames is not None:
+            print(f"Rendered {frames} frames for each of {len(final_paths)} view(s) of {final_paths[0].name}, "
+                  f"queued for encoding")
+        return True
+        
+    def find_model_files(self):
+        if self.model_files:
+            return self.model_files
+        
+        # Sorted so every worker sees the same model order
+        model_files = sorted(self.model_dir.glob('*.fbx'))
         
         if not model_files:
             raise FileNotFoundError(f"No FBX files found in {self.model_dir}")
+        return model_files
+        
+    def load_or_plan_manifest(self, num_models):
+        """Load the variation manifest, planning and saving a new one if needed
+        
+        The manifest holds every scene's parameters, so workers, resumed runs
+        and re-runs with the same seed all render identical scenes. With a
+        coverage_target, num_videos becomes the number of scenes the target
+        needs, or the length of a loaded manifest.
+        """
+        if self.manifest is not None:
+            return self.manifest
+        
+        manifest_path = self.manifest_path or self.output_dir / 'manifest.npz'
+        # A resumed run must replay the manifest of the interrupted one
+        if (self.manifest_path is not None or self.resume) and manifest_path.exists():
+            self.manifest = load_manifest(manifest_path)
+            if self.coverage_target is not None:
+                self.num_videos = manifest_length(self.manifest)
+            if manifest_length(self.manifest) < self.num_videos:
+                raise ValueError(f"Manifest {manifest_path} has {manifest_length(self.manifest)} "
+                                 f"scenes, {self.num_videos} requested")
+            if manifest_views(self.manifest) < self.views:
+                raise ValueError(f"Manifest {manifest_path} plans {manifest_views(self.manifest)} "
+                                 f"camera views, {self.views} requested")
+        else:
+            if self.coverage_target is not None:
+                # Fix the seed first, the scene count depends on the design it produces
+                self.seed = resolve_seed(self.seed)
+                self.num_videos = scenes_for_coverage(self.current_variations, num_models, self.seed,
+                                                      self.coverage_target)
+                print(f"Planning {self.num_videos} scenes for {self.coverage_target:.0%} pairwise coverage")
+            self.manifest = plan_manifest(self.current_variations, self.num_videos, num_models, self.seed,
+                                          self.views, self.sampler)
+            save_manifest(manifest_path, self.manifest)
+            report_coverage(self.manifest, self.current_variations, num_models)
+        return self.manifest
+        
+    def generate_dataset(self, indices=None, leases=None):
+        """Generate specified number of fall scenes with controlled variation
+        
+        indices restricts generation to a subset of range(num_videos), which is
+        how parallel workers split the dataset. With a LeaseBoard, scenes are
+        instead claimed one at a time from every index, so processes on any
+        number of hosts can share the output directory. Returns the number of
+        scenes that rendered successfully. A full run without resume or leases
+        clears the progress journal; worker slices leave that to the parent
+        process.
+        """
+        model_files = self.find_model_files()
+        
+        # Worker slices get their own metric files, named after their first index like their shards
+        metrics_name = f"render-{indices[0]:06d}" if indices else "render"
+        if leases is not None:
+            metrics_name = f"render-{leases.owner}"
+        elif indices is None and not self.resume:
+            self.journal.reset()
+        
+        # Planning first, a coverage target decides num_videos
+        manifest = self.load_or_plan_manifest(len(model_files))
+        if indices is None:
+            indices = range(self.num_videos)
+        self.leases = leases
+        
+        self.metrics.start(metrics_name, append=self.resume)
+        
+        # Workers own disjoint index slices, so prefixing by the first index keeps shard names apart
+        prefix = f"shard-{indices[0]:06d}" if len(indices) else "shard"
+        if leases is not None:
+            prefix = f"shard-{leases.owner}"
+        if self.output_format == 'npy' and self.shard_writer is None:
+            clip_frames = self.clip_frames
+            if clip_frames is None:
+                # The slowest planned fall samples the most frames; FBX actions longer than the
+                # default range are only known once loaded, their clips start longer shards
+                clip_frames = compute_frame_timing(*DEFAULT_ACTION_FRAMES, SOURCE_FPS,
+                                                   self.QUALITY_PRESETS[self.quality]['fps'],
+                                                   float(manifest['fall_speed'].min()))['rendered_frames']
+            self.shard_writer = FrameShardWriter(self.output_dir / 'shards', clip_frames,
+                                                 self.clips_per_shard, prefix)
+        packed = set()
+        if self.tar_shards and self.tar_writer is None:
+            self.tar_writer = TarShardWriter(self.output_dir / 'tars', self.tar_shard_size * 1024 * 1024, prefix)
+            if self.resume:
+                packed = {entry['key'] for entry in load_tar_index(self.tar_writer.shard_dir)}
         
         # Generate specified number of videos
         successful = 0
-        for i in range(self.num_videos):
-            # Cycle through available models
-            model_path = model_files[i % len(model_files)]
-            output_path = self.output_dir / f"fall_scene_{i:03d}.mp4"
+        skipped = 0
+        self.restart_requested = False
+        try:
+            for i in (leases.claims(indices) if leases is not None else indices):
+                if self.memory.exhausted:
+                    # A claimed lease is released below, the restarted process claims it again
+                    print(f"Memory budget exhausted ({self.memory.reason()}), stopping for a restart")
+                    self.restart_requested = True
+                    break
+                if self.resume and self.journal.is_complete(i):
+                    skipped += 1
+                    successful += 1
+                    if self.tar_writer is not None:
+                        self.package_leftovers(i, manifest, model_files, packed)
+                    if leases is not None:
+                        leases.finish(i, True)
+                    continue
+                
+                params = scene_params(manifest, i)
+                # Cycle through available models
+                model_path = model_files[params['model_index'] % len(model_files)]
+                output_path = self.output_dir / f"fall_scene_{i:03d}.mp4"
+                
+                print(f"Generating scene {i+1}/{self.num_videos}: {output_path}")
+                ok = self.render_to_output(i, model_path, output_path, params)
+                if ok:
+                    successful += 1
+                # Scenes still encoding release their lease once published
+                if leases is not None and not self.publish_pending:
+                    leases.finish(i, ok)
+                self.metrics.record_memory(self.memory.after_scene(i))
+        finally:
+            # Also after a failed scene, so a daemon's next job starts without stale handlers and threads
+            try:
+                if self.shard_writer is not None:
+                    self.shard_writer.close()
+                    self.shard_writer = None
+                if self.encode_pipeline is not None:
+                    # Scenes whose encode failed were counted when they finished rendering
+                    successful -= self.encode_pipeline.close()
+                if self.tar_writer is not None:
+                    self.tar_writer.close()  # After the encoders, they add the videos they publish
+                    self.tar_writer = None
+            finally:
+                if leases is not None:
+                    # Leases of scenes interrupted mid-render are released for other hosts
+                    leases.stop()
+                    self.leases = None
+                self.metrics.stop()
+        
+        if skipped:
+            print(f"Resumed run: skipped {skipped} scenes completed earlier.")
+        total = leases.claimed if leases is not None else len(indices)
+        print(f"Generation complete. Successfully generated {successful}/{total} scenes.")
+        if leases is not None and leases.stolen:
+            print(f"Took over {leases.stolen} scenes from workers that stopped responding.")
+        print(f"Variation level: {self.variation_level}")
+        self.metrics.report()
+        self.memory.report()
+        if self.encode_pipeline is not None:
+            self.encode_pipeline.report()
+        if self.model_cache is not None:
+            self.model_cache.report()
+        if self.render_cache is not None:
+            self.render_cache.report()
+        return successful
+        
+    def compare_engines(self, engines=tuple(ENGINE_SETTINGS), index=0, frames=10):
+        """Render the same planned scene with each engine and report seconds per frame
+        
+        The first frame of each engine is rendered once untimed so shader
+        compilation and BVH builds do not skew the comparison.
+        """
+        model_files = self.find_model_files()
+        params = scene_params(self.load_or_plan_manifest(len(model_files)), index)
+        model_path = model_files[params['model_index'] % len(model_files)]
+        comparison_dir = self.output_dir / 'engine_comparison'
+        comparison_dir.mkdir(exist_ok=True)
+        
+        results = {}
+        for engine in engines:
+            self.engine = engine
+            output_path = comparison_dir / f"{engine.lower()}.mp4"
+            if not self.prepare_scene(model_path, output_path, params):
+                continue
+            
+            scene = bpy.context.scene
+            scene.frame_end = min(scene.frame_end, scene.frame_start + (frames - 1) * scene.frame_step)
+            rendered = len(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
             
-            print(f"Generating scene {i+1}/{self.num_videos}: {output_path}")
-            if self.generate_scene(model_path, output_path):
-                successful += 1
+            bpy.ops.render.render(write_still=False)  # Warm-up
+            start = time.perf_counter()
+            bpy.ops.render.render(animation=True)
+            elapsed = time.perf_counter() - start
+            results[engine] = {'seconds_per_frame': elapsed / rendered, 'frames': rendered}
         
-        print(f"Generation complete. Successfully generated {successful}/{self.num_videos} scenes.")
-        print(f"Variation level: {self.variation_level}")
\ No newline at end of file
+        print(f"Engine comparison for scene {index} at '{self.quality}' quality:")
+        for engine, result in sorted(results.items(), key=lambda item: item[1]['seconds_per_frame']):
+            print(f"  {engine:<18} {result['seconds_per_frame']:.3f} s/frame")
+        with open(comparison_dir / 'results.json', 'w') as f:
+            json.dump({'quality': self.quality, 'index': index, 'results': results}, f, indent=2)
+        return results
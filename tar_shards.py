@@ -0,0 +1,174 @@
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+from pathlib import Path
+
+INDEX_NAME = 'index.jsonl'
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+
+
+def padded_size(size):
+    """Bytes a member's data takes in a tar, rounded up to whole blocks"""
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+
+class TarShardWriter:
+    """Streams finished clips into size-bounded, WebDataset-style .tar shards
+
+    Every clip is a group of members sharing a key, e.g. fall_scene_012.mp4,
+    fall_scene_012.json and fall_scene_012.gt.npz, written next to each other
+    so a sequential reader sees a whole sample at once. A shard is written
+    to a hidden .partial file and renamed into place once it would grow past
+    max_bytes, and only then are its clips appended to index.jsonl with the
+    byte offset and size of every member. Readers never see a shard that is
+    still being written. Source files listed in remove are deleted once
+    their shard is final, so a crash never loses a clip: a resumed run
+    packs the files that were left behind again. Clips may be added from
+    encoder threads.
+    """
+    def __init__(self, shard_dir, max_bytes=512 * 1024 ** 2, prefix='shard'):
+        self.shard_dir = Path(shard_dir)
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.tar = None
+        self.file = None
+        self.shard_path = None
+        self.entries = []
+        self.sources = []  # Files to delete once the current shard is final
+        self.shards = 0
+        self._lock = threading.RLock()
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+
+    def _next_shard_path(self):
+        # Never append to shards of an earlier run, a resumed run starts new ones
+        number = 0
+        while any((self.shard_dir / name).exists()
+                  for name in (f"{self.prefix}-{number:06d}.tar", f".{self.prefix}-{number:06d}.tar.partial")):
+            number += 1
+        return self.shard_dir / f"{self.prefix}-{number:06d}.tar"
+
+    def _partial_path(self):
+        return self.shard_path.with_name(f".{self.shard_path.name}.partial")
+
+    def _open_shard(self):
+        self.shard_path = self._next_shard_path()
+        self.file = open(self._partial_path(), 'wb')
+        self.tar = tarfile.open(fileobj=self.file, mode='w', format=tarfile.PAX_FORMAT)
+
+    def _add_member(self, name, fileobj, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = time.time()
+        info.mode = 0o644
+        self.tar.addfile(info, fileobj)
+        # The header may span several blocks for long names, the data ends the member
+        return {'offset': self.tar.offset - padded_size(size), 'size': size}
+
+    def add(self, key, members, metadata, remove=()):
+        """Write one clip: members maps extensions to file paths or bytes, metadata becomes <key>.json
+
+        Returns the number of bytes added. Paths listed in remove are deleted
+        once the shard holding them is final.
+        """
+        sidecar = json.dumps(metadata, sort_keys=True).encode()
+        sizes = [len(value) if isinstance(value, bytes) else os.path.getsize(value) for value in members.values()]
+        clip_bytes = sum(padded_size(size) + BLOCK_SIZE for size in sizes + [len(sidecar)])
+        with self._lock:
+            if self.tar is not None and self.entries and self.tar.offset + clip_bytes > self.max_bytes:
+                self.finalize()
+            if self.tar is None:
+                self._open_shard()
+
+            start = self.tar.offset
+            offsets = {}
+            for extension, value in members.items():
+                if isinstance(value, bytes):
+                    offsets[extension] = self._add_member(f"{key}.{extension}", io.BytesIO(value), len(value))
+                else:
+                    with open(value, 'rb') as f:
+                        offsets[extension] = self._add_member(f"{key}.{extension}", f,
+                                                              os.fstat(f.fileno()).st_size)
+            offsets['json'] = self._add_member(f"{key}.json", io.BytesIO(sidecar), len(sidecar))
+
+            self.entries.append({'key': key, 'members': offsets, **metadata})
+            self.sources.extend(Path(path) for path in remove)
+            return self.tar.offset - start
+
+    def finalize(self):
+        """Close the current shard, move it into place and index its clips"""
+        with self._lock:
+            self._finalize()
+
+    def _finalize(self):
+        if self.tar is None:
+            return
+        self.tar.close()  # Writes the end-of-archive blocks
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.tar = None
+        self.file = None
+
+        partial = self._partial_path()
+        if not self.entries:
+            partial.unlink(missing_ok=True)
+            return
+        os.replace(partial, self.shard_path)
+        shard_bytes = self.shard_path.stat().st_size
+        with open(self.shard_dir / INDEX_NAME, 'a') as f:
+            f.write(''.join(json.dumps({'shard': self.shard_path.name, 'shard_bytes': shard_bytes, **entry}) + '\n'
+                            for entry in self.entries))
+            f.flush()
+            os.fsync(f.fileno())
+        for path in self.sources:
+            path.unlink(missing_ok=True)
+        print(f"Finalized {self.shard_path.name}: {len(self.entries)} clips, {shard_bytes / 1024 ** 2:.1f} MB")
+        self.shards += 1
+        self.entries = []
+        self.sources = []
+
+    def close(self):
+        self.finalize()
+
+
+def load_index(shard_dir):
+    """Read the tar shard index, keeping the latest entry when a clip was packed twice"""
+    entries = {}
+    index_path = Path(shard_dir) / INDEX_NAME
+    if not index_path.exists():
+        return []
+    with open(index_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn line from an interrupted run
+            entries[entry['key']] = entry
+    return list(entries.values())
+
+
+def iter_shard(path):
+    """Yield (key, {extension: bytes}) for every clip of a shard in one sequential pass"""
+    key, sample = None, {}
+    with tarfile.open(path, mode='r|') as tar:
+        for member in tar:
+            member_key, _, extension = member.name.partition('.')
+            if member_key != key and sample:
+                yield key, sample
+                sample = {}
+            key = member_key
+            sample[extension] = tar.extractfile(member).read()
+    if sample:
+        yield key, sample
+
+
+def read_member(shard_dir, entry, extension):
+    """Read one member of an indexed clip with a single seek, without scanning the shard"""
+    member = entry['members'][extension]
+    with open(Path(shard_dir) / entry['shard'], 'rb') as f:
+        f.seek(member['offset'])
+        return f.read(member['size'])
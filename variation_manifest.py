@@ -0,0 +1,267 @@
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from synfall_settings import FALL_MOTIONS, level_variations
+from variation_sampler import (SAMPLERS, coverage_report, factor_levels, sample_design,
+                               scenes_for_coverage, stratified_uniform)
+
+MANIFEST_VERSION = 2
+
+# Jitter ranges applied on top of the discrete variation choices. Variation
+# levels override the position range and extra rotation chance.
+POSITION_OFFSET_RANGE = 1.5
+EXTRA_ROTATION_CHANCE = 0.3
+EXTRA_ROTATION_RANGE = 30.0  # degrees
+CAMERA_X_RANGE = (-2.0, 2.0)
+CAMERA_Y_RANGE = (-8.0, -6.0)
+CAMERA_HEIGHT_JITTER = 0.5
+CAMERA_ROTATION_JITTER = 0.1
+LIGHT_ENERGY_JITTER = (0.9, 1.1)
+LIGHT_COLOR_JITTER = (0.95, 1.05)
+LIGHT_TILT_RANGE = 0.2
+
+
+def resolve_seed(seed):
+    """Return seed, or a fresh one to record so unseeded runs can still be reproduced"""
+    if seed is None:
+        return int(np.random.SeedSequence().entropy % 2 ** 63)
+    return seed
+
+
+def plan_manifest(variations, num_videos, num_models=1, seed=None, num_views=1, sampler='pairwise'):
+    """Sample the parameters of every scene up front
+
+    Returns a dict of column arrays with one row per scene. Categorical
+    choices come from the design of the chosen sampler (see
+    variation_sampler) and are kept as *_idx columns next to the resolved
+    values so coverage can be analysed without the variation tables. Camera
+    columns hold num_views cameras per scene, with distinct angle presets
+    while there are enough of them; the sampler designs the first view.
+    """
+    seed = resolve_seed(seed)
+    rng = np.random.default_rng(seed)
+    n = num_videos
+
+    # The random sampler keeps cycling models, the others cover them as a factor
+    levels = factor_levels(variations, num_models if sampler != 'random' else 1)
+    design = sample_design(sampler, levels, n, seed)
+
+    def choose(key):
+        return design[key].astype(np.int16)
+
+    def uniform(low, high, size):
+        if sampler == 'lhs':
+            return stratified_uniform(rng, low, high, size)
+        return rng.uniform(low, high, size)
+
+    rotations = np.asarray(variations['rotations'], dtype=np.float32)
+    poses = np.array([(p['bend'], p['twist']) for p in variations['initial_poses']], dtype=np.float32)
+    speeds = np.asarray(variations['fall_speeds'], dtype=np.float32)
+    heights = np.asarray(variations['camera_heights'], dtype=np.float32)
+    angles = np.asarray(variations['camera_angles'], dtype=np.float32)
+    energies = np.array([l['energy'] for l in variations['lighting_conditions']], dtype=np.float32)
+    colors = np.array([l['color'] for l in variations['lighting_conditions']], dtype=np.float32)
+    ground_colors = np.array([g['color'] for g in variations['ground_materials']], dtype=np.float32)
+    roughness = np.array([g['roughness'] for g in variations['ground_materials']], dtype=np.float32)
+
+    rotation_idx = choose('rotations')
+    pose_idx = choose('initial_poses')
+    speed_idx = choose('fall_speeds')
+    height_idx = rng.integers(0, len(heights), (n, num_views)).astype(np.int16)
+    height_idx[:, 0] = choose('camera_heights')
+    order = rng.random((n, len(angles)))
+    order[np.arange(n), choose('camera_angles')] = -1.0  # Designed angle sorts first
+    if num_views <= len(angles):
+        # Random permutation per scene: different angles for every view
+        angle_idx = order.argsort(axis=1)[:, :num_views].astype(np.int16)
+    else:
+        angle_idx = rng.integers(0, len(angles), (n, num_views)).astype(np.int16)
+        angle_idx[:, 0] = choose('camera_angles')
+    lighting_idx = choose('lighting_conditions')
+    ground_idx = choose('ground_materials')
+    if 'models' in design:
+        model_index = design['models']
+    else:
+        model_index = np.arange(n) % max(num_models, 1)
+    fall_types = {}
+    if 'fall_types' in design:
+        fall_types['fall_type_idx'] = choose('fall_types')
+        fall_types['fall_type'] = np.asarray(variations['fall_types'])[fall_types['fall_type_idx']]
+
+    position_range = variations.get('position_range', POSITION_OFFSET_RANGE)
+    extra_rotation_mask = uniform(0.0, 1.0, n) < variations.get('rotation_chance', EXTRA_ROTATION_CHANCE)
+    extra_rotation = rng.uniform(-EXTRA_ROTATION_RANGE, EXTRA_ROTATION_RANGE, n) * extra_rotation_mask
+
+    camera_location = np.stack([
+        uniform(*CAMERA_X_RANGE, (n, num_views)),
+        uniform(*CAMERA_Y_RANGE, (n, num_views)),
+        heights[height_idx] + uniform(-CAMERA_HEIGHT_JITTER, CAMERA_HEIGHT_JITTER, (n, num_views)),
+    ], axis=2)
+    camera_rotation = angles[angle_idx] + uniform(
+        -CAMERA_ROTATION_JITTER, CAMERA_ROTATION_JITTER, (n, num_views, 3))
+
+    light_rotation = np.stack([
+        uniform(-LIGHT_TILT_RANGE, LIGHT_TILT_RANGE, n),
+        uniform(-LIGHT_TILT_RANGE, LIGHT_TILT_RANGE, n),
+        uniform(-np.pi, np.pi, n),
+    ], axis=1)
+
+    return {
+        'version': np.array(MANIFEST_VERSION),
+        'seed': np.array(seed, dtype=np.int64),
+        'sampler': np.array(sampler),
+        'model_index': model_index.astype(np.int32),
+        'rotation_idx': rotation_idx,
+        'initial_pose_idx': pose_idx,
+        'fall_speed_idx': speed_idx,
+        'camera_height_idx': height_idx,
+        'camera_angle_idx': angle_idx,
+        'lighting_idx': lighting_idx,
+        'ground_idx': ground_idx,
+        'rotation': rotations[rotation_idx],
+        'pose_bend': poses[pose_idx, 0],
+        'pose_twist': poses[pose_idx, 1],
+        'fall_speed': speeds[speed_idx],
+        'model_offset': uniform(-position_range, position_range, (n, 2)).astype(np.float32),
+        'extra_rotation_mask': extra_rotation_mask,
+        'extra_rotation': extra_rotation.astype(np.float32),
+        'camera_location': camera_location.astype(np.float32),
+        'camera_rotation': camera_rotation.astype(np.float32),
+        'light_energy': (energies[lighting_idx] * uniform(*LIGHT_ENERGY_JITTER, n)).astype(np.float32),
+        'light_color': (colors[lighting_idx] * uniform(*LIGHT_COLOR_JITTER, (n, 3))).astype(np.float32),
+        'light_rotation': light_rotation.astype(np.float32),
+        'ground_color': ground_colors[ground_idx],
+        'ground_roughness': roughness[ground_idx],
+        **fall_types,
+    }
+
+
+def manifest_design(manifest, num_models=1):
+    """Level index columns of the first camera view, keyed by factor name as in variation_sampler"""
+    columns = {
+        'rotations': manifest['rotation_idx'],
+        'initial_poses': manifest['initial_pose_idx'],
+        'fall_speeds': manifest['fall_speed_idx'],
+        'camera_heights': manifest['camera_height_idx'][:, 0],
+        'camera_angles': manifest['camera_angle_idx'][:, 0],
+        'lighting_conditions': manifest['lighting_idx'],
+        'ground_materials': manifest['ground_idx'],
+    }
+    if 'fall_type_idx' in manifest:
+        columns['fall_types'] = manifest['fall_type_idx']
+    if num_models > 1:
+        columns['models'] = manifest['model_index']
+    return columns
+
+
+def report_coverage(manifest, variations, num_models=1):
+    """Print the factor and pairwise coverage of a manifest planned from variations"""
+    return coverage_report(manifest_design(manifest, num_models), factor_levels(variations, num_models))
+
+
+def manifest_length(manifest):
+    return len(manifest['model_index'])
+
+
+def manifest_views(manifest):
+    return manifest['camera_location'].shape[1]
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically as a compressed NPZ file"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp_path, **manifest)
+    os.replace(tmp_path, path)
+
+
+def publish_manifest(path, manifest):
+    """Save the manifest unless another process got there first, and return the one on disk
+
+    Hosts that start at the same time may plan different manifests (unseeded
+    runs); linking instead of renaming lets exactly one of them win.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp_path, **manifest)
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        tmp_path.unlink()
+    return load_manifest(path)
+
+
+def load_manifest(path):
+    with np.load(path) as data:
+        manifest = {key: data[key] for key in data.files}
+    if int(manifest['version']) != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version {int(manifest['version'])} in {path}")
+    return manifest
+
+
+def scene_params(manifest, index):
+    """Resolve one manifest row into plain Python values for the Blender side"""
+    return {
+        'model_index': int(manifest['model_index'][index]),
+        'rotation': float(manifest['rotation'][index]),
+        'pose_bend': float(manifest['pose_bend'][index]),
+        'pose_twist': float(manifest['pose_twist'][index]),
+        'fall_speed': float(manifest['fall_speed'][index]),
+        'model_offset': tuple(manifest['model_offset'][index].tolist()),
+        'extra_rotation': (float(manifest['extra_rotation'][index])
+                           if manifest['extra_rotation_mask'][index] else None),
+        'camera_location': tuple(manifest['camera_location'][index, 0].tolist()),
+        'camera_rotation': tuple(manifest['camera_rotation'][index, 0].tolist()),
+        'cameras': [(tuple(location), tuple(rotation)) for location, rotation in
+                    zip(manifest['camera_location'][index].tolist(), manifest['camera_rotation'][index].tolist())],
+        'light_energy': float(manifest['light_energy'][index]),
+        'light_color': tuple(manifest['light_color'][index].tolist()),
+        'light_rotation': tuple(manifest['light_rotation'][index].tolist()),
+        'ground_color': tuple(manifest['ground_color'][index].tolist()),
+        'ground_roughness': float(manifest['ground_roughness'][index]),
+        'fall_type': str(manifest['fall_type'][index]) if 'fall_type' in manifest else None,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Plan scene parameters for a synthetic fall dataset')
+    parser.add_argument('--output', type=str, required=True, help='Path of the manifest to write (.npz)')
+    parser.add_argument('--num-videos', type=int, default=10, help='Number of scenes to plan')
+    parser.add_argument('--num-models', type=int, default=1, help='Number of FBX models to cycle through')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible datasets')
+    parser.add_argument('--views', type=int, default=1, help='Number of cameras planned per scene')
+    parser.add_argument('--variation', type=str, default='medium', choices=['minimal', 'low', 'medium', 'high'],
+                        help='Variation level whose factor levels are planned')
+    parser.add_argument('--fall-motion', type=str, default='fbx', choices=FALL_MOTIONS,
+                        help="Plan fall types as a factor for 'procedural' motion")
+    parser.add_argument('--sampler', type=str, default='pairwise', choices=SAMPLERS,
+                        help='How factor levels are combined across scenes')
+    parser.add_argument('--coverage-target', type=float, default=None,
+                        help='Plan just enough scenes for this fraction of pairwise coverage (overrides --num-videos)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    variations = level_variations(args.variation, args.fall_motion)
+    seed = resolve_seed(args.seed)
+    num_videos = args.num_videos
+    if args.coverage_target is not None:
+        num_videos = scenes_for_coverage(variations, args.num_models, seed, args.coverage_target)
+
+    start = time.perf_counter()
+    manifest = plan_manifest(variations, num_videos, args.num_models, seed, args.views, args.sampler)
+    elapsed = time.perf_counter() - start
+    save_manifest(args.output, manifest)
+
+    print(f"Planned {num_videos} scenes in {elapsed * 1000:.1f} ms: {args.output}")
+    report_coverage(manifest, variations, args.num_models)
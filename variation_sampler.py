@@ -0,0 +1,202 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Categorical factors of a scene, in the order they appear in the design columns
+FACTORS = [
+    'rotations',
+    'initial_poses',
+    'fall_speeds',
+    'camera_heights',
+    'camera_angles',
+    'lighting_conditions',
+    'ground_materials',
+    'fall_types',  # Only planned for procedural motion
+]
+
+# 'random' draws each factor independently, 'pairwise' builds a covering array
+# so every pair of factor levels appears together as early as possible, and
+# 'lhs' stratifies every factor (and the continuous jitter) Latin-hypercube style
+SAMPLERS = ('random', 'pairwise', 'lhs')
+
+# Candidate rows scored per row when building a covering array
+PAIRWISE_CANDIDATES = 30
+
+
+def design_rng(seed):
+    """Generator for the design alone, so the same seed always yields the same design"""
+    return np.random.default_rng([seed, 2])
+
+
+def factor_levels(variations, num_models=1):
+    """Number of levels of every factor in variations, with the model as an extra factor when there are several"""
+    levels = {name: len(variations[name]) for name in FACTORS if name in variations}
+    if num_models > 1:
+        levels['models'] = num_models
+    return levels
+
+
+def pairwise_lower_bound(levels):
+    """No design covers every pair in fewer rows than the two largest factors multiplied"""
+    sizes = sorted(levels.values(), reverse=True)
+    return sizes[0] * sizes[1] if len(sizes) > 1 else sizes[0]
+
+
+@lru_cache(maxsize=32)
+def covering_array(sizes, seed, candidates=PAIRWISE_CANDIDATES):
+    """Greedy (AETG-style) strength-2 covering array, one row per scene
+
+    Each row is the best of several greedy candidates, so coverage grows as
+    fast as possible and every prefix of the array is itself a good design.
+    One construction is seeded from the design seed and memoized per
+    (sizes, seed), so sizing a run by coverage and planning it build the
+    array once. The result is read-only.
+    """
+    array = _greedy_covering_array(list(sizes), design_rng(seed), candidates)
+    array.flags.writeable = False
+    return array
+
+
+def _greedy_covering_array(sizes, rng, candidates):
+    k = len(sizes)
+    if k < 2:
+        return np.arange(sizes[0])[:, None] if k else np.zeros((1, 0), dtype=np.int64)
+    # Levels of all factors are numbered consecutively; uncovered[a, b] marks an
+    # uncovered pair of levels of two different factors
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    factor_of = np.repeat(np.arange(k), sizes)
+    uncovered = factor_of[:, None] != factor_of[None, :]
+    levels = np.full((k, max(sizes)), -1)
+    for f, size in enumerate(sizes):
+        levels[f, :size] = offsets[f] + np.arange(size)
+    remaining = uncovered.sum() // 2
+    every = np.arange(candidates)
+
+    rows = []
+    while remaining:
+        # Level taking part in the most uncovered pairs starts every candidate
+        totals = uncovered.sum(axis=1)
+        starts = np.flatnonzero(totals == totals.max())
+        first = starts[rng.integers(len(starts), size=candidates)]
+        chosen = np.full((candidates, k), -1)
+        chosen[every, factor_of[first]] = first
+        gain = uncovered[first].astype(np.int64)
+
+        # All candidates fill their remaining factors in their own random order, greedily
+        # taking the level covering most new pairs with the levels chosen so far
+        order = np.argsort(rng.random((candidates, k)), axis=1)
+        for step in range(k):
+            factor = order[:, step]
+            options = levels[factor]
+            scores = np.where(options >= 0, gain[every[:, None], np.maximum(options, 0)], -1)
+            scores = scores + rng.random(scores.shape) * 0.5  # Random tie-break among the best levels
+            level = options[every, scores.argmax(axis=1)]
+            open_ = chosen[every, factor] < 0
+            chosen[every[open_], factor[open_]] = level[open_]
+            gain[open_] += uncovered[level[open_]]
+
+        row_gain = uncovered[chosen[:, :, None], chosen[:, None, :]].sum(axis=(1, 2)) // 2
+        best = chosen[row_gain.argmax()]
+        uncovered[np.ix_(best, best)] = False
+        remaining -= row_gain.max()
+        rows.append(best - offsets)
+    return np.array(rows)
+
+
+def pairwise_design(sizes, n, seed):
+    """n rows that cover every pair of levels once n reaches the covering array size
+
+    Longer runs repeat the covering array with the levels of every factor
+    relabelled at random, which keeps each repeat a full covering array
+    while spreading higher-order combinations.
+    """
+    base = covering_array(tuple(sizes), seed)
+    rng = np.random.default_rng([seed, 3])
+    repeats = -(-n // len(base)) - 1
+    if repeats <= 0:
+        return base[:n]
+    # All repeats at once: a random level permutation per repeat and factor, and a random row order
+    relabelled = np.stack([np.argsort(rng.random((repeats, size)), axis=1)[:, base[:, f]]
+                           for f, size in enumerate(sizes)], axis=2)
+    order = np.argsort(rng.random((repeats, len(base))), axis=1)
+    blocks = relabelled[np.arange(repeats)[:, None], order]
+    return np.concatenate([base, blocks.reshape(-1, len(sizes))])[:n]
+
+
+def latin_hypercube(sizes, n, rng):
+    """Every factor split into n strata, so each level appears within one of n / levels times"""
+    strata = np.stack([rng.permutation(n) for _ in sizes], axis=1)
+    return strata * np.asarray(sizes) // n
+
+
+def stratified_uniform(rng, low, high, size):
+    """Latin-hypercube uniform samples: one draw per 1/n stratum along the first axis"""
+    size = (size,) if np.isscalar(size) else tuple(size)
+    n = size[0]
+    strata = np.stack([rng.permutation(n) for _ in range(int(np.prod(size[1:], dtype=int)))], axis=-1)
+    u = (strata.reshape(size) + rng.random(size)) / n
+    return low + (high - low) * u
+
+
+def sample_design(sampler, levels, n, seed):
+    """Level index columns for n scenes, keyed by factor name
+
+    The same seed always yields the same design.
+    """
+    if sampler not in SAMPLERS:
+        raise ValueError(f"Unknown sampler '{sampler}', expected one of {', '.join(SAMPLERS)}")
+    names = list(levels)
+    sizes = [levels[name] for name in names]
+    rng = design_rng(seed)
+    if sampler == 'pairwise':
+        design = pairwise_design(sizes, n, seed)
+    elif sampler == 'lhs':
+        design = latin_hypercube(sizes, n, rng)
+    else:
+        design = np.stack([rng.integers(0, size, n) for size in sizes], axis=1)
+    return {name: design[:, f] for f, name in enumerate(names)}
+
+
+def pair_coverage(columns, levels):
+    """Cumulative fraction of level pairs covered after each row of a design"""
+    names = list(levels)
+    n = len(columns[names[0]])
+    total = 0
+    new_pairs = np.zeros(n, dtype=np.int64)
+    for i, f in enumerate(names):
+        for g in names[i + 1:]:
+            total += levels[f] * levels[g]
+            codes = columns[f].astype(np.int64) * levels[g] + columns[g]
+            _, first = np.unique(codes, return_index=True)
+            np.add.at(new_pairs, first, 1)
+    return np.cumsum(new_pairs) / max(total, 1)
+
+
+def scenes_for_coverage(variations, num_models=1, seed=0, target=1.0):
+    """Smallest number of scenes whose pairwise design reaches the coverage target
+
+    Matches the design plan_manifest builds for the same seed and sampler='pairwise'.
+    """
+    levels = factor_levels(variations, num_models)
+    sizes = [levels[name] for name in levels]
+    design = covering_array(tuple(sizes), seed)
+    columns = {name: design[:, f] for f, name in enumerate(levels)}
+    coverage = pair_coverage(columns, levels)
+    return int(np.searchsorted(coverage, target - 1e-9) + 1)
+
+
+def coverage_report(columns, levels):
+    """Print how well a design covers single levels and pairs of levels"""
+    n = len(next(iter(columns.values())))
+    print(f"Coverage of {n} scenes over {len(levels)} factors:")
+    if n == 0:
+        return 0.0
+    coverage = pair_coverage(columns, levels)
+    for name, size in levels.items():
+        counts = np.bincount(columns[name], minlength=size)
+        print(f"  {name:<20} {np.count_nonzero(counts)}/{size} levels, {counts.min()}-{counts.max()} scenes each")
+    full = np.flatnonzero(coverage >= 1.0 - 1e-9)
+    reached = f", complete after {full[0] + 1} scenes" if len(full) else ""
+    print(f"  Pairwise coverage {coverage[-1]:.1%}{reached} "
+          f"(lower bound for full coverage: {pairwise_lower_bound(levels)} scenes)")
+    return float(coverage[-1])
@@ -0,0 +1,82 @@
+import os
+import subprocess
+from fractions import Fraction
+from pathlib import Path
+
+import numpy as np
+
+# ffmpeg binary used for encoding outside of Blender's built-in writer
+FFMPEG_BINARY = os.environ.get('SYNFALL_FFMPEG', 'ffmpeg')
+
+# x264 CRF equivalents of Blender's constant_rate_factor presets
+CRF_PRESETS = {
+    'LOSSLESS': 0,
+    'PERC_LOSSLESS': 17,
+    'HIGHEST': 17,
+    'HIGH': 20,
+    'MEDIUM': 23,
+    'LOW': 26,
+    'VERYLOW': 29,
+    'LOWEST': 32,
+}
+
+
+def frame_rate(fps, fps_base=1.0):
+    rate = Fraction(fps / fps_base).limit_denominator(1001)
+    return f"{rate.numerator}/{rate.denominator}"
+
+
+def h264_options(compression):
+    # Same GOP and B-frame settings as the Blender FFMPEG writer in setup_render_settings
+    return ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-g', '10', '-bf', '0',
+            '-crf', str(CRF_PRESETS.get(compression, 23))]
+
+
+def encode_frames(frames, output_path, fps, fps_base=1.0, compression='MEDIUM'):
+    """Encode a (T, H, W, 3) uint8 array to an H.264 MP4 through an ffmpeg pipe"""
+    frames = np.ascontiguousarray(frames[..., :3], dtype=np.uint8)
+    _, height, width, _ = frames.shape
+    command = [
+        FFMPEG_BINARY, '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{width}x{height}",
+        '-r', frame_rate(fps, fps_base), '-i', '-',
+        *h264_options(compression),
+        str(output_path),
+    ]
+    subprocess.run(command, input=frames.tobytes(), check=True)
+
+
+def encode_sequence(frame_paths, output_path, fps, fps_base=1.0, compression='MEDIUM'):
+    """Encode an ordered list of image files to an H.264 MP4
+
+    Blender names frames by frame number, which leaves gaps with a frame
+    step, so the files are renamed to a dense sequence first.
+    """
+    frame_paths = [Path(path) for path in frame_paths]
+    pattern = frame_paths[0].parent / f"seq_%06d{frame_paths[0].suffix}"
+    for number, path in enumerate(frame_paths):
+        os.replace(path, str(pattern) % number)
+    command = [
+        FFMPEG_BINARY, '-y', '-loglevel', 'error',
+        '-framerate', frame_rate(fps, fps_base), '-i', str(pattern),
+        *h264_options(compression),
+        str(output_path),
+    ]
+    subprocess.run(command, check=True)
+
+
+def decode_frames(path, size, max_frames=None):
+    """Decode a video or still image to a (T, H, W, 3) uint8 array of size (width, height)
+
+    The source is scaled to cover size and center-cropped, so plates of any
+    aspect ratio fill the frame without letterboxing.
+    """
+    width, height = size
+    command = [
+        FFMPEG_BINARY, '-loglevel', 'error', '-i', str(path),
+        '-vf', f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}",
+        *(['-frames:v', str(max_frames)] if max_frames else []),
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-',
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+    return np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, height, width, 3)
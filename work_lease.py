@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# Seconds without a heartbeat after which another worker may steal a lease
+LEASE_TIMEOUT = 120.0
+
+# A scene that failed on this many workers is given up on instead of retried forever
+MAX_ATTEMPTS = 2
+
+
+def worker_owner():
+    """Identity of this process across every host sharing the lease directory"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseBoard:
+    """Scene indices claimed through lease files in a directory shared by many hosts
+
+    A worker claims an index by creating <index>.lease with O_EXCL, which
+    succeeds for exactly one worker even on NFS. A heartbeat thread refreshes
+    the modification time of every held lease. A lease that has not been
+    refreshed for timeout seconds belongs to a dead worker and is stolen.
+    Expiry is judged by the shared filesystem's clock, not the local one, so
+    hosts with skewed clocks agree. A finished index gets an <index>.done
+    marker, and a failed one an <index>.failed-<owner> marker.
+    """
+    def __init__(self, lease_dir, timeout=LEASE_TIMEOUT, heartbeat=None, poll_interval=None, owner=None):
+        self.lease_dir = Path(lease_dir)
+        self.timeout = timeout
+        self.heartbeat_interval = heartbeat or timeout / 4
+        self.poll_interval = poll_interval or min(timeout / 4, 10.0)
+        self.owner = owner or worker_owner()
+        self.held = set()
+        self.lost = set()  # Leases stolen from this worker while it still held them
+        self.claimed = 0
+        self.stolen = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+
+    def lease_path(self, index):
+        return self.lease_dir / f"{index:06d}.lease"
+
+    def done_path(self, index):
+        return self.lease_dir / f"{index:06d}.done"
+
+    def fs_time(self):
+        """Current time according to the shared filesystem"""
+        clock = self.lease_dir / f".clock-{socket.gethostname()}"
+        clock.touch()
+        return clock.stat().st_mtime
+
+    def snapshot(self):
+        """Done indices, failure counts and live leases from one directory listing"""
+        done = set()
+        failures = Counter()
+        leases = {}
+        for entry in os.scandir(self.lease_dir):
+            index, _, kind = entry.name.partition('.')
+            if not index.isdigit():
+                continue
+            if kind == 'done':
+                done.add(int(index))
+            elif kind.startswith('failed-'):
+                failures[int(index)] += 1
+            elif kind == 'lease':
+                try:
+                    leases[int(index)] = entry.stat().st_mtime
+                except FileNotFoundError:
+                    pass
+        return done, failures, leases
+
+    def _create(self, index):
+        try:
+            fd = os.open(self.lease_path(index), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'owner': self.owner, 'claimed': time.time()}, f)
+        if self.done_path(index).exists():
+            # Finished and released since the caller last looked: done is written before the release
+            self.lease_path(index).unlink(missing_ok=True)
+            return False
+        with self._lock:
+            self.held.add(index)
+        return True
+
+    def lease_owner(self, index):
+        try:
+            with open(self.lease_path(index)) as f:
+                return json.load(f).get('owner')
+        except (FileNotFoundError, ValueError):
+            return None  # Gone, or being written by a new owner
+
+    def try_claim(self, index):
+        """Claim an index, stealing an expired lease; False if another worker holds it"""
+        if self._create(index):
+            return True
+        path = self.lease_path(index)
+        try:
+            if self.fs_time() - path.stat().st_mtime < self.timeout:
+                return False
+        except FileNotFoundError:
+            return self._create(index)  # Released in the meantime
+
+        # Rename is atomic, so only one worker moves the expired lease aside
+        owner = self.lease_owner(index)
+        stale = path.with_name(f"{path.name}.stale-{self.owner}")
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return False
+        if self.fs_time() - stale.stat().st_mtime < self.timeout:
+            # Refreshed or re-claimed between the check and the rename: put it back
+            try:
+                os.link(stale, path)
+            except FileExistsError:
+                pass
+            stale.unlink()
+            return False
+        stale.unlink()
+        if not self._create(index):
+            return False
+        print(f"Stole expired lease on scene {index} from {owner}")
+        self.stolen += 1
+        return True
+
+    def finish(self, index, success):
+        """Record the outcome of a claimed index and release its lease"""
+        if success:
+            with open(self.done_path(index), 'w') as f:
+                f.write(self.owner)
+        else:
+            (self.lease_dir / f"{index:06d}.failed-{self.owner}").touch()
+        with self._lock:
+            self.held.discard(index)
+            lost = index in self.lost
+            self.lost.discard(index)
+        if not lost and self.lease_owner(index) == self.owner:
+            self.lease_path(index).unlink(missing_ok=True)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            with self._lock:
+                held = list(self.held - self.lost)
+            for index in held:
+                if self.lease_owner(index) != self.owner:
+                    print(f"Lease on scene {index} was taken over by another worker")
+                    with self._lock:
+                        self.lost.add(index)
+                    continue
+                try:
+                    os.utime(self.lease_path(index), None)
+                except FileNotFoundError:
+                    pass
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._heartbeat, name='lease-heartbeat', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the heartbeat and release leases still held, e.g. after an interrupt"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            held, self.held = self.held - self.lost, set()
+        for index in held:
+            if self.lease_owner(index) == self.owner:
+                self.lease_path(index).unlink(missing_ok=True)
+
+    def claims(self, indices):
+        """Yield indices claimed by this worker until every index is done or given up on
+
+        Claimed indices stay held, with the heartbeat running, until the
+        caller finishes them, which may be after the next claim (videos still
+        encoding). The caller calls stop() once it has finished them all.
+        Indices leased by live workers are polled until they finish or their
+        lease expires.
+        """
+        pending = list(indices)
+        self.start()
+        while pending:
+            done, failures, leases = self.snapshot()
+            now = self.fs_time()
+            waiting = []
+            for index in pending:
+                if index in done or failures[index] >= MAX_ATTEMPTS:
+                    continue
+                if index in leases and now - leases[index] < self.timeout:
+                    waiting.append(index)  # Held by a live worker
+                elif self.try_claim(index):
+                    self.claimed += 1
+                    yield index
+                else:
+                    waiting.append(index)
+            pending = waiting
+            if pending:
+                time.sleep(self.poll_interval)
+
+    def status(self):
+        done, failures, leases = self.snapshot()
+        now = self.fs_time()
+        expired = sum(1 for mtime in leases.values() if now - mtime >= self.timeout)
+        return {
+            'done': len(done),
+            'leased': len(leases) - expired,
+            'expired': expired,
+            'given_up': sum(1 for index, count in failures.items() if count >= MAX_ATTEMPTS and index not in done),
+        }
+
+
+def simulate_worker(lease_dir, scenes, timeout, work_seconds, crash_chance, seed):
+    """Claim scenes with fake work, dying abruptly with crash_chance per scene like a killed node"""
+    rng = random.Random(seed)
+    board = LeaseBoard(lease_dir, timeout, poll_interval=timeout / 4)
+    for index in board.claims(range(scenes)):
+        time.sleep(work_seconds * rng.uniform(0.5, 1.5))
+        if rng.random() < crash_chance:
+            os._exit(1)  # No cleanup: the lease stays behind until it expires
+        with open(Path(lease_dir) / f"{index:06d}.output-{board.owner}", 'w') as f:
+            f.write(str(index))
+        board.finish(index, True)
+    board.stop()
+    print(f"Worker {board.owner}: claimed {board.claimed}, stole {board.stolen}")
+
+
+def simulate(lease_dir, processes, scenes, timeout, work_seconds, crash_chance):
+    """Run worker processes against one lease directory and return the (missing, duplicated) scene counts
+
+    A scene is duplicated when more than one worker completed it, which the
+    leases exist to prevent.
+    """
+    commands = [[sys.executable, os.path.abspath(__file__), '--lease-dir', str(lease_dir), '--timeout', str(timeout),
+                 'simulate-worker', '--scenes', str(scenes), '--work-seconds', str(work_seconds),
+                 '--crash-chance', str(crash_chance), '--seed', str(seed)] for seed in range(processes)]
+    running = [subprocess.Popen(command) for command in commands]
+    crashed = sum(process.wait() != 0 for process in running)
+    # Crashed workers leave scenes behind; one survivor picks them up once their leases expire
+    if crashed:
+        print(f"{crashed} workers crashed, finishing with a recovery worker")
+        subprocess.run(commands[0][:-2] + ['--seed', str(processes), '--crash-chance', '0'], check=True)
+
+    outputs = Counter(int(path.name.partition('.')[0]) for path in Path(lease_dir).glob('*.output-*'))
+    missing = [index for index in range(scenes) if index not in outputs]
+    duplicated = [index for index, count in outputs.items() if count > 1]
+    print(f"{len(outputs)}/{scenes} scenes completed, {len(duplicated)} rendered twice, {len(missing)} missing")
+    return len(missing), len(duplicated)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Inspect or exercise scene leases in a shared output directory')
+    parser.add_argument('--lease-dir', type=str, required=True, help='Lease directory, <output-dir>/leases')
+    parser.add_argument('--timeout', type=float, default=LEASE_TIMEOUT,
+                        help='Seconds without a heartbeat before a lease may be stolen')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='Print the number of done, leased and expired scenes')
+
+    simulation = subparsers.add_parser('simulate', help='Run crashing worker processes on a local lease directory')
+    simulation.add_argument('--processes', type=int, default=4, help='Number of worker processes')
+    simulation.add_argument('--scenes', type=int, default=40, help='Number of scene indices to split')
+    simulation.add_argument('--work-seconds', type=float, default=0.05, help='Mean fake render time per scene')
+    simulation.add_argument('--crash-chance', type=float, default=0.02, help='Chance a worker dies on each scene')
+
+    worker = subparsers.add_parser('simulate-worker')
+    worker.add_argument('--scenes', type=int, required=True)
+    worker.add_argument('--work-seconds', type=float, required=True)
+    worker.add_argument('--crash-chance', type=float, required=True)
+    worker.add_argument('--seed', type=int, required=True)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == 'status':
+        for state, count in LeaseBoard(args.lease_dir, args.timeout).status().items():
+            print(f"{state:<9} {count}")
+    elif args.command == 'simulate':
+        missing, duplicated = simulate(args.lease_dir, args.processes, args.scenes, args.timeout,
+                                       args.work_seconds, args.crash_chance)
+        sys.exit(0 if not missing and not duplicated else 1)
+    elif args.command == 'simulate-worker':
+        simulate_worker(args.lease_dir, args.scenes, args.timeout, args.work_seconds, args.crash_chance, args.seed)